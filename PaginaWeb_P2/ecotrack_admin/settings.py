@@ -162,6 +162,19 @@ FIREBASE_CREDENTIALS = config(
     default=os.path.join(BASE_DIR, 'firebase-service-account.json')
 )
 
+# Local copy of the Firestore reports (reports/report_sync.py): seconds
+# between incremental syncs, between full re-reads that pick up deleted
+# reports and missed changes, and documents per page when loading the
+# collection
+FIRESTORE_SYNC_INTERVAL = config('FIRESTORE_SYNC_INTERVAL', default=30, cast=int)
+FIRESTORE_RECONCILE_INTERVAL = config('FIRESTORE_RECONCILE_INTERVAL', default=600, cast=int)
+FIRESTORE_PAGE_SIZE = config('FIRESTORE_PAGE_SIZE', default=500, cast=int)
+# Keep the copy current with an on_snapshot listener instead of polling
+# (one listener per worker process; polling resumes if it drops)
+FIRESTORE_REALTIME = config('FIRESTORE_REALTIME', default=False, cast=bool)
+# Seconds FirestoreService.get_stats() reuses its counts
+FIRESTORE_STATS_CACHE_SECONDS = config('FIRESTORE_STATS_CACHE_SECONDS', default=60, cast=int)
+
 # Security settings for production
 if not DEBUG:
     # SECURE_SSL_REDIRECT disabled - Cloud Run handles HTTPS
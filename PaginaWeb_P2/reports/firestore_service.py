@@ -8,11 +8,57 @@ the same Firestore database used by the mobile app and backend API.
 
 import firebase_admin
 from firebase_admin import credentials, firestore
+from collections import Counter
 from datetime import datetime
 from django.conf import settings
+from django.core.cache import cache
+import base64
+import json
 import os
 
 
+# Firestore status/priority values and the Django choices they map to
+ESTADO_MAPPING = {
+    'received': 'recibido',
+    'recibido': 'recibido',
+    'pending': 'recibido',  # Mapear pendiente antiguo a recibido
+    'pendiente': 'recibido',
+    'assigned': 'asignado',
+    'asignado': 'asignado',
+    'in_progress': 'en_proceso',
+    'en_proceso': 'en_proceso',
+    'completed': 'resuelto',
+    'resuelto': 'resuelto',
+    'finalizado': 'resuelto',
+    'cancelado': 'cancelado',
+    'cancelled': 'cancelado',
+}
+
+PRIORIDAD_MAPPING = {
+    'baja': 'baja',
+    'low': 'baja',
+    'media': 'media',
+    'medium': 'media',
+    'alta': 'alta',
+    'high': 'alta',
+    'urgente': 'urgente',
+    'urgent': 'urgente',
+}
+
+# Queries fetched per page when some reports are filtered out in Python
+PAGE_MAX_SCANS = 10
+
+# Most values Firestore accepts in one 'in' filter (or in the product of two)
+QUERY_IN_LIMIT = 30
+
+# Largest number of writes Firestore accepts in one batch
+BATCH_WRITE_LIMIT = 500
+
+# Statistics are reused for this many seconds
+STATS_CACHE_KEY = 'firestore_stats'
+STATS_CACHE_SECONDS = getattr(settings, 'FIRESTORE_STATS_CACHE_SECONDS', 60)
+
+
 class FirestoreService:
     """Service class to handle Firestore operations for Django"""
 
@@ -197,6 +243,277 @@ class FirestoreService:
             print(f'❌ Error fetching reports by priority: {e}')
             return []
 
+    def get_reports_page(self, page_size=50, page_token=None, estado=None, prioridad=None, matches=None):
+        """
+        Get one page of reports, newest first (keyset pagination)
+
+        Pages continue after the created_at (and id) of the last report of
+        the previous page, so every page costs about page_size reads no
+        matter how deep it is. Status and priority filters are pushed into
+        the query where possible; the rest, and any filter given with
+        matches, are applied in Python, in which case further queries are
+        made until the page is full.
+
+        Args:
+            page_size: Reports per page
+            page_token: Token returned with the previous page (None for
+                the first page)
+            estado: Optional Django status value (e.g. 'recibido')
+            prioridad: Optional Django priority value (e.g. 'alta')
+            matches: Optional function called with each report dictionary;
+                reports for which it returns False are skipped
+
+        Returns:
+            Tuple of (list of report dictionaries, next page token or None)
+
+        Raises:
+            Exception: If Firestore rejects the query (e.g. a composite
+                index from firestore.indexes.json is not deployed), so an
+                error is not mistaken for an empty page
+        """
+        try:
+            query, residual = self._filtered_reports_query(estado, prioridad)
+            if residual is not None:
+                matches = residual if matches is None else (
+                    lambda report, extra=matches: residual(report) and extra(report)
+                )
+            query = query.order_by(
+                'created_at', direction=firestore.Query.DESCENDING
+            ).order_by('__name__', direction=firestore.Query.DESCENDING)
+
+            cursor = None
+            if page_token:
+                try:
+                    cursor = self._decode_page_token(page_token)
+                except ValueError as e:
+                    print(f'⚠️ {e}, starting from the first page')
+            reports = []
+            last_doc = None
+            more = False
+            for _ in range(PAGE_MAX_SCANS):
+                page = query.start_after(cursor) if cursor else query
+                # One extra report tells whether there is a next page
+                docs = list(page.limit(page_size + 1).stream())
+                for doc in docs:
+                    report = self._firestore_to_django(doc)
+                    if matches is not None and not matches(report):
+                        if len(reports) < page_size:
+                            last_doc = doc
+                        continue
+                    if len(reports) == page_size:
+                        more = True
+                        break
+                    reports.append(report)
+                    last_doc = doc
+                if more or len(docs) <= page_size:
+                    break
+                cursor = self._page_cursor(docs[-1])
+            else:
+                # Gave up looking for matches; carry on from here next page
+                more = True
+            next_token = self._encode_page_token(last_doc) if more else None
+            print(f'📄 Retrieved page of {len(reports)} reports (more: {more})')
+            return reports, next_token
+
+        except Exception as e:
+            print(f'❌ Error fetching page of reports: {e}')
+            raise
+
+    def count_reports(self, estado=None, prioridad=None):
+        """
+        Count reports with a server-side aggregation (no documents read)
+
+        Args:
+            estado: Optional Django status value
+            prioridad: Optional Django priority value
+
+        Returns:
+            Number of reports, or None if it could not be counted (also when
+            a filter has to be applied in Python, see _filtered_reports_query)
+        """
+        try:
+            query, residual = self._filtered_reports_query(estado, prioridad)
+            if residual is not None:
+                return None
+            result = query.count().get()
+            return int(result[0][0].value)
+        except Exception as e:
+            print(f'❌ Error counting reports: {e}')
+            return None
+
+    def _filtered_reports_query(self, estado=None, prioridad=None):
+        """
+        Reports query with Django status/priority filters as Firestore 'in' clauses
+
+        Stored values are matched in the casings the app and the backend
+        write ('alta', 'Alta', 'ALTA'). Filters no query can express are
+        returned as a function to apply to each converted report instead:
+        the default values also cover missing and unknown fields (see
+        _map_estado_to_django), and two 'in' clauses may not combine into
+        more than QUERY_IN_LIMIT values.
+
+        Returns:
+            Tuple of (query, function filtering report dictionaries or None)
+        """
+        query = self.db.collection('reports')
+        residual = []
+        pushed = 1
+        for field, value, mapping, default in (
+            ('estado', estado, ESTADO_MAPPING, 'recibido'),
+            ('prioridad', prioridad, PRIORIDAD_MAPPING, 'media'),
+        ):
+            if not value:
+                continue
+            stored = self._stored_values(mapping, value)
+            if value == default or pushed * len(stored) > QUERY_IN_LIMIT:
+                residual.append((field, value))
+                continue
+            query = query.where(field, 'in', stored)
+            pushed *= len(stored)
+
+        if not residual:
+            return query, None
+        return query, lambda report: all(report[field] == value for field, value in residual)
+
+    def _stored_values(self, mapping, value):
+        """Firestore values (in every stored casing) that map to a Django value"""
+        stored = []
+        for key, mapped in mapping.items():
+            if mapped != value:
+                continue
+            for variant in (key, key.capitalize(), key.upper()):
+                if variant not in stored:
+                    stored.append(variant)
+        return stored
+
+    def _page_cursor(self, doc):
+        return {'created_at': doc.get('created_at'), '__name__': doc.id}
+
+    def _encode_page_token(self, doc):
+        """Opaque token pointing just after doc"""
+        created_at = doc.get('created_at')
+        if hasattr(created_at, 'isoformat'):
+            payload = {'t': created_at.isoformat(), 'id': doc.id}
+        else:
+            # Stored as text by an old client: point at the document itself
+            payload = {'id': doc.id}
+        return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+    def _decode_page_token(self, token):
+        """
+        Turn a page token back into a query cursor
+
+        Raises:
+            ValueError: If the token is malformed or its report was deleted
+        """
+        try:
+            padded = token + '=' * (-len(token) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            report_id = payload['id']
+            if 't' in payload:
+                return {'created_at': datetime.fromisoformat(payload['t']), '__name__': report_id}
+        except Exception as e:
+            raise ValueError(f'Invalid page token: {e}')
+
+        # No timestamp to resume from, so continue after the document (one read)
+        snapshot = self.db.collection('reports').document(report_id).get()
+        if not snapshot.exists:
+            raise ValueError(f'Invalid page token: report {report_id} no longer exists')
+        return snapshot
+
+    # ==================== SYNC OPERATIONS ====================
+    # Used by reports.report_sync. Unlike the reads above these raise on
+    # error, so a failed sync never replaces the local copy with nothing.
+
+    def iter_all_reports(self, page_size=500):
+        """
+        Yield every report in the collection, one page at a time
+
+        Pages are ordered by document id, so reports without created_at
+        are included too.
+
+        Args:
+            page_size: Documents fetched per query
+
+        Yields:
+            Report dictionaries
+        """
+        print(f'📋 Loading every report from Firestore (pages of {page_size})')
+        query = self.db.collection('reports').order_by('__name__').limit(page_size)
+        total = 0
+        last_doc = None
+        while True:
+            page = query.start_after(last_doc) if last_doc is not None else query
+            docs = list(page.stream())
+            for doc in docs:
+                yield self._firestore_to_django(doc)
+            total += len(docs)
+            if len(docs) < page_size:
+                break
+            last_doc = docs[-1]
+        print(f'✅ Loaded {total} reports from Firestore')
+
+    def get_reports_changed_since(self, watermark):
+        """
+        Get reports created or updated after a point in time
+
+        Args:
+            watermark: datetime; reports whose updated_at or created_at is
+                later are returned
+
+        Returns:
+            Tuple of (list of report dictionaries, each report at most
+            once; billed reads, counting the one read Firestore charges
+            for a query that matches nothing)
+        """
+        collection = self.db.collection('reports')
+        changed = {}
+        billed = 0
+        for field in ('updated_at', 'created_at'):
+            docs = list(collection.where(field, '>', watermark).stream())
+            billed += max(1, len(docs))
+            for doc in docs:
+                changed[doc.id] = self._firestore_to_django(doc)
+
+        if changed:
+            print(f'🔄 {len(changed)} reports changed in Firestore since {watermark}')
+        return list(changed.values()), billed
+
+    def listen_reports(self, callback):
+        """
+        Listen to realtime changes in the reports collection (on_snapshot)
+
+        The first call of callback carries every report as changed; later
+        calls carry only what changed since.
+
+        Args:
+            callback: Called from a background thread with (changed,
+                removed_ids, initial): report dictionaries added or
+                modified, ids of deleted reports, and whether this is the
+                first snapshot
+
+        Returns:
+            The listener; call unsubscribe() on it to stop listening
+        """
+        state = {'initial': True}
+
+        def on_snapshot(col_snapshot, changes, read_time):
+            try:
+                changed = []
+                removed_ids = []
+                for change in changes:
+                    if change.type.name == 'REMOVED':
+                        removed_ids.append(change.document.id)
+                    else:
+                        changed.append(self._firestore_to_django(change.document))
+                callback(changed, removed_ids, state['initial'])
+                state['initial'] = False
+            except Exception as e:
+                print(f'❌ Error handling Firestore snapshot: {e}')
+
+        print('👂 Listening to realtime changes in Firestore reports')
+        return self.db.collection('reports').on_snapshot(on_snapshot)
+
     # ==================== WRITE OPERATIONS ====================
 
     def update_report_status(self, report_id, new_status):
@@ -279,51 +596,131 @@ class FirestoreService:
             print(f'❌ Error assigning report: {e}')
             return False
 
-    # ==================== STATISTICS ====================
+    # ==================== BATCH WRITE OPERATIONS ====================
 
-    def get_stats(self):
+    def bulk_assign_reports(self, assignments):
         """
-        Get statistics about reports
+        Assign many reports at once using batched writes
+
+        Args:
+            assignments: List of (report_id, user_id, user_name) tuples
 
         Returns:
-            Dictionary with statistics
+            List of {'id', 'success', 'error'} dictionaries, one per report
         """
-        try:
-            print('📊 Calculating Firestore statistics...')
+        updates = [
+            (report_id, {
+                'assigned_to': user_id,
+                'assigned_to_name': user_name,
+                'assigned_at': firestore.SERVER_TIMESTAMP,
+                'estado': 'asignado',
+            })
+            for report_id, user_id, user_name in assignments
+        ]
+        return self._batch_update(updates)
 
-            # Get all reports
-            all_reports = self.get_all_reports()
+    def bulk_update_status(self, report_ids, new_status):
+        """
+        Update the status of many reports at once using batched writes
 
-            # Calculate stats
-            stats = {
-                'total_reports': len(all_reports),
-                'by_status': {},
-                'by_classification': {},
-                'by_priority': {},
-            }
+        Args:
+            report_ids: List of report IDs
+            new_status: New status value
+
+        Returns:
+            List of {'id', 'success', 'error'} dictionaries, one per report
+        """
+        return self._batch_update([(report_id, {'estado': new_status}) for report_id in report_ids])
+
+    def _batch_update(self, updates):
+        """
+        Apply (report_id, fields) updates in batches of BATCH_WRITE_LIMIT
+
+        A batch is atomic, so when one fails (e.g. a report was deleted)
+        its reports are retried one by one to tell which ones failed.
+
+        Returns:
+            List of {'id', 'success', 'error'} dictionaries, in input order
+        """
+        print(f'🔄 Updating {len(updates)} reports in batches of {BATCH_WRITE_LIMIT}')
+        collection = self.db.collection('reports')
+        results = []
+
+        for start in range(0, len(updates), BATCH_WRITE_LIMIT):
+            chunk = updates[start:start + BATCH_WRITE_LIMIT]
+            batch = self.db.batch()
+            for report_id, fields in chunk:
+                batch.update(collection.document(report_id), {**fields, 'updated_at': firestore.SERVER_TIMESTAMP})
+            try:
+                batch.commit()
+                results.extend({'id': report_id, 'success': True, 'error': None} for report_id, _ in chunk)
+                continue
+            except Exception as e:
+                print(f'⚠️ Batch of {len(chunk)} updates failed ({e}), retrying one by one')
 
-            # Count by status
-            for report in all_reports:
-                status = report.get('estado', 'unknown')
-                stats['by_status'][status] = stats['by_status'].get(status, 0) + 1
+            for report_id, fields in chunk:
+                try:
+                    collection.document(report_id).update({**fields, 'updated_at': firestore.SERVER_TIMESTAMP})
+                    results.append({'id': report_id, 'success': True, 'error': None})
+                except Exception as e:
+                    results.append({'id': report_id, 'success': False, 'error': str(e)})
 
-            # Count by classification
-            for report in all_reports:
-                clasificacion = report.get('tipo_residuo', 'unknown')
-                stats['by_classification'][clasificacion] = stats['by_classification'].get(clasificacion, 0) + 1
+        updated = sum(result['success'] for result in results)
+        print(f'✅ {updated}/{len(updates)} reports updated')
+        return results
+
+    # ==================== STATISTICS ====================
+
+    def get_stats(self, reports=None):
+        """
+        Get statistics about reports
 
-            # Count by priority
-            for report in all_reports:
-                prioridad = report.get('prioridad', 'unknown')
-                stats['by_priority'][prioridad] = stats['by_priority'].get(prioridad, 0) + 1
+        Counts are taken in a single pass over the local copy kept by
+        reports.report_sync, so after its first load they cost only the
+        reads of reports that changed. Classification is free text mapped
+        in Python, which is why server-side count aggregations can't group
+        it. The result is cached for STATS_CACHE_SECONDS.
 
-            print(f'✅ Statistics calculated: {stats["total_reports"]} total reports')
+        Args:
+            reports: Optional list of report dictionaries to count instead
+
+        Returns:
+            Dictionary with statistics
+        """
+        try:
+            if reports is not None:
+                return self._count_reports(reports)
+
+            stats = cache.get(STATS_CACHE_KEY)
+            if stats is None:
+                from .report_sync import report_sync
+                print('📊 Calculating Firestore statistics...')
+                stats = self._count_reports(report_sync.get_reports())
+                cache.set(STATS_CACHE_KEY, stats, STATS_CACHE_SECONDS)
+                print(f'✅ Statistics calculated: {stats["total_reports"]} total reports')
             return stats
 
         except Exception as e:
             print(f'❌ Error calculating statistics: {e}')
             return {}
 
+    def _count_reports(self, reports):
+        """Count reports by status, classification and priority in one pass"""
+        stats = {
+            'total_reports': len(reports),
+            'by_status': Counter(),
+            'by_classification': Counter(),
+            'by_priority': Counter(),
+        }
+        for report in reports:
+            stats['by_status'][report.get('estado', 'unknown')] += 1
+            stats['by_classification'][report.get('tipo_residuo', 'unknown')] += 1
+            stats['by_priority'][report.get('prioridad', 'unknown')] += 1
+
+        for key in ('by_status', 'by_classification', 'by_priority'):
+            stats[key] = dict(stats[key])
+        return stats
+
     # ==================== HELPER METHODS ====================
 
     def _firestore_to_django(self, doc):
@@ -479,24 +876,8 @@ class FirestoreService:
         Returns:
             Django-compatible status value
         """
-        mapping = {
-            'received': 'recibido',
-            'recibido': 'recibido',
-            'pending': 'recibido',  # Mapear pendiente antiguo a recibido
-            'pendiente': 'recibido',
-            'assigned': 'asignado',
-            'asignado': 'asignado',
-            'in_progress': 'en_proceso',
-            'en_proceso': 'en_proceso',
-            'completed': 'resuelto',
-            'resuelto': 'resuelto',
-            'finalizado': 'resuelto',
-            'cancelado': 'cancelado',
-            'cancelled': 'cancelado',
-        }
-
         value = str(firestore_estado).lower().strip()
-        return mapping.get(value, 'recibido')
+        return ESTADO_MAPPING.get(value, 'recibido')
 
     def _map_prioridad_to_django(self, firestore_prioridad):
         """
@@ -508,19 +889,8 @@ class FirestoreService:
         Returns:
             Django-compatible priority value
         """
-        mapping = {
-            'baja': 'baja',
-            'low': 'baja',
-            'media': 'media',
-            'medium': 'media',
-            'alta': 'alta',
-            'high': 'alta',
-            'urgente': 'urgente',
-            'urgent': 'urgente',
-        }
-
         value = str(firestore_prioridad).lower().strip()
-        return mapping.get(value, 'media')
+        return PRIORIDAD_MAPPING.get(value, 'media')
 
     def _get_estado_display(self, estado):
         """Return the human readable label for an estado value."""
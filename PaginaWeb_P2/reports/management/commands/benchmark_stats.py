@@ -0,0 +1,57 @@
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+
+from reports.firestore_service import STATS_CACHE_KEY, firestore_service
+from reports.report_sync import report_sync
+
+
+class Command(BaseCommand):
+    help = 'Compara las lecturas de Firestore de get_stats: lectura completa vs copia sincronizada'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rondas', type=int, default=5,
+                            help='Veces que se calculan las estadísticas con cada método')
+
+    def handle(self, *args, **options):
+        rondas = options['rondas']
+        if rondas < 1:
+            raise CommandError('--rondas debe ser al menos 1')
+        self.stdout.write(f'Calculando estadísticas {rondas} veces con cada método...')
+
+        # Antes: cada cálculo leía y convertía todos los documentos
+        legacy_reads = 0
+        start = time.perf_counter()
+        for _ in range(rondas):
+            reports = firestore_service.get_all_reports()
+            legacy = firestore_service._count_reports(reports)
+            legacy_reads += len(reports)
+        legacy_ms = (time.perf_counter() - start) * 1000 / rondas
+
+        # Ahora: una pasada sobre la copia local (carga inicial + cambios;
+        # report_sync.reads incluye la lectura mínima de cada consulta vacía)
+        reads_before = report_sync.reads
+        start = time.perf_counter()
+        for _ in range(rondas):
+            cache.delete(STATS_CACHE_KEY)
+            report_sync.mark_stale()
+            current = firestore_service.get_stats()
+        current_ms = (time.perf_counter() - start) * 1000 / rondas
+        current_reads = report_sync.reads - reads_before
+
+        self.stdout.write('')
+        self.stdout.write(f'{"Método":<24}{"Lecturas":>10}{"ms por cálculo":>18}')
+        self.stdout.write(f'{"Lectura completa":<24}{legacy_reads:>10}{legacy_ms:>18.0f}')
+        self.stdout.write(f'{"Copia sincronizada":<24}{current_reads:>10}{current_ms:>18.0f}')
+        self.stdout.write('')
+
+        # get_all_reports() omite documentos sin created_at, así que los totales pueden diferir
+        if legacy['total_reports'] != current.get('total_reports'):
+            self.stdout.write(self.style.WARNING(
+                f'Totales distintos: {legacy["total_reports"]} vs {current.get("total_reports")}'
+            ))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'La copia sincronizada usó {legacy_reads - current_reads} lecturas menos'
+        ))
@@ -0,0 +1,213 @@
+"""
+Local copy of the Firestore reports collection
+
+The web panel used to re-read the newest 500 reports every 5 minutes. This
+module keeps every report in memory instead: one full load at startup,
+then only the documents whose updated_at or created_at moved past the last
+watermark. A periodic reconciliation re-reads the whole collection to drop
+deleted reports and pick up changes the watermark cannot see.
+
+With realtime enabled the copy is instead a materialized view kept up to
+date by an on_snapshot listener, so reads never wait on Firestore. If the
+listener drops, reads fall back to polling until it reconnects.
+"""
+
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+
+from .firestore_service import firestore_service
+
+
+# Re-read a few seconds before the watermark: server timestamps of writes
+# still in flight can land slightly behind the newest one already seen.
+# The overlap does not cover clients whose clock runs behind (the app
+# stamps updated_at with Timestamp.now()) nor the backend, which writes
+# updated_at as an ISO string that never compares greater than a
+# Timestamp; those changes only show up at the next reconciliation.
+WATERMARK_OVERLAP = timedelta(seconds=5)
+
+# Seconds the first read waits for the listener's initial snapshot before
+# loading the collection itself (which would read every document twice)
+LISTENER_SEED_TIMEOUT = 10
+
+
+def _change_time(report):
+    """Return the latest of updated_at and created_at of a report (or None)"""
+    data = report.get('_firestore_data') or {}
+    times = [
+        value for value in (data.get('updated_at'), data.get('created_at'))
+        if value is not None and hasattr(value, 'timestamp')
+    ]
+    return max(times, default=None)
+
+
+class ReportSync:
+    """Keeps an in-process copy of every report, refreshed incrementally"""
+
+    def __init__(self, service=None, sync_interval=30, reconcile_interval=600, page_size=500,
+                 realtime=False):
+        self.service = service or firestore_service
+        self.sync_interval = sync_interval
+        self.reconcile_interval = reconcile_interval
+        self.page_size = page_size
+        self.realtime = realtime
+
+        self._reports = {}
+        self._ordered = None
+        self._watermark = None
+        self._loaded = False
+        self._last_sync = 0.0
+        self._last_reconcile = 0.0
+        self._lock = threading.Lock()
+        # Billed Firestore reads so far: one per document read, and one for
+        # each incremental query that matched nothing
+        self.reads = 0
+
+        self._listener = None
+        # True once the listener delivered its first (complete) snapshot
+        self._live = False
+        self._seeded = threading.Event()
+        self._listener_retry_at = 0.0
+
+    def get_reports(self):
+        """
+        Return every report, newest first
+
+        Syncs first when the copy is older than sync_interval, unless the
+        realtime listener is keeping it current; the first read waits for
+        the listener's initial snapshot rather than loading the collection
+        twice. If Firestore cannot be reached the previous copy is returned
+        as is.
+
+        Returns:
+            List of report dictionaries
+        """
+        if self.realtime:
+            self._ensure_listener()
+            if self._listener is not None and not self._loaded:
+                # Let the initial snapshot fill the copy instead of sync()
+                self._seeded.wait(LISTENER_SEED_TIMEOUT)
+        if not self._live and time.monotonic() - self._last_sync >= self.sync_interval:
+            self.sync()
+
+        with self._lock:
+            if self._ordered is None:
+                self._ordered = sorted(
+                    self._reports.values(), key=lambda r: r['fecha_reporte'], reverse=True
+                )
+            return list(self._ordered)
+
+    def mark_stale(self):
+        """Sync on the next read (call after writing to Firestore)"""
+        self._last_sync = 0.0
+
+    def sync(self):
+        """
+        Bring the local copy up to date
+
+        Returns:
+            Boolean indicating success
+        """
+        with self._lock:
+            # Another thread may have synced while this one waited
+            if self._loaded and time.monotonic() - self._last_sync < self.sync_interval:
+                return True
+            try:
+                if not self._loaded or time.monotonic() - self._last_reconcile >= self.reconcile_interval:
+                    # Also reconciles: drops deleted reports and refreshes
+                    # the ones whose changes the watermark missed
+                    self._full_load()
+                else:
+                    changed, billed = self.service.get_reports_changed_since(self._watermark - WATERMARK_OVERLAP)
+                    self.reads += billed
+                    self._apply(changed)
+                self._last_sync = time.monotonic()
+                return True
+            except Exception as e:
+                print(f'❌ Error syncing reports from Firestore: {e}')
+                # Don't retry on every request while Firestore is down
+                self._last_sync = time.monotonic()
+                return False
+
+    def _ensure_listener(self):
+        """Start the snapshot listener, or restart it after it dropped"""
+        with self._lock:
+            if self._listener is not None:
+                if getattr(self._listener, 'is_active', True):
+                    return
+                print('⚠️ Firestore listener dropped, polling until it reconnects')
+                self._stop_listener()
+                # Catch up on whatever changed while nobody was listening
+                self._last_sync = 0.0
+
+            if time.monotonic() < self._listener_retry_at:
+                return
+            self._listener_retry_at = time.monotonic() + self.sync_interval
+            try:
+                self._listener = self.service.listen_reports(self._on_snapshot)
+            except Exception as e:
+                print(f'❌ Could not start Firestore listener: {e}')
+
+    def _stop_listener(self):
+        try:
+            self._listener.unsubscribe()
+        except Exception:
+            pass
+        self._listener = None
+        self._live = False
+
+    def _on_snapshot(self, changed, removed_ids, initial):
+        """Apply a change event from the listener (runs on its thread)"""
+        with self._lock:
+            if initial:
+                # The first snapshot is the whole collection
+                self._reports = {}
+                self._ordered = None
+                self._watermark = datetime.fromtimestamp(0, tz=timezone.utc)
+            self.reads += len(changed)
+            self._apply(changed)
+            for report_id in removed_ids:
+                self._reports.pop(report_id, None)
+            if removed_ids:
+                self._ordered = None
+            if initial:
+                self._loaded = True
+                self._live = True
+                self._seeded.set()
+                print(f'✅ Report view live with {len(self._reports)} reports')
+
+    def _full_load(self):
+        """Read the whole collection and start the watermark from it"""
+        reports = {report['id']: report for report in self.service.iter_all_reports(self.page_size)}
+        self.reads += len(reports)
+        self._reports = reports
+        self._ordered = None
+        self._watermark = max(
+            (t for t in map(_change_time, reports.values()) if t is not None),
+            default=datetime.fromtimestamp(0, tz=timezone.utc)
+        )
+        self._loaded = True
+        self._last_reconcile = time.monotonic()
+        print(f'✅ Report sync loaded {len(reports)} reports (watermark {self._watermark})')
+
+    def _apply(self, changed):
+        """Merge changed reports into the copy and advance the watermark"""
+        for report in changed:
+            self._reports[report['id']] = report
+            change_time = _change_time(report)
+            if change_time is not None and change_time > self._watermark:
+                self._watermark = change_time
+        if changed:
+            self._ordered = None
+
+
+# Shared instance
+report_sync = ReportSync(
+    sync_interval=getattr(settings, 'FIRESTORE_SYNC_INTERVAL', 30),
+    reconcile_interval=getattr(settings, 'FIRESTORE_RECONCILE_INTERVAL', 600),
+    page_size=getattr(settings, 'FIRESTORE_PAGE_SIZE', 500),
+    realtime=getattr(settings, 'FIRESTORE_REALTIME', False),
+)
@@ -1,3 +1,240 @@
-from django.test import TestCase
+import json
+from datetime import datetime, timedelta, timezone
+from unittest import mock
 
-# Create your tests here.
+from django.test import RequestFactory, SimpleTestCase
+
+# Importing the service connects to Firebase, which the tests never do
+with mock.patch('firebase_admin.credentials.Certificate'), \
+        mock.patch('firebase_admin.initialize_app'), \
+        mock.patch('firebase_admin.firestore.client'):
+    from reports import views
+    from reports.firestore_service import BATCH_WRITE_LIMIT, FirestoreService
+
+
+class FakeDoc:
+    def __init__(self, doc_id, data):
+        self.id = doc_id
+        self._data = data
+        self.exists = data is not None
+
+    def to_dict(self):
+        return dict(self._data)
+
+    def get(self, field):
+        return self._data.get(field)
+
+
+class FakeQuery:
+    """In-memory stand-in for the Firestore queries used by get_reports_page"""
+
+    def __init__(self, docs, filters=(), cursor=None, size=None):
+        self.docs = docs
+        self.filters = list(filters)
+        self.cursor = cursor
+        self.size = size
+
+    def _copy(self, **changes):
+        values = {'filters': self.filters, 'cursor': self.cursor, 'size': self.size}
+        values.update(changes)
+        return FakeQuery(self.docs, **values)
+
+    def where(self, field, op, values):
+        assert op == 'in' and len(values) <= 30
+        return self._copy(filters=self.filters + [(field, values)])
+
+    def order_by(self, field, direction=None):
+        return self
+
+    def document(self, doc_id):
+        match = next((doc for doc in self.docs if doc.id == doc_id), FakeDoc(doc_id, None))
+        return mock.Mock(get=lambda: match)
+
+    def start_after(self, cursor):
+        if isinstance(cursor, FakeDoc):
+            return self._copy(cursor=self._position(cursor.get('created_at'), cursor.id))
+        return self._copy(cursor=self._position(cursor['created_at'], cursor['__name__']))
+
+    @staticmethod
+    def _position(created_at, doc_id):
+        # Firestore orders timestamps before strings
+        return (isinstance(created_at, str), str(created_at), doc_id)
+
+    def limit(self, size):
+        return self._copy(size=size)
+
+    def stream(self):
+        # Documents without the order_by field are left out, as in Firestore
+        docs = [
+            doc for doc in self.docs
+            if doc.get('created_at') is not None
+            and all(doc.get(field) in values for field, values in self.filters)
+        ]
+        position = lambda doc: self._position(doc.get('created_at'), doc.id)  # noqa: E731
+        docs.sort(key=position, reverse=True)
+        if self.cursor:
+            docs = [doc for doc in docs if position(doc) < self.cursor]
+        return iter(docs[:self.size])
+
+    def count(self):
+        total = len(list(self._copy(size=None).stream()))
+        return mock.Mock(get=lambda: [[mock.Mock(value=total)]])
+
+
+class FilteredReportsTests(SimpleTestCase):
+    def setUp(self):
+        base = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        rows = [
+            ('a', {'estado': 'received', 'prioridad': 'Alta'}),
+            ('b', {'estado': 'Completed', 'prioridad': 'Media'}),
+            ('c', {'prioridad': 'Baja'}),
+            ('d', {'estado': 'revisando', 'prioridad': 'ALTA'}),
+            ('e', {'estado': 'resuelto', 'prioridad': 'alta'}),
+            ('f', {'estado': 'Received'}),
+        ]
+        docs = [
+            FakeDoc(doc_id, dict(data, created_at=base + timedelta(minutes=i)))
+            for i, (doc_id, data) in enumerate(rows)
+        ]
+        self.service = object.__new__(FirestoreService)
+        self.service.db = mock.Mock(collection=lambda name: FakeQuery(docs))
+
+    def ids(self, **filters):
+        """Ids of every report matching the filters, read page by page"""
+        ids, token = [], None
+        while True:
+            reports, token = self.service.get_reports_page(page_size=2, page_token=token, **filters)
+            ids.extend(report['id'] for report in reports)
+            if token is None:
+                return sorted(ids)
+
+    def test_capitalized_values_are_matched(self):
+        self.assertEqual(self.ids(prioridad='alta'), ['a', 'd', 'e'])
+        self.assertEqual(self.ids(estado='resuelto'), ['b', 'e'])
+        self.assertEqual(self.service.count_reports(prioridad='alta'), 3)
+
+    def test_missing_and_unknown_estado_count_as_recibido(self):
+        self.assertEqual(self.ids(estado='recibido'), ['a', 'c', 'd', 'f'])
+        # Not countable with a query, so the total is left out
+        self.assertIsNone(self.service.count_reports(estado='recibido'))
+
+    def test_missing_prioridad_counts_as_media(self):
+        self.assertEqual(self.ids(prioridad='media'), ['b', 'f'])
+
+    def test_combined_filters(self):
+        self.assertEqual(self.ids(estado='recibido', prioridad='alta'), ['a', 'd'])
+        self.assertEqual(self.ids(estado='resuelto', prioridad='alta'), ['e'])
+
+    def test_no_next_page_at_the_end(self):
+        first, token = self.service.get_reports_page(page_size=3)
+        self.assertEqual([report['id'] for report in first], ['f', 'e', 'd'])
+        second, token = self.service.get_reports_page(page_size=3, page_token=token)
+        self.assertEqual([report['id'] for report in second], ['c', 'b', 'a'])
+        self.assertIsNone(token)
+        _, token = self.service.get_reports_page(page_size=3, prioridad='alta')
+        self.assertIsNone(token)
+
+    def test_created_at_that_is_not_a_timestamp(self):
+        docs = self.service.db.collection('reports').docs
+        docs.append(FakeDoc('g', {'estado': 'received', 'created_at': '2025-01-02T10:00:00'}))
+        docs.append(FakeDoc('h', {'estado': 'received', 'created_at': 'ayer'}))
+        docs.append(FakeDoc('i', {'estado': 'received'}))
+
+        first, token = self.service.get_reports_page(page_size=2)
+        # Text dates sort first and their token points at the document
+        self.assertEqual([report['id'] for report in first], ['h', 'g'])
+        self.assertIsNotNone(token)
+        self.assertEqual(self.ids(), ['a', 'b', 'c', 'd', 'e', 'f', 'g', 'h'])
+
+
+class FakeBatch:
+    def __init__(self, db):
+        self.db = db
+        self.updates = []
+
+    def update(self, ref, fields):
+        self.updates.append(ref.id)
+
+    def commit(self):
+        self.db.commits.append(len(self.updates))
+        if self.db.missing & set(self.updates):
+            raise Exception('NOT_FOUND: some reports do not exist')
+
+
+class FakeWriteDb:
+    """Records batch commits and single updates; missing ids fail to update"""
+
+    def __init__(self, missing=()):
+        self.missing = set(missing)
+        self.commits = []
+        self.single_updates = []
+
+    def batch(self):
+        return FakeBatch(self)
+
+    def collection(self, name):
+        return mock.Mock(document=self.document)
+
+    def document(self, report_id):
+        def update(fields):
+            self.single_updates.append(report_id)
+            if report_id in self.missing:
+                raise Exception(f'NOT_FOUND: {report_id}')
+        return mock.Mock(id=report_id, update=update)
+
+
+class BatchUpdateTests(SimpleTestCase):
+    def service_with(self, db):
+        service = object.__new__(FirestoreService)
+        service.db = db
+        return service
+
+    def test_updates_are_committed_in_chunks(self):
+        db = FakeWriteDb()
+        ids = [f'r{i}' for i in range(BATCH_WRITE_LIMIT * 2 + 3)]
+        results = self.service_with(db).bulk_update_status(ids, 'completed')
+
+        self.assertEqual(db.commits, [BATCH_WRITE_LIMIT, BATCH_WRITE_LIMIT, 3])
+        self.assertEqual(db.single_updates, [])
+        self.assertEqual([result['id'] for result in results], ids)
+        self.assertTrue(all(result['success'] for result in results))
+
+    def test_failed_chunk_is_retried_one_by_one(self):
+        db = FakeWriteDb(missing={'r1'})
+        results = self.service_with(db).bulk_assign_reports(
+            [(f'r{i}', 'u1', 'Cuadrilla 1') for i in range(3)]
+        )
+
+        self.assertEqual(db.commits, [3])
+        self.assertEqual(db.single_updates, ['r0', 'r1', 'r2'])
+        self.assertEqual([result['success'] for result in results], [True, False, True])
+        self.assertIn('NOT_FOUND', results[1]['error'])
+
+
+class CambiarEstadoMasivoTests(SimpleTestCase):
+    def post(self, body):
+        request = RequestFactory().post(
+            '/api/cambiar-estado-masivo/', data=json.dumps(body), content_type='application/json'
+        )
+        request.user = mock.Mock(is_authenticated=True)
+        return views.cambiar_estado_masivo_view(request)
+
+    def test_rejects_ids_that_are_not_a_list_of_strings(self):
+        with mock.patch.object(views.firestore_service, 'bulk_update_status') as bulk_update:
+            for ids in ('abc', ['r1', 2], ['r1', ''], {'r1': True}):
+                response = self.post({'reportes_ids': ids, 'estado': 'resuelto'})
+                self.assertEqual(response.status_code, 400, ids)
+            bulk_update.assert_not_called()
+
+    def test_updates_a_list_of_ids(self):
+        with mock.patch.object(views.firestore_service, 'bulk_update_status') as bulk_update, \
+                mock.patch.object(views.report_sync, 'mark_stale'):
+            bulk_update.return_value = [
+                {'id': 'r1', 'success': True, 'error': None},
+                {'id': 'r2', 'success': False, 'error': 'NOT_FOUND'},
+            ]
+            response = self.post({'reportes_ids': ['r1', 'r2'], 'estado': 'resuelto'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(bulk_update.call_args[0][0], ['r1', 'r2'])
+        self.assertIn('1 de 2', json.loads(response.content)['message'])
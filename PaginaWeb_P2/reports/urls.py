@@ -14,4 +14,5 @@ urlpatterns = [
     path('historial/', views.historial_view, name='historial'),
     # Nueva ruta para cambiar estado de reportes en Firestore
     path('api/cambiar-estado-reporte/', views.cambiar_estado_reporte_view, name='cambiar_estado_reporte'),
+    path('api/cambiar-estado-masivo/', views.cambiar_estado_masivo_view, name='cambiar_estado_masivo'),
 ]
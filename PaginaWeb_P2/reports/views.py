@@ -6,11 +6,25 @@ from django.db.models import Q, Count
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.utils import timezone
-from django.core.cache import cache
 import json
 import re
+from urllib.parse import urlencode
 from .models import Report, User, Cuadrilla
 from .firestore_service import firestore_service
+from .report_sync import report_sync
+
+
+# Estados de Django y su valor en Firestore (el que usa la app móvil)
+ESTADOS_FIRESTORE = {
+    'recibido': 'received',
+    'asignado': 'assigned',
+    'en_proceso': 'in_progress',
+    'resuelto': 'completed',
+    'cancelado': 'cancelled'
+}
+
+# Reportes por página en la gestión de reportes
+REPORTES_POR_PAGINA = 50
 
 
 def _normalize_value(value):
@@ -144,13 +158,8 @@ def dashboard_view(request):
     """Dashboard usando datos de Firestore"""
     user = request.user
 
-    # Obtener todos los reportes de Firestore (con cache)
-    cache_key = 'firestore_reports_all'
-    all_reports = cache.get(cache_key)
-
-    if all_reports is None:
-        all_reports = firestore_service.get_all_reports(limit=500)
-        cache.set(cache_key, all_reports, 300)
+    # Todos los reportes de Firestore (copia local sincronizada)
+    all_reports = report_sync.get_reports()
 
     # Calcular estadísticas usando los estados actuales
     reportes_recibidos = [r for r in all_reports
@@ -199,12 +208,7 @@ def reportes_asignados_view(request):
     user_token_sets = [_tokenize(value) for value in token_sources if value]
 
     try:
-        cache_key = 'firestore_reports_all'
-        reportes_firestore = cache.get(cache_key)
-
-        if reportes_firestore is None:
-            reportes_firestore = firestore_service.get_all_reports(limit=500)
-            cache.set(cache_key, reportes_firestore, 300)
+        reportes_firestore = report_sync.get_reports()
 
         reportes_base = []
         for reporte in reportes_firestore:
@@ -313,45 +317,38 @@ def historial_view(request):
 
 @login_required
 def gestion_reportes_view(request):
-    """Vista de gestión de reportes usando Firestore"""
-
-    # Intentar obtener reportes de cache
-    cache_key = 'firestore_reports_all'
-    reportes_firestore = cache.get(cache_key)
-
-    if reportes_firestore is None:
-        # Obtener todos los reportes de Firestore
-        reportes_firestore = firestore_service.get_all_reports(limit=500)
-        # Guardar en cache por 5 minutos
-        cache.set(cache_key, reportes_firestore, 300)
-
-    # Aplicar filtros
-    reportes_filtrados = reportes_firestore.copy()
-
+    """Vista de gestión de reportes usando Firestore (una página a la vez)"""
     filtro_estado = request.GET.get('estado', '')
     filtro_tipo = request.GET.get('tipo', '')
     filtro_prioridad = request.GET.get('prioridad', '')
     filtro_cuadrilla = request.GET.get('cuadrilla', '')
+    pagina = request.GET.get('pagina', '')
 
-    if filtro_estado:
-        reportes_filtrados = [r for r in reportes_filtrados
-                              if r.get('estado') == filtro_estado]
-
-    if filtro_tipo:
-        reportes_filtrados = [r for r in reportes_filtrados
-                              if _matches_tipo_residuo(r, filtro_tipo)]
-
-    if filtro_prioridad:
-        reportes_filtrados = [r for r in reportes_filtrados
-                              if r.get('prioridad') == filtro_prioridad]
-
-    # El filtro de cuadrilla solo aplica cuando se trabaja con el modelo local
-    if filtro_cuadrilla and hasattr(reportes_filtrados, 'filter'):
-        reportes_filtrados = reportes_filtrados.filter(cuadrilla_asignada_id=filtro_cuadrilla)
+    # Estado y prioridad se filtran en la consulta; el tipo se mapea en Python
+    try:
+        reportes_pagina, siguiente_pagina = firestore_service.get_reports_page(
+            page_size=REPORTES_POR_PAGINA,
+            page_token=pagina or None,
+            estado=filtro_estado or None,
+            prioridad=filtro_prioridad or None,
+            matches=(lambda r: _matches_tipo_residuo(r, filtro_tipo)) if filtro_tipo else None,
+        )
+    except Exception as e:
+        # Sin esto un índice faltante se vería como "no hay reportes"
+        messages.error(request, f'No se pudieron cargar los reportes de Firestore: {e}')
+        reportes_pagina, siguiente_pagina = [], None
+
+    # El total solo se puede contar en el servidor si no hay filtro de tipo
+    total_reportes = None
+    if not filtro_tipo:
+        total_reportes = firestore_service.count_reports(
+            estado=filtro_estado or None,
+            prioridad=filtro_prioridad or None,
+        )
 
-    # Datos para el mapa
+    # Datos para el mapa (solo la página actual)
     reportes_mapa = []
-    for reporte in reportes_filtrados:
+    for reporte in reportes_pagina:
         if reporte.get('latitud') and reporte.get('longitud'):
             reportes_mapa.append({
                 'id': reporte['id'],
@@ -365,9 +362,23 @@ def gestion_reportes_view(request):
                 'descripcion': reporte.get('descripcion', '')[:100]
             })
 
+    # Filtros actuales para los enlaces de paginación
+    filtros_query = urlencode({
+        clave: valor for clave, valor in (
+            ('estado', filtro_estado),
+            ('tipo', filtro_tipo),
+            ('prioridad', filtro_prioridad),
+            ('cuadrilla', filtro_cuadrilla),
+        ) if valor
+    })
+
     context = {
-        'reportes': reportes_filtrados,
-        'total_reportes': len(reportes_filtrados),
+        'reportes': reportes_pagina,
+        'total_reportes': total_reportes,
+        'reportes_en_pagina': len(reportes_pagina),
+        'siguiente_pagina': siguiente_pagina,
+        'es_primera_pagina': not pagina,
+        'filtros_query': filtros_query,
         'reportes_mapa': json.dumps(reportes_mapa),
         'cuadrillas': Cuadrilla.objects.filter(activa=True),
         'tipos_disponibles': Report.TIPOS_RESIDUO,
@@ -395,12 +406,7 @@ def cuadrillas_view(request):
     usando_firestore = True
 
     try:
-        cache_key = 'firestore_reports_all'
-        reportes_firestore = cache.get(cache_key)
-
-        if reportes_firestore is None:
-            reportes_firestore = firestore_service.get_all_reports(limit=500)
-            cache.set(cache_key, reportes_firestore, 300)
+        reportes_firestore = report_sync.get_reports()
 
         miembros_por_id = {}
         for cuadrilla in cuadrillas:
@@ -483,27 +489,23 @@ def asignar_reportes_masivo_view(request):
                     'error': 'La cuadrilla no tiene miembros'
                 })
 
-            # Actualizar reportes en Firestore
-            asignados = 0
+            # Repartir los reportes entre los miembros (round-robin)
+            asignaciones = []
             for i, reporte_id in enumerate(reportes_ids):
                 miembro = miembros[i % len(miembros)]
+                asignaciones.append((reporte_id, str(miembro.id), miembro.get_full_name()))
 
-                # Actualizar en Firestore
-                success = firestore_service.assign_report_to_user(
-                    reporte_id,
-                    str(miembro.id),
-                    miembro.get_full_name()
-                )
+            # Actualizar en Firestore con escrituras por lotes
+            resultados = firestore_service.bulk_assign_reports(asignaciones)
+            asignados = sum(resultado['success'] for resultado in resultados)
 
-                if success:
-                    asignados += 1
-
-            # Limpiar cache
-            cache.delete('firestore_reports_all')
+            # Traer los cambios en la próxima lectura
+            report_sync.mark_stale()
 
             return JsonResponse({
                 'success': True,
-                'message': f'{asignados} reportes asignados a {cuadrilla.nombre}'
+                'message': f'{asignados} reportes asignados a {cuadrilla.nombre}',
+                'resultados': resultados
             })
 
         except Exception as e:
@@ -560,15 +562,7 @@ def cambiar_estado_reporte_view(request):
                 }, status=400)
 
             # Mapear estados de Django a Firestore
-            estado_mapping = {
-                'recibido': 'received',
-                'asignado': 'assigned',
-                'en_proceso': 'in_progress',
-                'resuelto': 'completed',
-                'cancelado': 'cancelled'
-            }
-
-            estado_firestore = estado_mapping.get(nuevo_estado, nuevo_estado)
+            estado_firestore = ESTADOS_FIRESTORE.get(nuevo_estado, nuevo_estado)
 
             # Actualizar en Firestore
             success = firestore_service.update_report_status(
@@ -577,8 +571,8 @@ def cambiar_estado_reporte_view(request):
             )
 
             if success:
-                # Limpiar cache para reflejar cambios
-                cache.delete('firestore_reports_all')
+                # Traer los cambios en la próxima lectura
+                report_sync.mark_stale()
 
                 return JsonResponse({
                     'success': True,
@@ -607,3 +601,70 @@ def cambiar_estado_reporte_view(request):
         'success': False,
         'error': 'Método no permitido. Use POST'
     }, status=405)
+
+
+@login_required
+@csrf_exempt
+def cambiar_estado_masivo_view(request):
+    """
+    API endpoint para cambiar el estado de varios reportes en Firestore
+    Usa escrituras por lotes y devuelve el resultado de cada reporte
+    """
+    if request.method != 'POST':
+        return JsonResponse({
+            'success': False,
+            'error': 'Método no permitido. Use POST'
+        }, status=405)
+
+    try:
+        data = json.loads(request.body)
+        reportes_ids = data.get('reportes_ids') or []
+        nuevo_estado = data.get('estado')
+
+        if not reportes_ids or not nuevo_estado:
+            return JsonResponse({
+                'success': False,
+                'error': 'Faltan parámetros requeridos'
+            }, status=400)
+
+        # Un texto se recorrería letra por letra como si fueran ids
+        if not isinstance(reportes_ids, list) or not all(
+            isinstance(reporte_id, str) and reporte_id for reporte_id in reportes_ids
+        ):
+            return JsonResponse({
+                'success': False,
+                'error': 'reportes_ids debe ser una lista de ids de reportes'
+            }, status=400)
+
+        if nuevo_estado not in ESTADOS_FIRESTORE:
+            return JsonResponse({
+                'success': False,
+                'error': f'Estado inválido: {nuevo_estado}'
+            }, status=400)
+
+        resultados = firestore_service.bulk_update_status(
+            reportes_ids,
+            ESTADOS_FIRESTORE[nuevo_estado]
+        )
+        actualizados = sum(resultado['success'] for resultado in resultados)
+
+        # Traer los cambios en la próxima lectura
+        report_sync.mark_stale()
+
+        return JsonResponse({
+            'success': actualizados > 0,
+            'message': f'{actualizados} de {len(reportes_ids)} reportes actualizados a {nuevo_estado}',
+            'nuevo_estado': nuevo_estado,
+            'resultados': resultados
+        })
+
+    except json.JSONDecodeError:
+        return JsonResponse({
+            'success': False,
+            'error': 'JSON inválido'
+        }, status=400)
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=500)
@@ -0,0 +1,151 @@
+# Admission control: bound in-flight and queued classification work
+import asyncio
+import logging
+import math
+from collections import deque
+from typing import Optional
+
+from . import config
+from .metrics import REJECTED_TOTAL
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed instead of queued"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Let at most max_in_flight requests run and max_queued wait for a slot
+
+    Anything beyond that is rejected immediately, so a burst costs the
+    client a quick 429 instead of a slow timeout. Waiting requests are
+    served in arrival order and give up once their deadline passes. Slots
+    are handed straight from a finishing request to the oldest waiter.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = 32,
+        max_queued: int = 64,
+        deadline_s: float = 30.0
+    ):
+        self.max_in_flight = max(0, max_in_flight)
+        self.max_queued = max(0, max_queued)
+        self.deadline_s = deadline_s
+        self.in_flight = 0
+        self.rejected_total = 0
+        self.expired_total = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        # Moving average of how long an admitted request holds its slot
+        self._avg_service_s: Optional[float] = None
+
+    @property
+    def enabled(self) -> bool:
+        """Check if a concurrency limit is configured"""
+        return self.max_in_flight > 0
+
+    @property
+    def queued(self) -> int:
+        """Requests waiting for a slot"""
+        return len(self._waiters)
+
+    def retry_after(self) -> int:
+        """Seconds a rejected client should wait, from the current backlog"""
+        if self._avg_service_s is None or not self.enabled:
+            return 1
+        backlog = (self.queued + 1) * self._avg_service_s / self.max_in_flight
+        return min(60, max(1, math.ceil(backlog)))
+
+    async def acquire(self, timeout_s: Optional[float] = None) -> float:
+        """
+        Wait for a slot
+
+        Args:
+            timeout_s: Time budget the client asked for, if shorter than
+                deadline_s
+
+        Returns:
+            The request deadline (event loop time)
+
+        Raises:
+            AdmissionRejected: If the queue is full or the deadline passes
+                while waiting
+        """
+        loop = asyncio.get_running_loop()
+        budget = self.deadline_s if timeout_s is None else min(self.deadline_s, timeout_s)
+        deadline = loop.time() + budget
+
+        if not self.enabled or (self.in_flight < self.max_in_flight and not self._waiters):
+            self.in_flight += 1
+            return deadline
+
+        if len(self._waiters) >= self.max_queued:
+            self.rejected_total += 1
+            REJECTED_TOTAL.labels(reason="queue_full").inc()
+            raise AdmissionRejected("Server busy, try again later", self.retry_after())
+
+        waiter = loop.create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout=deadline - loop.time())
+        except asyncio.TimeoutError:
+            self.expired_total += 1
+            REJECTED_TOTAL.labels(reason="queue_timeout").inc()
+            raise AdmissionRejected("Timed out waiting for capacity", self.retry_after())
+        except asyncio.CancelledError:
+            # The client went away right after being handed a slot
+            if waiter.done() and not waiter.cancelled():
+                self._hand_off()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        return deadline
+
+    def release(self, service_s: float):
+        """
+        Free a slot, handing it to the oldest waiter if there is one
+
+        Args:
+            service_s: How long the request held its slot
+        """
+        if self._avg_service_s is None:
+            self._avg_service_s = service_s
+        else:
+            self._avg_service_s = 0.9 * self._avg_service_s + 0.1 * service_s
+        self._hand_off()
+
+    def _hand_off(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def stats(self) -> dict:
+        """Return limits, occupancy and rejection counters"""
+        return {
+            "enabled": self.enabled,
+            "max_in_flight": self.max_in_flight,
+            "max_queued": self.max_queued,
+            "deadline_s": self.deadline_s,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "rejected_total": self.rejected_total,
+            "expired_total": self.expired_total,
+        }
+
+
+# Global shared controller
+admission_controller = AdmissionController(
+    max_in_flight=config.MAX_IN_FLIGHT_REQUESTS,
+    max_queued=config.MAX_QUEUED_REQUESTS,
+    deadline_s=config.REQUEST_DEADLINE_S
+)
@@ -0,0 +1,256 @@
+"""
+Classify the historical report corpus without going through the API
+
+Streams backend/reports/*.json, decodes each report's image from
+backend/images/ in a pool of worker processes, runs batched inference on
+WasteClassifierModel directly and appends one JSON line per report to the
+output file. The output doubles as the checkpoint: a rerun skips every
+report id already written, so an interrupted backfill resumes where it
+stopped.
+
+Usage (from ia-clasificacion-residuos/):
+    python -m app.backfill --output backfill.jsonl
+    python -m app.backfill --all --workers 4 --batch-size 64 --model models/waste_classifier_v1_int8.tflite
+
+Each output line looks like:
+    {"report_id": "ECO-05239FF1", "classification": "Aprovechable",
+     "confidence": 0.91, "model_version": "1.0.0"}
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterator, Optional
+
+import numpy as np
+
+from . import config
+from .model_loader import WasteClassifierModel
+from .workers import limit_worker_memory
+
+logger = logging.getLogger(__name__)
+
+BACKEND_DIR = Path(__file__).resolve().parents[2] / "backend"
+DEFAULT_REPORTS = BACKEND_DIR / "reports"
+DEFAULT_IMAGES = BACKEND_DIR / "images"
+
+# Preprocessor owned by a decode worker (set by _init_decoder)
+_decoder: Optional[WasteClassifierModel] = None
+
+
+def _init_decoder():
+    """Create the preprocessor once per worker process (no network needed)"""
+    global _decoder
+    _decoder = WasteClassifierModel()
+    limit_worker_memory()
+
+
+def _decode(image_path: str) -> np.ndarray:
+    return _decoder.preprocess_image(Path(image_path).read_bytes())
+
+
+def iter_reports(reports_dir: Path, images_dir: Path, include_classified: bool) -> Iterator[tuple[str, Path]]:
+    """
+    Yield (report_id, image_path) for every report that needs a prediction
+
+    Files are read one at a time, so memory stays flat however large the
+    corpus is.
+    """
+    for report_file in sorted(reports_dir.glob("*.json")):
+        try:
+            report = json.loads(report_file.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ Skipping unreadable report {report_file.name}: {e}")
+            continue
+
+        if report.get("is_ai_classified") and not include_classified:
+            continue
+        image_path = report.get("image_path")
+        if not image_path:
+            continue
+        yield report.get("id") or report_file.stem, images_dir / Path(image_path).name
+
+
+def load_checkpoint(output: Path, retry_errors: bool) -> set[str]:
+    """
+    Return the report ids already written to the output file
+
+    A crash mid-write can leave a partial last line; it is truncated so
+    new results start on a clean line.
+    """
+    done = set()
+    if not output.exists():
+        return done
+
+    data = output.read_bytes()
+    if data and not data.endswith(b"\n"):
+        with output.open("r+b") as f:
+            f.truncate(data.rfind(b"\n") + 1)
+        data = data[:data.rfind(b"\n") + 1]
+
+    for line in data.decode("utf-8").splitlines():
+        row = json.loads(line)
+        if retry_errors and row.get("error"):
+            continue
+        done.add(row["report_id"])
+    return done
+
+
+class Backfill:
+    """Decode in a process pool while the main process runs batched inference"""
+
+    def __init__(
+        self,
+        model: WasteClassifierModel,
+        output: Path,
+        batch_size: int = 32,
+        workers: int = 0
+    ):
+        self.model = model
+        self.output = output
+        self.batch_size = max(1, batch_size)
+        self.workers = max(0, workers)
+        self.written = 0
+        self.errors = 0
+
+    def run(self, reports: Iterator[tuple[str, Path]]):
+        executor: Optional[Executor] = None
+        if self.workers:
+            executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context(config.WORKER_START_METHOD),
+                initializer=_init_decoder
+            )
+
+        # Keep about two batches of decodes in flight ahead of inference
+        pending: deque[tuple[str, Future]] = deque()
+        prefetch = self.batch_size * 2
+
+        try:
+            with self.output.open("a", encoding="utf-8") as out:
+                batch: list[tuple[str, np.ndarray]] = []
+                reports = iter(reports)
+                exhausted = False
+                while pending or not exhausted:
+                    while not exhausted and len(pending) < prefetch:
+                        item = next(reports, None)
+                        if item is None:
+                            exhausted = True
+                            break
+                        report_id, image_path = item
+                        pending.append((report_id, self._submit(executor, image_path)))
+
+                    if not pending:
+                        break
+                    report_id, future = pending.popleft()
+                    try:
+                        batch.append((report_id, future.result()))
+                    except Exception as e:
+                        self._write(out, {"report_id": report_id, "error": f"Could not decode image: {e}"})
+
+                    if len(batch) >= self.batch_size:
+                        self._flush(out, batch)
+                        batch = []
+
+                if batch:
+                    self._flush(out, batch)
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+
+    def _submit(self, executor: Optional[Executor], image_path: Path) -> Future:
+        """Decode on the pool, or inline when running without workers"""
+        if executor is not None:
+            return executor.submit(_decode, str(image_path))
+        future = Future()
+        try:
+            future.set_result(self.model.preprocess_image(image_path.read_bytes()))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def _flush(self, out, batch: list[tuple[str, np.ndarray]]):
+        """Run one forward pass and checkpoint its results"""
+        stacked = np.concatenate([array for _, array in batch], axis=0)
+        predictions = self.model.predict_batch(stacked)
+        for (report_id, _), (classification, confidence) in zip(batch, predictions):
+            self._write(out, {
+                "report_id": report_id,
+                "classification": classification,
+                "confidence": round(confidence, 4),
+                "model_version": self.model.version,
+            })
+        out.flush()
+        os.fsync(out.fileno())
+        logger.info(f"✅ Classified {self.written} reports ({self.errors} errors)")
+
+    def _write(self, out, row: dict):
+        out.write(json.dumps(row, ensure_ascii=False) + "\n")
+        if row.get("error"):
+            self.errors += 1
+            logger.warning(f"⚠️ {row['report_id']}: {row['error']}")
+        else:
+            self.written += 1
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Classify historical reports in bulk")
+    parser.add_argument("--reports-dir", type=Path, default=DEFAULT_REPORTS)
+    parser.add_argument("--images-dir", type=Path, default=DEFAULT_IMAGES)
+    parser.add_argument("--output", type=Path, default=Path("backfill.jsonl"),
+                        help="JSON lines output, also used as the resume checkpoint")
+    parser.add_argument("--model", default=config.MODEL_PATH)
+    parser.add_argument("--engine", default=config.MODEL_ENGINE)
+    parser.add_argument("--version", default=config.MODEL_VERSION, help="Model version written per report")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Decode worker processes (0 decodes in this process)")
+    parser.add_argument("--all", action="store_true",
+                        help="Also reclassify reports already marked is_ai_classified")
+    parser.add_argument("--retry-errors", action="store_true",
+                        help="Retry reports whose image failed in a previous run")
+    parser.add_argument("--allow-dummy", action="store_true",
+                        help="Run with the random test model when no model file exists")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s - %(message)s')
+
+    model = WasteClassifierModel(model_path=args.model, engine=args.engine, version=args.version)
+    if not model.load():
+        logger.error(f"❌ Could not load model from {args.model}")
+        return 1
+    if model.is_dummy and not args.allow_dummy:
+        logger.error(f"❌ Model file not found at {args.model} (pass --allow-dummy to test with random weights)")
+        return 1
+
+    done = load_checkpoint(args.output, args.retry_errors)
+    if done:
+        logger.info(f"♻️ Resuming: {len(done)} reports already in {args.output}")
+
+    reports = (
+        (report_id, image_path)
+        for report_id, image_path in iter_reports(args.reports_dir, args.images_dir, args.all)
+        if report_id not in done
+    )
+
+    started = time.perf_counter()
+    backfill = Backfill(model, args.output, batch_size=args.batch_size, workers=args.workers)
+    backfill.run(reports)
+    elapsed = time.perf_counter() - started
+
+    total = backfill.written + backfill.errors
+    logger.info(
+        f"🏁 Backfill finished: {backfill.written} classified, {backfill.errors} errors "
+        f"in {elapsed:.1f}s ({total / elapsed if elapsed else 0:.1f} reports/s)"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,230 @@
+# Dynamic micro-batching scheduler for model inference
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional
+
+import numpy as np
+
+from .metrics import BATCH_SIZE, observe_stage, record_cancelled
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _PendingItem:
+    """A preprocessed image waiting for a batch slot"""
+    array: np.ndarray
+    future: asyncio.Future
+    enqueued_at: float
+    # Set once the item is part of a batch being run
+    running: bool = False
+
+
+class BatchScheduler:
+    """
+    Gather concurrent inference requests into micro-batches
+
+    A batch is closed when it reaches max_batch_size or when its oldest
+    item has waited max_wait_ms, whichever happens first. Each batch runs
+    a single forward pass through predict_fn (a coroutine, e.g.
+    InferencePool.predict_batch) and the results are fanned back to every
+    awaiting request.
+    """
+
+    def __init__(
+        self,
+        predict_fn: Callable[[np.ndarray], Awaitable[list]],
+        max_batch_size: int = 16,
+        max_wait_ms: float = 10.0,
+        stats_window: int = 1000
+    ):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_ms = max(0.0, max_wait_ms)
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+        # Counters and a sliding window used to tune size vs. latency
+        self.batches_total = 0
+        self.items_total = 0
+        self.last_batch_size = 0
+        self._recent_sizes = deque(maxlen=stats_window)
+        self._recent_waits_ms = deque(maxlen=stats_window)
+
+    @property
+    def running(self) -> bool:
+        """Check if the batching loop is active"""
+        return self._worker is not None and not self._worker.done()
+
+    async def start(self):
+        """Start the background batching loop"""
+        if self.running:
+            return
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.create_task(self._run())
+        logger.info(
+            f"🧺 Batch scheduler started "
+            f"(max_batch_size={self.max_batch_size}, max_wait_ms={self.max_wait_ms})"
+        )
+
+    async def stop(self):
+        """Stop the batching loop and fail any request still queued"""
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+
+        while self._queue is not None and not self._queue.empty():
+            item = self._queue.get_nowait()
+            if not item.future.done():
+                item.future.set_exception(RuntimeError("Batch scheduler stopped"))
+        logger.info("🛑 Batch scheduler stopped")
+
+    async def submit(self, image_array: np.ndarray) -> tuple[str, float]:
+        """
+        Queue a preprocessed image and wait for its prediction
+
+        Args:
+            image_array: Preprocessed image with a leading batch dimension of 1
+
+        Returns:
+            Tuple of (classification, confidence)
+
+        Raises:
+            RuntimeError: If the scheduler is not running
+        """
+        if not self.running:
+            raise RuntimeError("Batch scheduler is not running")
+
+        loop = asyncio.get_running_loop()
+        item = _PendingItem(image_array, loop.create_future(), loop.time())
+        await self._queue.put(item)
+        try:
+            return await item.future
+        except asyncio.CancelledError:
+            # A cancelled item still queued is skipped when its batch is collected
+            record_cancelled("inference" if item.running else "queue_wait")
+            raise
+
+    def stats(self) -> dict:
+        """Return batch size and queue wait statistics"""
+        sizes = list(self._recent_sizes)
+        waits = sorted(self._recent_waits_ms)
+        return {
+            "enabled": self.running,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "batches_total": self.batches_total,
+            "items_total": self.items_total,
+            "last_batch_size": self.last_batch_size,
+            "avg_batch_size": round(sum(sizes) / len(sizes), 2) if sizes else 0.0,
+            "avg_wait_ms": round(sum(waits) / len(waits), 2) if waits else 0.0,
+            "p99_wait_ms": round(waits[int(0.99 * (len(waits) - 1))], 2) if waits else 0.0,
+        }
+
+    async def _run(self):
+        """Main loop: collect a batch, run it, repeat"""
+        while True:
+            batch = await self._collect()
+            if batch:
+                await self._process(batch)
+
+    async def _collect(self) -> list[_PendingItem]:
+        """Wait for the first item, then fill the batch until full or timed out"""
+        loop = asyncio.get_running_loop()
+        first = await self._queue.get()
+        batch = [first]
+        deadline = first.enqueued_at + self.max_wait_ms / 1000.0
+
+        while len(batch) < self.max_batch_size:
+            # Take whatever is already queued without yielding
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+
+        # Requests whose caller already gave up don't need a slot
+        return [item for item in batch if not item.future.done()]
+
+    async def _process(self, batch: list[_PendingItem]):
+        """Run one forward pass for the batch and resolve every future"""
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        for item in batch:
+            item.running = True
+        waits_ms = [(started - item.enqueued_at) * 1000 for item in batch]
+        for wait_ms in waits_ms:
+            observe_stage("queue_wait", wait_ms / 1000)
+        BATCH_SIZE.observe(len(batch))
+
+        try:
+            results, inference_ms = await self._predict(batch)
+        except asyncio.CancelledError:
+            # stop() while this batch runs: don't leave its callers waiting
+            self._fail(batch, RuntimeError("Batch scheduler stopped"))
+            raise
+        except Exception as e:
+            if len(batch) == 1:
+                logger.error(f"❌ Batch inference failed: {e}")
+                self._fail(batch, e)
+                return
+            # One bad item must not fail the others: run them one by one
+            logger.warning(f"⚠️ Batch of {len(batch)} failed ({e}), retrying items one at a time")
+            for item in batch:
+                try:
+                    (result,), _ = await self._predict([item])
+                except asyncio.CancelledError:
+                    self._fail(batch, RuntimeError("Batch scheduler stopped"))
+                    raise
+                except Exception as item_error:
+                    logger.error(f"❌ Inference failed for one item: {item_error}")
+                    self._fail([item], item_error)
+                else:
+                    if not item.future.done():
+                        item.future.set_result(result)
+            return
+
+        for item, result in zip(batch, results):
+            if not item.future.done():
+                item.future.set_result(result)
+
+        self.batches_total += 1
+        self.items_total += len(batch)
+        self.last_batch_size = len(batch)
+        self._recent_sizes.append(len(batch))
+        self._recent_waits_ms.extend(waits_ms)
+
+        logger.debug(
+            f"🧺 Batch of {len(batch)} ran in {inference_ms:.1f}ms "
+            f"(max queue wait {max(waits_ms):.1f}ms)"
+        )
+
+    async def _predict(self, batch: list[_PendingItem]) -> tuple[list, float]:
+        """Stack the batch and run one forward pass, returning (results, ms)"""
+        stacked = np.concatenate([item.array for item in batch], axis=0)
+        inference_start = time.time()
+        results = await self.predict_fn(stacked)
+        inference_ms = (time.time() - inference_start) * 1000
+        observe_stage("inference", inference_ms / 1000)
+        return results, inference_ms
+
+    def _fail(self, batch: list[_PendingItem], error: BaseException):
+        """Resolve every unfinished future of the batch with error"""
+        for item in batch:
+            if not item.future.done():
+                item.future.set_exception(error)
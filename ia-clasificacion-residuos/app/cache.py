@@ -0,0 +1,185 @@
+# Content-addressed prediction cache
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from . import config
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _CacheEntry:
+    """A cached prediction and when it stops being valid"""
+    prediction: tuple[str, float]
+    expires_at: float
+    # Report whose image first produced the prediction
+    origin: Optional[str] = None
+
+
+class PredictionCache:
+    """
+    Bounded LRU cache of predictions keyed by a hash of the image bytes
+
+    Entries expire after ttl_seconds and are scoped to the model version
+    that produced them, so several versions can serve side by side (see
+    ModelRegistry) without returning each other's predictions. A report_id
+    can be linked to a content key so that idempotent retries skip the
+    download too.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600.0):
+        self.max_entries = max(0, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[tuple[str, str], _CacheEntry] = OrderedDict()
+        self._by_report: OrderedDict[tuple[str, str], str] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        """Check if the cache stores anything at all"""
+        return self.max_entries > 0
+
+    @staticmethod
+    def key_for(image_bytes: bytes) -> str:
+        """Return the content key for raw image bytes"""
+        return hashlib.sha256(image_bytes).hexdigest()
+
+    def get(self, key: str, version: str) -> Optional[tuple[str, float]]:
+        """
+        Look up a prediction by content key
+
+        Args:
+            key: Content key from key_for()
+            version: Version of the model that would serve the request
+
+        Returns:
+            Tuple of (classification, confidence) or None on a miss
+        """
+        if not self.enabled:
+            return None
+
+        scoped = (version, key)
+        entry = self._entries.get(scoped)
+        if entry is None or entry.expires_at < time.monotonic():
+            if entry is not None:
+                del self._entries[scoped]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(scoped)
+        self.hits += 1
+        return entry.prediction
+
+    def get_by_report(self, report_id: str, version: str) -> Optional[tuple[str, float]]:
+        """
+        Look up a prediction by report id (idempotent retries)
+
+        Only hits are counted here; a miss falls through to the content
+        lookup, which records it.
+        """
+        if not self.enabled:
+            return None
+
+        key = self._by_report.get((version, report_id))
+        if key is None:
+            return None
+        scoped = (version, key)
+        entry = self._entries.get(scoped)
+        if entry is None or entry.expires_at < time.monotonic():
+            return None
+
+        self._entries.move_to_end(scoped)
+        self.hits += 1
+        return entry.prediction
+
+    def put(
+        self,
+        key: str,
+        prediction: tuple[str, float],
+        version: str,
+        report_id: Optional[str] = None,
+        origin: Optional[str] = None
+    ):
+        """
+        Store a prediction
+
+        Args:
+            key: Content key from key_for()
+            prediction: Tuple of (classification, confidence)
+            version: Version of the model that produced the prediction
+            report_id: Optional report id to link to this content key
+            origin: Report the prediction was first made for, when it was
+                reused from a near-duplicate photo (defaults to report_id)
+        """
+        if not self.enabled:
+            return
+
+        scoped = (version, key)
+        self._entries[scoped] = _CacheEntry(
+            prediction,
+            time.monotonic() + self.ttl_seconds,
+            origin or report_id
+        )
+        self._entries.move_to_end(scoped)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+        if report_id:
+            self.link_report(report_id, key, version)
+
+    def origin_of(
+        self,
+        version: str,
+        key: Optional[str] = None,
+        report_id: Optional[str] = None
+    ) -> Optional[str]:
+        """Return the report a cached prediction was first made for"""
+        if report_id and key is None:
+            key = self._by_report.get((version, report_id))
+        entry = self._entries.get((version, key)) if key else None
+        return entry.origin if entry is not None else None
+
+    def link_report(self, report_id: str, key: str, version: str):
+        """Associate a report id with a content key for one model version"""
+        if not self.enabled:
+            return
+        self._by_report[(version, report_id)] = key
+        self._by_report.move_to_end((version, report_id))
+        while len(self._by_report) > self.max_entries:
+            self._by_report.popitem(last=False)
+
+    def clear(self, version: Optional[str] = None):
+        """Drop every cached prediction, or only those of one model version"""
+        if version is None:
+            self._entries.clear()
+            self._by_report.clear()
+            return
+        for scoped in [k for k in self._entries if k[0] == version]:
+            del self._entries[scoped]
+        for scoped in [k for k in self._by_report if k[0] == version]:
+            del self._by_report[scoped]
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and occupancy"""
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+# Global shared cache
+prediction_cache = PredictionCache(
+    max_entries=config.PREDICTION_CACHE_SIZE,
+    ttl_seconds=config.PREDICTION_CACHE_TTL_S
+)
@@ -1,94 +1,327 @@
 # Image downloader and classifier
+import asyncio
 import logging
-import requests
-from typing import Optional
+import httpx
+from typing import AsyncIterator, Optional
+from urllib.parse import urlsplit
 import time
 
+from . import config
+from .metrics import BATCH_SIZE, record_prediction, time_stage
+from .model_loader import ImageTooLargeError
+from .singleflight import flight_keys
+from .phash import dhash
+
 logger = logging.getLogger(__name__)
 
+class ImageDownloadError(ValueError):
+    """Raised when an image URL could not be fetched (may succeed on retry)"""
+
+async def read_limited(chunks: AsyncIterator[bytes], max_size_mb: int) -> bytes:
+    """
+    Collect a streamed body, aborting as soon as it passes the size limit
+    
+    Args:
+        chunks: Async iterator of body chunks
+        max_size_mb: Maximum allowed size in MB
+        
+    Returns:
+        The complete body
+        
+    Raises:
+        ImageTooLargeError: If the body is larger than max_size_mb
+    """
+    max_bytes = max_size_mb * 1024 * 1024
+    buffer = bytearray()
+    async for chunk in chunks:
+        buffer.extend(chunk)
+        if len(buffer) > max_bytes:
+            raise ImageTooLargeError(f"Image exceeds {max_size_mb}MB")
+    return bytes(buffer)
+
 class ImageDownloader:
-    """Download images from URLs safely"""
+    """
+    Download images from URLs safely without blocking the event loop
+    
+    All downloads share one keep-alive connection pool, and a semaphore per
+    host caps how many run against the same server at once.
+    """
+    
+    def __init__(
+        self,
+        max_connections: int = config.DOWNLOAD_MAX_CONNECTIONS,
+        max_per_host: int = config.DOWNLOAD_MAX_PER_HOST,
+        connect_timeout: float = config.DOWNLOAD_CONNECT_TIMEOUT_S,
+        read_timeout: float = config.DOWNLOAD_READ_TIMEOUT_S,
+        max_size_mb: int = config.MAX_IMAGE_SIZE_MB
+    ):
+        self.max_connections = max_connections
+        self.max_per_host = max(1, max_per_host)
+        self.timeout = httpx.Timeout(
+            connect=connect_timeout,
+            read=read_timeout,
+            write=read_timeout,
+            pool=connect_timeout + read_timeout
+        )
+        self.max_size_mb = max_size_mb
+        self._client: Optional[httpx.AsyncClient] = None
+        self._host_limits: dict[str, asyncio.Semaphore] = {}
     
-    @staticmethod
-    def download(url: str, max_size_mb: int = 10) -> Optional[bytes]:
+    async def start(self):
+        """Open the shared connection pool"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections
+                ),
+                headers={'User-Agent': 'EcoTrack-AI-Classifier/1.0'},
+                follow_redirects=True
+            )
+    
+    async def close(self):
+        """Close the shared connection pool"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        self._host_limits.clear()
+    
+    def _host_limit(self, url: str) -> asyncio.Semaphore:
+        """Return the concurrency limiter for the URL's host"""
+        host = urlsplit(url).netloc
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(self.max_per_host)
+        return self._host_limits[host]
+    
+    async def download(self, url: str, max_size_mb: Optional[int] = None) -> Optional[bytes]:
         """
         Download image from URL with validations
         
         Args:
             url: Image URL
-            max_size_mb: Maximum allowed image size in MB
+            max_size_mb: Maximum allowed image size in MB (defaults to the
+                downloader's limit)
             
         Returns:
             Image bytes or None if download failed
         """
+        if self._client is None:
+            await self.start()
+        
+        max_size_mb = max_size_mb or self.max_size_mb
+        max_bytes = max_size_mb * 1024 * 1024
+        
         try:
-            # Download with timeout
-            response = requests.get(
-                url,
-                timeout=15,
-                stream=True,
-                headers={'User-Agent': 'EcoTrack-AI-Classifier/1.0'}
-            )
-            response.raise_for_status()
-            
-            # Validate Content-Type
-            content_type = response.headers.get('Content-Type', '')
-            if not content_type.startswith('image/'):
-                logger.error(f"❌ Invalid content type: {content_type}")
-                return None
-            
-            # Validate size
-            content_length = response.headers.get('Content-Length')
-            if content_length:
-                size_mb = int(content_length) / (1024 * 1024)
-                if size_mb > max_size_mb:
-                    logger.error(f"❌ Image too large: {size_mb:.2f}MB")
-                    return None
-            
-            # Read content
-            image_bytes = response.content
+            async with self._host_limit(url):
+                async with self._client.stream('GET', url) as response:
+                    response.raise_for_status()
+                    
+                    # Validate Content-Type
+                    content_type = response.headers.get('Content-Type', '')
+                    if not content_type.startswith('image/'):
+                        logger.error(f"❌ Invalid content type: {content_type}")
+                        return None
+                    
+                    # Validate declared size
+                    content_length = response.headers.get('Content-Length')
+                    if content_length and int(content_length) > max_bytes:
+                        size_mb = int(content_length) / (1024 * 1024)
+                        logger.error(f"❌ Image too large: {size_mb:.2f}MB")
+                        return None
+                    
+                    # Stream content, aborting as soon as the limit is passed
+                    image_bytes = await read_limited(response.aiter_bytes(), max_size_mb)
             
-            # Validate actual size
             actual_size_mb = len(image_bytes) / (1024 * 1024)
-            if actual_size_mb > max_size_mb:
-                logger.error(f"❌ Downloaded image exceeds {max_size_mb}MB")
-                return None
-            
             logger.info(f"✅ Downloaded image ({actual_size_mb:.2f}MB)")
             return image_bytes
             
-        except requests.exceptions.RequestException as e:
+        except ImageTooLargeError as e:
+            logger.error(f"❌ Downloaded image too large: {e}")
+            return None
+        except httpx.HTTPError as e:
             logger.error(f"❌ Error downloading image: {e}")
             return None
 
+# Global shared downloader
+image_downloader = ImageDownloader()
+
 async def classify_waste(
     image_url: str,
-    model
-) -> tuple[str, float, int]:
+    model,
+    scheduler=None,
+    downloader: Optional[ImageDownloader] = None,
+    cache=None,
+    report_id: Optional[str] = None,
+    pool=None,
+    flight=None,
+    phash_index=None
+) -> tuple[str, float, int, Optional[str]]:
     """
     Classify waste from an image URL
     
     Args:
         image_url: Public URL of the image
         model: Loaded classifier model
+        scheduler: Optional BatchScheduler that groups concurrent requests
+            into a single forward pass
+        downloader: ImageDownloader to fetch the image with (defaults to
+            the shared pooled downloader)
+        cache: Optional PredictionCache consulted before inference
+        report_id: Report ID, used to answer idempotent retries from cache
+        pool: Optional InferencePool that decodes the image off the event
+            loop (defaults to a thread of this process)
+        flight: Optional SingleFlight; a request for an image URL or report
+            already being classified waits for that result instead
+        phash_index: Optional PerceptualIndex; a photo that looks like a
+            recent one reuses its prediction
         
     Returns:
-        Tuple of (classification, confidence, processing_time_ms)
+        Tuple of (classification, confidence, processing_time_ms,
+        duplicate_of), where duplicate_of is the report whose photo this
+        one duplicates, if any
         
     Raises:
         ValueError: If image download fails
     """
     start_time = time.time()
     
+    # Retried report: answer without downloading again
+    if cache is not None and report_id:
+        cached = cache.get_by_report(report_id, model.version)
+        if cached is not None:
+            classification, confidence = cached
+            record_prediction(classification, model.version, "cache")
+            processing_time = int((time.time() - start_time) * 1000)
+            logger.info(f"♻️ Cache hit for report {report_id}")
+            duplicate_of = _other_report(cache.origin_of(model.version, report_id=report_id), report_id)
+            return classification, confidence, processing_time, duplicate_of
+    
+    if flight is not None:
+        async def _shared():
+            # Followers may carry another report id, so share where the
+            # prediction came from rather than who it duplicates
+            *prediction, duplicate_of = await classify_waste(
+                image_url, model, scheduler, downloader, cache, report_id, pool,
+                phash_index=phash_index
+            )
+            return (*prediction, duplicate_of or report_id)
+        
+        classification, confidence, _, origin = await flight.run(
+            flight_keys(model.version, image_url, report_id), _shared
+        )
+        processing_time = int((time.time() - start_time) * 1000)
+        return classification, confidence, processing_time, _other_report(origin, report_id)
+    
     # Download image
-    downloader = ImageDownloader()
-    image_bytes = downloader.download(image_url)
+    downloader = downloader or image_downloader
+    with time_stage("download"):
+        image_bytes = await downloader.download(image_url)
     
     if not image_bytes:
-        raise ValueError("Failed to download image")
+        raise ImageDownloadError("Failed to download image")
     
-    # Classify
-    classification, confidence = model.predict(image_bytes)
+    return await classify_image_bytes(
+        image_bytes,
+        model,
+        scheduler=scheduler,
+        cache=cache,
+        report_id=report_id,
+        pool=pool,
+        start_time=start_time,
+        phash_index=phash_index
+    )
+
+def _other_report(origin: Optional[str], report_id: Optional[str]) -> Optional[str]:
+    """Return origin when it is a different report than report_id"""
+    return origin if origin and origin != report_id else None
+
+async def classify_image_bytes(
+    image_bytes: bytes,
+    model,
+    scheduler=None,
+    cache=None,
+    report_id: Optional[str] = None,
+    pool=None,
+    start_time: Optional[float] = None,
+    phash_index=None
+) -> tuple[str, float, int, Optional[str]]:
+    """
+    Classify an image that is already in memory (downloaded or uploaded)
+    
+    Args:
+        image_bytes: Raw image bytes
+        model: Loaded classifier model
+        scheduler: Optional BatchScheduler for the forward pass
+        cache: Optional PredictionCache consulted before inference
+        report_id: Report ID linked to the cached prediction
+        pool: Optional InferencePool that decodes the image off the event loop
+        start_time: When the request started (defaults to now)
+        phash_index: Optional PerceptualIndex consulted after decoding;
+            a near-duplicate of a recent photo skips inference
+        
+    Returns:
+        Tuple of (classification, confidence, processing_time_ms,
+        duplicate_of)
+        
+    Raises:
+        ImageTooLargeError: If the image is over the pixel budget
+        ValueError: If the image cannot be decoded
+    """
+    start_time = start_time or time.time()
+    
+    # Same photo seen before: skip decode and inference
+    cache_key = None
+    if cache is not None:
+        cache_key = cache.key_for(image_bytes)
+        cached = cache.get(cache_key, model.version)
+        if cached is not None:
+            if report_id:
+                cache.link_report(report_id, cache_key, model.version)
+            classification, confidence = cached
+            record_prediction(classification, model.version, "cache")
+            processing_time = int((time.time() - start_time) * 1000)
+            logger.info(f"♻️ Cache hit for image content ({processing_time}ms)")
+            duplicate_of = _other_report(cache.origin_of(model.version, key=cache_key), report_id)
+            return classification, confidence, processing_time, duplicate_of
+    
+    # Decode (off the event loop when batching), hashing the pixels as we go
+    try:
+        with time_stage("preprocess"):
+            if scheduler is None:
+                processed_img = model.preprocess_image(image_bytes)
+            elif pool is not None:
+                processed_img = await pool.preprocess(image_bytes)
+            else:
+                processed_img = await asyncio.to_thread(model.preprocess_image, image_bytes)
+            image_hash = dhash(processed_img) if phash_index is not None else None
+    except ImageTooLargeError:
+        raise
+    except Exception as e:
+        raise ValueError(f"Invalid image: {e}")
+    
+    # A near-identical photo was classified recently: reuse its prediction
+    duplicate_of = None
+    match = phash_index.find(image_hash, model.version) if image_hash is not None else None
+    if match is not None:
+        classification, confidence = match.prediction
+        duplicate_of = _other_report(match.report_id, report_id)
+        record_prediction(classification, model.version, "phash")
+        logger.info(f"🖼️ Near-duplicate of report {match.report_id} (distance {match.distance})")
+    elif scheduler is not None:
+        classification, confidence = await scheduler.submit(processed_img)
+    else:
+        with time_stage("inference"):
+            classification, confidence = model.predict_batch(processed_img)[0]
+    
+    if match is None:
+        record_prediction(classification, model.version)
+        if image_hash is not None:
+            phash_index.add(image_hash, (classification, confidence), model.version, report_id)
+    
+    if cache is not None:
+        cache.put(cache_key, (classification, confidence), model.version, report_id, origin=duplicate_of)
     
     processing_time = int((time.time() - start_time) * 1000)
     
@@ -97,4 +330,235 @@ async def classify_waste(
         f"({confidence:.2%} confidence) in {processing_time}ms"
     )
     
-    return classification, confidence, processing_time
+    return classification, confidence, processing_time, duplicate_of
+
+async def classify_waste_batch(
+    image_urls: list[str],
+    model,
+    downloader: Optional[ImageDownloader] = None,
+    cache=None,
+    report_ids: Optional[list[str]] = None,
+    pool=None,
+    flight=None,
+    phash_index=None
+) -> list:
+    """
+    Classify several images with concurrent downloads and one forward pass
+    
+    Args:
+        image_urls: Public URLs of the images
+        model: Loaded classifier model
+        downloader: ImageDownloader to fetch the images with (defaults to
+            the shared pooled downloader)
+        cache: Optional PredictionCache consulted before inference
+        report_ids: Report IDs matching image_urls, used for idempotent
+            retries from cache
+        pool: Optional InferencePool that runs decoding and inference
+            (defaults to threads of this process)
+        flight: Optional SingleFlight; items already being classified by
+            another request wait for that result, repeated URLs in the
+            batch are classified once, and concurrent requests for the
+            remaining items wait for this batch
+        phash_index: Optional PerceptualIndex; photos that look like a
+            recent one (or an earlier one in the batch) skip inference
+        
+    Returns:
+        List in input order holding either a (classification, confidence,
+        duplicate_of) tuple or the exception that prevented classifying
+        that image
+    """
+    report_ids = report_ids or [None] * len(image_urls)
+    results: list = [None] * len(image_urls)
+    
+    # Retried reports are answered without downloading again
+    pending = []
+    for i, report_id in enumerate(report_ids):
+        cached = None
+        if cache is not None and report_id:
+            cached = cache.get_by_report(report_id, model.version)
+        if cached is not None:
+            origin = cache.origin_of(model.version, report_id=report_id)
+            results[i] = (*cached, _other_report(origin, report_id))
+            record_prediction(cached[0], model.version, "cache")
+        else:
+            pending.append(i)
+    
+    # Coalesce with work already in flight and with repeats in this batch
+    joined: dict[int, asyncio.Future] = {}
+    repeats: dict[int, int] = {}
+    claims: dict[int, asyncio.Future] = {}
+    if flight is not None:
+        first_by_url: dict[str, int] = {}
+        own = []
+        for i in pending:
+            keys = flight_keys(model.version, image_urls[i], report_ids[i])
+            running = flight.lookup(keys)
+            if running is not None:
+                flight.record_follower()
+                joined[i] = asyncio.ensure_future(flight.wait(running))
+            elif image_urls[i] in first_by_url:
+                flight.record_follower()
+                repeats[i] = first_by_url[image_urls[i]]
+            else:
+                first_by_url[image_urls[i]] = i
+                claims[i] = flight.claim(keys)
+                own.append(i)
+        pending = own
+    
+    try:
+        inferred = await _classify_pending(
+            pending, image_urls, report_ids, results, model,
+            downloader or image_downloader, cache, pool, phash_index
+        )
+    finally:
+        for i, claim in claims.items():
+            result = results[i]
+            if result is None:
+                result = RuntimeError("Batch classification was abandoned")
+            elif not isinstance(result, Exception):
+                classification, confidence, duplicate_of = result
+                result = (classification, confidence, 0, duplicate_of or report_ids[i])
+            flight.resolve(claim, result)
+    
+    if joined:
+        outcomes = await asyncio.gather(*joined.values(), return_exceptions=True)
+        for i, outcome in zip(joined, outcomes):
+            if isinstance(outcome, Exception):
+                results[i] = outcome
+            else:
+                classification, confidence, _, origin = outcome
+                results[i] = (classification, confidence, _other_report(origin, report_ids[i]))
+    for i, first in repeats.items():
+        result = results[first]
+        if not isinstance(result, Exception):
+            classification, confidence, duplicate_of = result
+            origin = duplicate_of or report_ids[first]
+            result = (classification, confidence, _other_report(origin, report_ids[i]))
+        results[i] = result
+    
+    classified = sum(1 for result in results if not isinstance(result, Exception))
+    logger.info(
+        f"✅ Batch classified {classified}/{len(image_urls)} images "
+        f"({inferred} inferred, {len(joined) + len(repeats)} coalesced)"
+    )
+    
+    return results
+
+async def _classify_pending(
+    pending: list[int],
+    image_urls: list[str],
+    report_ids: list,
+    results: list,
+    model,
+    downloader: ImageDownloader,
+    cache,
+    pool,
+    phash_index
+) -> int:
+    """Download, decode and infer the pending items, filling results in place"""
+    async def _download(url: str) -> Optional[bytes]:
+        with time_stage("download"):
+            return await downloader.download(url)
+    
+    # Download remaining images concurrently
+    downloads = await asyncio.gather(*(_download(image_urls[i]) for i in pending))
+    
+    cache_keys: dict[int, str] = {}
+    hashes: dict[int, int] = {}
+    batch = model.empty_batch(len(pending))
+    
+    async def _preprocess(slot: int, index: int, image_bytes: Optional[bytes]) -> bool:
+        if not image_bytes:
+            results[index] = ImageDownloadError("Failed to download image")
+            return False
+        if cache is not None:
+            cache_keys[index] = cache.key_for(image_bytes)
+            cached = cache.get(cache_keys[index], model.version)
+            if cached is not None:
+                if report_ids[index]:
+                    cache.link_report(report_ids[index], cache_keys[index], model.version)
+                origin = cache.origin_of(model.version, key=cache_keys[index])
+                results[index] = (*cached, _other_report(origin, report_ids[index]))
+                record_prediction(cached[0], model.version, "cache")
+                return False
+        try:
+            # Decode straight into this item's slot of the batch buffer
+            with time_stage("preprocess"):
+                if pool is not None:
+                    await pool.preprocess(image_bytes, batch[slot:slot + 1])
+                else:
+                    await asyncio.to_thread(
+                        model.preprocess_image, image_bytes, batch[slot:slot + 1]
+                    )
+                if phash_index is not None:
+                    hashes[index] = dhash(batch[slot])
+            return True
+        except ImageTooLargeError as e:
+            results[index] = e
+            return False
+        except Exception as e:
+            results[index] = ValueError(f"Invalid image: {e}")
+            return False
+    
+    # Decode each image off the event loop
+    decoded = await asyncio.gather(
+        *(
+            _preprocess(slot, i, image_bytes)
+            for slot, (i, image_bytes) in enumerate(zip(pending, downloads))
+        )
+    )
+    
+    # Near-duplicates of recent photos, or of an earlier photo in this
+    # batch, reuse that prediction instead of taking a slot in the pass
+    valid: list[int] = []
+    slots: list[int] = []
+    twins: dict[int, int] = {}
+    for slot, (i, ok) in enumerate(zip(pending, decoded)):
+        if not ok:
+            continue
+        if phash_index is not None:
+            match = phash_index.find(hashes[i], model.version)
+            if match is not None:
+                results[i] = (*match.prediction, _other_report(match.report_id, report_ids[i]))
+                record_prediction(match.prediction[0], model.version, "phash")
+                if cache is not None:
+                    cache.put(cache_keys[i], match.prediction, model.version, report_ids[i], origin=match.report_id)
+                continue
+            twin = next(
+                (
+                    j for j in valid
+                    if (hashes[i] ^ hashes[j]).bit_count() <= phash_index.max_distance
+                ),
+                None
+            )
+            if twin is not None:
+                twins[i] = twin
+                continue
+        valid.append(i)
+        slots.append(slot)
+    
+    if valid:
+        # Single forward pass over every image that still needs one
+        stacked = batch if len(slots) == len(batch) else batch[slots]
+        BATCH_SIZE.observe(len(stacked))
+        with time_stage("inference"):
+            if pool is not None:
+                predictions = await pool.predict_batch(stacked)
+            else:
+                predictions = await asyncio.to_thread(model.predict_batch, stacked)
+        for i, prediction in zip(valid, predictions):
+            results[i] = (*prediction, None)
+            record_prediction(prediction[0], model.version)
+            if phash_index is not None:
+                phash_index.add(hashes[i], prediction, model.version, report_ids[i])
+            if cache is not None:
+                cache.put(cache_keys[i], prediction, model.version, report_ids[i])
+    
+    for i, twin in twins.items():
+        prediction = results[twin][:2]
+        results[i] = (*prediction, _other_report(report_ids[twin], report_ids[i]))
+        record_prediction(prediction[0], model.version, "phash")
+        if cache is not None:
+            cache.put(cache_keys[i], prediction, model.version, report_ids[i], origin=report_ids[twin])
+    
+    return len(valid)
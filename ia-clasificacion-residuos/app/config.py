@@ -0,0 +1,148 @@
+# Runtime configuration read from environment variables
+import os
+
+
+def _env_int(name: str, default: int) -> int:
+    """Read an integer environment variable, falling back to default"""
+    value = os.getenv(name)
+    if value is None or value.strip() == "":
+        return default
+    return int(value)
+
+
+def _env_float(name: str, default: float) -> float:
+    """Read a float environment variable, falling back to default"""
+    value = os.getenv(name)
+    if value is None or value.strip() == "":
+        return default
+    return float(value)
+
+
+def _env_int_list(name: str, default: list[int]) -> list[int]:
+    """Read a comma-separated list of integers, falling back to default"""
+    value = os.getenv(name)
+    if value is None or value.strip() == "":
+        return default
+    return [int(item) for item in value.split(",") if item.strip()]
+
+
+def _env_str_list(name: str, default: list[str]) -> list[str]:
+    """Read a comma-separated list of strings, falling back to default"""
+    value = os.getenv(name)
+    if value is None or value.strip() == "":
+        return default
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def available_cpus() -> int:
+    """
+    CPUs this process may use: the affinity mask, capped by the cgroup CPU
+    quota (Cloud Run and Docker limits show up there, not in os.cpu_count)
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()[:2]
+        if quota != "max":
+            cpus = min(cpus, max(1, int(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return max(1, cpus)
+
+
+# Model artifact and runtime; the engine is inferred from the file
+# extension (.h5 -> keras, .tflite -> tflite, .onnx -> onnx) when unset.
+MODEL_PATH = os.getenv("MODEL_PATH", "models/waste_classifier_v1.h5")
+MODEL_ENGINE = os.getenv("MODEL_ENGINE") or None
+MODEL_VERSION = os.getenv("MODEL_VERSION", "1.0.0")
+
+# Token required by the /models admin endpoints (unset disables them)
+MODEL_ADMIN_TOKEN = os.getenv("MODEL_ADMIN_TOKEN") or None
+# Seconds an unloaded model version gets to finish its in-flight requests
+MODEL_DRAIN_TIMEOUT_S = _env_float("MODEL_DRAIN_TIMEOUT_S", 30.0)
+
+# Compiled inference (keras/savedmodel engines): batches are padded up to
+# the nearest of these sizes, each traced and warmed up when the model loads.
+INFERENCE_BATCH_BUCKETS = _env_int_list("INFERENCE_BATCH_BUCKETS", [1, 2, 4, 8, 16])
+
+# Threads used inside one op and ops run in parallel by the inference
+# runtime (0 derives them from the CPUs available to the container, split
+# between INFERENCE_PROCESSES workers).
+INFERENCE_INTRA_OP_THREADS = _env_int("INFERENCE_INTRA_OP_THREADS", 0)
+INFERENCE_INTER_OP_THREADS = _env_int("INFERENCE_INTER_OP_THREADS", 0)
+
+# Micro-batching: largest batch per forward pass and the longest time the
+# oldest queued request waits for companions before the batch is closed.
+BATCH_MAX_SIZE = _env_int("BATCH_MAX_SIZE", 16)
+BATCH_MAX_WAIT_MS = _env_float("BATCH_MAX_WAIT_MS", 10.0)
+
+# Image download: shared keep-alive pool, per-host concurrency and timeouts
+MAX_IMAGE_SIZE_MB = _env_int("MAX_IMAGE_SIZE_MB", 10)
+# Largest number of pixels decoded per image, checked against the header
+# before decoding (JPEGs count after DCT downscaling, so big phone photos
+# still pass while a decompression-bomb PNG does not).
+MAX_IMAGE_PIXELS = _env_int("MAX_IMAGE_PIXELS", 24_000_000)
+DOWNLOAD_MAX_CONNECTIONS = _env_int("DOWNLOAD_MAX_CONNECTIONS", 32)
+DOWNLOAD_MAX_PER_HOST = _env_int("DOWNLOAD_MAX_PER_HOST", 8)
+DOWNLOAD_CONNECT_TIMEOUT_S = _env_float("DOWNLOAD_CONNECT_TIMEOUT_S", 5.0)
+DOWNLOAD_READ_TIMEOUT_S = _env_float("DOWNLOAD_READ_TIMEOUT_S", 15.0)
+
+# Admission control: classification requests running at once (0 disables
+# the limit), requests allowed to wait for a slot before new ones get a
+# 429, and the time budget of each request including that wait.
+MAX_IN_FLIGHT_REQUESTS = _env_int("MAX_IN_FLIGHT_REQUESTS", 32)
+MAX_QUEUED_REQUESTS = _env_int("MAX_QUEUED_REQUESTS", 64)
+REQUEST_DEADLINE_S = _env_float("REQUEST_DEADLINE_S", 30.0)
+
+# Asynchronous jobs (/jobs): background workers, jobs accepted but not yet
+# finished before new ones get a 429, attempts per job with exponential
+# backoff between them, and how long finished jobs stay queryable.
+JOB_WORKERS = _env_int("JOB_WORKERS", 4)
+JOB_MAX_PENDING = _env_int("JOB_MAX_PENDING", 1000)
+JOB_MAX_ATTEMPTS = _env_int("JOB_MAX_ATTEMPTS", 5)
+JOB_RETRY_BASE_S = _env_float("JOB_RETRY_BASE_S", 1.0)
+JOB_RETRY_MAX_S = _env_float("JOB_RETRY_MAX_S", 60.0)
+JOB_RESULT_TTL_S = _env_float("JOB_RESULT_TTL_S", 3600.0)
+# Callback delivery of finished jobs (retried with the same backoff)
+CALLBACK_TIMEOUT_S = _env_float("CALLBACK_TIMEOUT_S", 10.0)
+CALLBACK_MAX_ATTEMPTS = _env_int("CALLBACK_MAX_ATTEMPTS", 5)
+# Hosts (host or host:port) a callback_url may point to; anything else is
+# rejected so /jobs can't make the service POST to internal addresses.
+# Defaults to the EcoTrack backend (backend/server.js, port 3000).
+CALLBACK_ALLOWED_HOSTS = _env_str_list("CALLBACK_ALLOWED_HOSTS", ["localhost:3000"])
+
+# Largest number of items accepted by /classify/batch
+CLASSIFY_BATCH_MAX_ITEMS = _env_int("CLASSIFY_BATCH_MAX_ITEMS", 64)
+
+# Prediction cache keyed by image content hash (size 0 disables it)
+PREDICTION_CACHE_SIZE = _env_int("PREDICTION_CACHE_SIZE", 1024)
+PREDICTION_CACHE_TTL_S = _env_float("PREDICTION_CACHE_TTL_S", 3600.0)
+
+# Near-duplicate detection: recent perceptual hashes kept per model
+# version (0 disables it), the Hamming distance (out of 64 bits) under
+# which a photo reuses a recent prediction, and how long hashes are kept.
+PHASH_INDEX_SIZE = _env_int("PHASH_INDEX_SIZE", 1024)
+PHASH_MAX_DISTANCE = _env_int("PHASH_MAX_DISTANCE", 6)
+PHASH_TTL_S = _env_float("PHASH_TTL_S", 3600.0)
+
+# Decode/inference worker processes (0 runs them on threads in-process)
+INFERENCE_PROCESSES = _env_int("INFERENCE_PROCESSES", 0)
+WORKER_START_METHOD = os.getenv("WORKER_START_METHOD", "forkserver")
+# Data segment limit of each worker process in MB (0 = unlimited); a
+# decode that does not fit fails with 413 instead of growing the worker.
+WORKER_MEMORY_LIMIT_MB = _env_int("WORKER_MEMORY_LIMIT_MB", 0)
+# Memory in MB that concurrent decodes may use in thread mode; decodes
+# wait for a slot sized for a MAX_IMAGE_PIXELS image (0 = unbounded)
+DECODE_MEMORY_BUDGET_MB = _env_int("DECODE_MEMORY_BUDGET_MB", 1024)
+
+
+def inference_threads() -> tuple[int, int]:
+    """Return (intra_op, inter_op) thread counts for one inference engine"""
+    share = max(1, available_cpus() // max(1, INFERENCE_PROCESSES))
+    intra = INFERENCE_INTRA_OP_THREADS or share
+    inter = INFERENCE_INTER_OP_THREADS or min(2, share)
+    return intra, inter
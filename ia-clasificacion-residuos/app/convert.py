@@ -0,0 +1,215 @@
+"""
+Convert the Keras classifier into lighter runtime artifacts
+
+Produces TFLite and/or ONNX builds of models/waste_classifier_v1.h5
+(optionally int8 or float16 quantized), or a pre-traced SavedModel for
+fast cold starts, and checks that their predictions match the Keras
+reference.
+
+Usage (from ia-clasificacion-residuos/):
+    python -m app.convert --format tflite --quantize int8 --calibration-dir ../backend/images
+    python -m app.convert --format onnx --quantize int8
+    python -m app.convert --format savedmodel
+    python -m app.convert --check models/waste_classifier_v1_int8.tflite
+
+Optional dependencies: tf2onnx and onnxruntime for the ONNX format.
+"""
+import argparse
+import logging
+import sys
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from .engines import KerasEngine, create_engine, engine_for_path
+from .model_loader import WasteClassifierModel
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = Path("models/waste_classifier_v1.h5")
+DEFAULT_IMAGES = Path(__file__).resolve().parents[2] / "backend" / "images"
+QUANTIZATIONS = ("none", "float16", "int8")
+
+
+def load_samples(images_dir: Optional[Path], limit: int) -> np.ndarray:
+    """
+    Preprocess up to limit images into a uint8 batch
+
+    Falls back to random pixels when no decodable images are available.
+    """
+    preprocessor = WasteClassifierModel()
+    batch = []
+    if images_dir is not None and images_dir.is_dir():
+        for path in sorted(images_dir.iterdir()):
+            if len(batch) >= limit:
+                break
+            try:
+                batch.append(preprocessor.preprocess_image(path.read_bytes()))
+            except Exception:
+                continue
+    if not batch:
+        logger.warning("⚠️ No sample images found, using random pixels")
+        rng = np.random.default_rng(0)
+        return rng.integers(0, 256, (limit, *preprocessor.input_size, 3), dtype=np.uint8)
+    return np.concatenate(batch, axis=0)
+
+
+def convert_tflite(keras_model, output_path: Path, quantize: str, samples: Optional[np.ndarray]) -> Path:
+    """Convert to TFLite, optionally with float16 or int8 quantization"""
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(keras_model)
+    if quantize == "float16":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantize == "int8":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        if samples is not None:
+            # Calibrate activation ranges; without samples only weights are int8
+            def representative_dataset():
+                for sample in samples:
+                    yield [sample[np.newaxis]]
+            converter.representative_dataset = representative_dataset
+
+    output_path.write_bytes(converter.convert())
+    return output_path
+
+
+def convert_onnx(keras_model, output_path: Path, quantize: str, input_size: tuple[int, int]) -> Path:
+    """Convert to ONNX, optionally with dynamic int8 quantization"""
+    if quantize == "float16":
+        raise ValueError("float16 is only supported for the tflite format")
+
+    import tensorflow as tf
+    import tf2onnx
+
+    spec = (tf.TensorSpec((None, *input_size, 3), tf.uint8, name="image"),)
+    fp32_path = output_path if quantize == "none" else output_path.with_suffix(".fp32.onnx")
+    tf2onnx.convert.from_keras(keras_model, input_signature=spec, opset=13, output_path=str(fp32_path))
+
+    if quantize == "int8":
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantize_dynamic(str(fp32_path), str(output_path), weight_type=QuantType.QUInt8)
+        fp32_path.unlink()
+
+    return output_path
+
+
+def export_savedmodel(keras_model, output_path: Path, input_size: tuple[int, int]) -> Path:
+    """
+    Export a pre-traced SavedModel for fast cold starts
+
+    The uint8 serving signature is traced once here, so the service can
+    restore the graph without rebuilding Keras objects or retracing.
+    """
+    import tensorflow as tf
+
+    @tf.function(input_signature=[tf.TensorSpec((None, *input_size, 3), tf.uint8, name="image")])
+    def serve(image):
+        return {"probabilities": keras_model(image, training=False)}
+
+    tf.saved_model.save(keras_model, str(output_path), signatures={"serving_default": serve})
+    return output_path
+
+
+def _artifact_size_mb(artifact: Path) -> float:
+    """Size of a model file, or of every file in a SavedModel directory"""
+    if artifact.is_dir():
+        size = sum(f.stat().st_size for f in artifact.rglob("*") if f.is_file())
+    else:
+        size = artifact.stat().st_size
+    return round(size / (1024 * 1024), 2)
+
+
+def check_parity(keras_engine: KerasEngine, artifact: Path, samples: np.ndarray) -> dict:
+    """
+    Compare an artifact's predictions with the Keras reference
+
+    Returns:
+        Dictionary with top-1 agreement and max absolute probability difference
+    """
+    engine = create_engine(engine_for_path(artifact), keras_engine.input_size)
+    engine.load(artifact)
+
+    reference = keras_engine.predict(samples)
+    candidate = np.concatenate(
+        [engine.predict(samples[i:i + 1]) for i in range(len(samples))], axis=0
+    )
+
+    return {
+        "artifact": str(artifact),
+        "size_mb": _artifact_size_mb(artifact),
+        "samples": len(samples),
+        "top1_agreement": float((reference.argmax(axis=1) == candidate.argmax(axis=1)).mean()),
+        "max_abs_diff": float(np.abs(reference - candidate).max()),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Convert the classifier to TFLite/ONNX/SavedModel")
+    parser.add_argument("--model", type=Path, default=DEFAULT_MODEL, help="Keras .h5 model")
+    parser.add_argument("--format", choices=("tflite", "onnx", "savedmodel", "all"), default="tflite")
+    parser.add_argument("--quantize", choices=QUANTIZATIONS, default="int8")
+    parser.add_argument("--output-dir", type=Path, default=None, help="Defaults to the model's folder")
+    parser.add_argument("--calibration-dir", type=Path, default=DEFAULT_IMAGES,
+                        help="Images used for int8 calibration and the parity check")
+    parser.add_argument("--samples", type=int, default=32)
+    parser.add_argument("--check", type=Path, nargs="*", default=None,
+                        help="Only run the parity check on existing artifacts")
+    parser.add_argument("--min-agreement", type=float, default=0.95,
+                        help="Fail when top-1 agreement with Keras is below this")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s - %(message)s')
+
+    if not args.model.exists():
+        logger.error(f"❌ Model file not found at {args.model}")
+        return 1
+
+    keras_engine = KerasEngine(WasteClassifierModel().input_size)
+    keras_engine.load(args.model)
+    samples = load_samples(args.calibration_dir, args.samples)
+
+    if args.check is not None:
+        artifacts = args.check
+    else:
+        output_dir = args.output_dir or args.model.parent
+        output_dir.mkdir(parents=True, exist_ok=True)
+        suffix = "fp32" if args.quantize == "none" else args.quantize
+        formats = ("tflite", "onnx", "savedmodel") if args.format == "all" else (args.format,)
+
+        artifacts = []
+        for fmt in formats:
+            if fmt == "savedmodel":
+                # Not quantized: this artifact only targets cold-start time
+                output_path = output_dir / f"{args.model.stem}_savedmodel"
+            else:
+                output_path = output_dir / f"{args.model.stem}_{suffix}.{fmt}"
+            logger.info(f"🔄 Converting {args.model} -> {output_path}")
+            if fmt == "tflite":
+                convert_tflite(keras_engine.model, output_path, args.quantize, samples)
+            elif fmt == "onnx":
+                convert_onnx(keras_engine.model, output_path, args.quantize, keras_engine.input_size)
+            else:
+                export_savedmodel(keras_engine.model, output_path, keras_engine.input_size)
+            artifacts.append(output_path)
+            logger.info(f"✅ Wrote {output_path}")
+
+    failed = False
+    for artifact in artifacts:
+        report = check_parity(keras_engine, artifact, samples)
+        ok = report["top1_agreement"] >= args.min_agreement
+        failed = failed or not ok
+        logger.info(
+            f"{'✅' if ok else '❌'} {report['artifact']} ({report['size_mb']}MB): "
+            f"top-1 agreement {report['top1_agreement']:.2%}, "
+            f"max |Δp| {report['max_abs_diff']:.4f} over {report['samples']} samples"
+        )
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,354 @@
+# Inference runtimes behind WasteClassifierModel
+import logging
+import threading
+from pathlib import Path
+from typing import Callable, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceEngine:
+    """
+    Runs the classifier network on a batch of uint8 images
+
+    Every engine takes a (N, height, width, 3) uint8 array and returns an
+    (N, num_classes) array of probabilities. Pixel normalization is part of
+    the network, so all runtimes share the same input contract.
+    """
+
+    name = "base"
+
+    def __init__(
+        self,
+        input_size: tuple[int, int],
+        intra_op_threads: int = 0,
+        inter_op_threads: int = 0,
+        batch_buckets: Sequence[int] = ()
+    ):
+        self.input_size = input_size
+        # 0 leaves the runtime default (usually one thread per core)
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self.batch_buckets = tuple(sorted({size for size in batch_buckets if size > 0}))
+
+    def import_runtime(self):
+        """Import the runtime library (timed separately at startup)"""
+
+    def load(self, model_path: Path):
+        """Load the network from model_path"""
+        raise NotImplementedError
+
+    def warmup(self):
+        """Run the network once so the first request does not pay setup costs"""
+        self.predict(np.zeros((1, *self.input_size, 3), dtype=np.uint8))
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        """Return class probabilities for a uint8 batch"""
+        raise NotImplementedError
+
+
+def _configure_tf_threads(tf, intra_op_threads: int, inter_op_threads: int):
+    """Set TensorFlow's thread pools (only possible before its first op)"""
+    try:
+        if intra_op_threads:
+            tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+        if inter_op_threads:
+            tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+    except RuntimeError as e:
+        # Another model version already initialized the runtime in this process
+        logger.warning(
+            f"⚠️ Keeping TensorFlow threads at "
+            f"{tf.config.threading.get_intra_op_parallelism_threads()} intra-op / "
+            f"{tf.config.threading.get_inter_op_parallelism_threads()} inter-op: {e}"
+        )
+
+
+class BucketedFunction:
+    """
+    Compiled forward pass traced once per fixed batch size
+
+    Each bucket gets its own concrete function with a static input shape,
+    so calls skip the Keras predict loop and never retrace. A batch is
+    zero-padded up to the nearest bucket; batches larger than the biggest
+    bucket run in chunks of that size.
+    """
+
+    def __init__(self, fn: Callable, input_size: tuple[int, int], buckets: Sequence[int]):
+        import tensorflow as tf
+
+        self.buckets = tuple(sorted(buckets)) or (1,)
+        self.input_size = input_size
+        compiled = tf.function(fn)
+        self._functions = {
+            size: compiled.get_concrete_function(
+                tf.TensorSpec((size, *input_size, 3), tf.uint8)
+            )
+            for size in self.buckets
+        }
+
+    def warmup(self):
+        """Run every bucket once (first calls initialize the graph runtime)"""
+        for size in self.buckets:
+            self(np.zeros((size, *self.input_size, 3), dtype=np.uint8))
+
+    def __call__(self, batch: np.ndarray) -> np.ndarray:
+        largest = self.buckets[-1]
+        if len(batch) > largest:
+            return np.concatenate([
+                self(batch[start:start + largest])
+                for start in range(0, len(batch), largest)
+            ])
+
+        count = len(batch)
+        size = next(bucket for bucket in self.buckets if bucket >= count)
+        if size != count:
+            padded = np.zeros((size, *batch.shape[1:]), dtype=np.uint8)
+            padded[:count] = batch
+            batch = padded
+        return self._functions[size](batch).numpy()[:count]
+
+
+class KerasEngine(InferenceEngine):
+    """Full TensorFlow/Keras runtime (reference implementation)"""
+
+    name = "keras"
+
+    def __init__(self, input_size: tuple[int, int], **options):
+        super().__init__(input_size, **options)
+        self.model = None
+        self._compiled: Optional[BucketedFunction] = None
+
+    def import_runtime(self):
+        import tensorflow as tf
+
+        _configure_tf_threads(tf, self.intra_op_threads, self.inter_op_threads)
+
+    def load(self, model_path: Path):
+        import tensorflow as tf
+
+        base_model = tf.keras.models.load_model(str(model_path))
+        self._set_model(build_normalized_model(base_model, self.input_size))
+
+    def load_dummy(self):
+        """Create a small random network for testing without a real model"""
+        import tensorflow as tf
+
+        # Simple model that returns random predictions
+        inputs = tf.keras.Input(shape=(*self.input_size, 3))
+        x = tf.keras.layers.GlobalAveragePooling2D()(inputs)
+        outputs = tf.keras.layers.Dense(3, activation='softmax')(x)
+
+        self._set_model(build_normalized_model(
+            tf.keras.Model(inputs=inputs, outputs=outputs),
+            self.input_size
+        ))
+
+    def _set_model(self, model):
+        self.model = model
+        self._compiled = None
+        if self.batch_buckets:
+            self._compiled = BucketedFunction(
+                lambda x: model(x, training=False),
+                self.input_size,
+                self.batch_buckets
+            )
+
+    def warmup(self):
+        if self._compiled is not None:
+            self._compiled.warmup()
+        else:
+            super().warmup()
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        if self._compiled is not None:
+            return self._compiled(batch)
+        return self.model.predict(batch, verbose=0)
+
+
+class SavedModelEngine(InferenceEngine):
+    """
+    Pre-traced TensorFlow SavedModel (see app.convert --format savedmodel)
+
+    Restores the serialized inference graph directly, skipping the Keras
+    object rebuild and the first-call tracing that an .h5 model needs.
+    """
+
+    name = "savedmodel"
+
+    def __init__(self, input_size: tuple[int, int], **options):
+        super().__init__(input_size, **options)
+        self._fn = None
+        self._input_name = None
+        self._loaded = None
+        self._compiled: Optional[BucketedFunction] = None
+
+    def import_runtime(self):
+        import tensorflow as tf
+
+        _configure_tf_threads(tf, self.intra_op_threads, self.inter_op_threads)
+
+    def load(self, model_path: Path):
+        import tensorflow as tf
+
+        loaded = tf.saved_model.load(str(model_path))
+        self._fn = loaded.signatures["serving_default"]
+        self._input_name = next(iter(self._fn.structured_input_signature[1]))
+        # Keep the loaded object alive; the signature only holds a weak ref
+        self._loaded = loaded
+        self._compiled = None
+        if self.batch_buckets:
+            self._compiled = BucketedFunction(self._call, self.input_size, self.batch_buckets)
+
+    def _call(self, batch):
+        outputs = self._fn(**{self._input_name: batch})
+        return next(iter(outputs.values()))
+
+    def warmup(self):
+        if self._compiled is not None:
+            self._compiled.warmup()
+        else:
+            super().warmup()
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        if self._compiled is not None:
+            return self._compiled(batch)
+        return self._call(batch).numpy()
+
+
+class TFLiteEngine(InferenceEngine):
+    """
+    TensorFlow Lite runtime for float16/int8 artifacts
+
+    Uses the standalone tflite-runtime package when installed, so the
+    container does not need full TensorFlow.
+    """
+
+    name = "tflite"
+
+    def __init__(self, input_size: tuple[int, int], **options):
+        super().__init__(input_size, **options)
+        self.interpreter = None
+        self._interpreter_cls = None
+        self._input_index = None
+        self._output_index = None
+        self._batch_size = None
+        # The interpreter is not thread-safe
+        self._lock = threading.Lock()
+
+    def import_runtime(self):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+        self._interpreter_cls = Interpreter
+
+    def load(self, model_path: Path):
+        if self._interpreter_cls is None:
+            self.import_runtime()
+
+        self.interpreter = self._interpreter_cls(
+            model_path=str(model_path),
+            num_threads=self.intra_op_threads or None
+        )
+        self._input_index = self.interpreter.get_input_details()[0]['index']
+        self._output_index = self.interpreter.get_output_details()[0]['index']
+        self._batch_size = None
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        with self._lock:
+            if batch.shape[0] != self._batch_size:
+                self.interpreter.resize_tensor_input(self._input_index, batch.shape)
+                self.interpreter.allocate_tensors()
+                self._batch_size = batch.shape[0]
+            self.interpreter.set_tensor(self._input_index, np.ascontiguousarray(batch))
+            self.interpreter.invoke()
+            return self.interpreter.get_tensor(self._output_index).copy()
+
+
+class OnnxEngine(InferenceEngine):
+    """ONNX Runtime engine for float32/int8 artifacts"""
+
+    name = "onnx"
+
+    def __init__(self, input_size: tuple[int, int], **options):
+        super().__init__(input_size, **options)
+        self.session = None
+        self._input_name = None
+
+    def import_runtime(self):
+        import onnxruntime  # noqa: F401
+
+    def load(self, model_path: Path):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = self.intra_op_threads
+        options.inter_op_num_threads = self.inter_op_threads
+        self.session = ort.InferenceSession(
+            str(model_path),
+            sess_options=options,
+            providers=["CPUExecutionProvider"]
+        )
+        self._input_name = self.session.get_inputs()[0].name
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        return self.session.run(None, {self._input_name: batch})[0]
+
+
+ENGINES = {
+    KerasEngine.name: KerasEngine,
+    SavedModelEngine.name: SavedModelEngine,
+    TFLiteEngine.name: TFLiteEngine,
+    OnnxEngine.name: OnnxEngine,
+}
+
+_SUFFIX_ENGINES = {
+    ".h5": KerasEngine.name,
+    ".keras": KerasEngine.name,
+    ".tflite": TFLiteEngine.name,
+    ".onnx": OnnxEngine.name,
+}
+
+
+def engine_for_path(model_path: Path) -> str:
+    """Guess the engine name from the model file extension"""
+    model_path = Path(model_path)
+    if model_path.is_dir() or model_path.suffix == "":
+        return SavedModelEngine.name
+    return _SUFFIX_ENGINES.get(model_path.suffix.lower(), KerasEngine.name)
+
+
+def create_engine(name: Optional[str], input_size: tuple[int, int], **options) -> InferenceEngine:
+    """
+    Instantiate an engine by name
+
+    Args:
+        name: Engine name (defaults to keras)
+        input_size: Model input (width, height)
+        **options: intra_op_threads, inter_op_threads and batch_buckets
+
+    Raises:
+        ValueError: If the engine name is unknown
+    """
+    name = (name or KerasEngine.name).lower()
+    if name not in ENGINES:
+        raise ValueError(f"Unknown inference engine '{name}' (expected one of {sorted(ENGINES)})")
+    return ENGINES[name](input_size, **options)
+
+
+def build_normalized_model(base_model, input_size: tuple[int, int]):
+    """
+    Wrap a model that expects 0-1 floats so it accepts raw uint8 pixels
+
+    Normalization then runs once per batch inside the graph instead of
+    once per image in numpy.
+    """
+    import tensorflow as tf
+
+    inputs = tf.keras.Input(shape=(*input_size, 3), dtype=tf.uint8)
+    x = tf.keras.layers.Rescaling(1.0 / 255)(inputs)
+    outputs = base_model(x)
+    return tf.keras.Model(inputs=inputs, outputs=outputs)
@@ -0,0 +1,334 @@
+# Asynchronous classification jobs with retries and callback delivery
+import asyncio
+import logging
+import random
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from .classifier import ImageDownloadError
+from .metrics import CALLBACKS_TOTAL, JOBS_PENDING, JOBS_TOTAL, REJECTED_TOTAL
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueueFull(Exception):
+    """Raised when too many jobs are already waiting to finish"""
+
+
+class CallbackNotAllowed(ValueError):
+    """Raised when a callback URL points outside the allowed hosts"""
+
+
+def callback_allowed(url: str, allowed_hosts: list[str]) -> bool:
+    """
+    Check a callback URL against a list of hosts
+
+    Entries are a host name, matching it on any port, or host:port.
+    """
+    try:
+        parts = urlsplit(url)
+        host = (parts.hostname or "").lower()
+        port = parts.port or {"http": 80, "https": 443}.get(parts.scheme)
+    except ValueError:
+        return False
+    if parts.scheme not in ("http", "https") or not host:
+        return False
+    for entry in allowed_hosts:
+        allowed_host, _, allowed_port = entry.lower().rpartition(":")
+        if not allowed_host or not allowed_port.isdigit():
+            allowed_host, allowed_port = entry.lower(), None
+        if host == allowed_host and (allowed_port is None or port == int(allowed_port)):
+            return True
+    return False
+
+
+@dataclass
+class Job:
+    """One classification job and its delivery state"""
+    image_url: str
+    report_id: str
+    user_id: str
+    callback_url: Optional[str] = None
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    # queued -> running -> succeeded | failed, with retrying in between
+    status: str = "queued"
+    attempts: int = 0
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    # pending -> delivered | failed (None when there is no callback URL)
+    callback_status: Optional[str] = None
+    callback_attempts: int = 0
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("succeeded", "failed")
+
+    def to_dict(self) -> dict:
+        """Public view of the job (API responses and callback bodies)"""
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "report_id": self.report_id,
+            "attempts": self.attempts,
+            "result": self.result,
+            "error": self.error,
+            "callback_url": self.callback_url,
+            "callback_status": self.callback_status,
+            "callback_attempts": self.callback_attempts,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
+
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    Check if a failed attempt may succeed later
+
+    Downloads, deadlines and server-side errors (e.g. the model still
+    loading) are retried; an image that is invalid or too large never will.
+    """
+    if isinstance(error, ImageDownloadError):
+        return True
+    return not isinstance(error, ValueError)
+
+
+class JobQueue:
+    """
+    Run classification jobs in the background and deliver their results
+
+    Jobs wait in an in-memory queue served by a fixed number of worker
+    tasks, so a burst of submissions turns into a backlog instead of
+    concurrent requests. Failed attempts are retried with exponential
+    backoff and jitter; finished jobs are kept for result_ttl_s and, when
+    the job has a callback URL, POSTed there (also with retries).
+    """
+
+    def __init__(
+        self,
+        classify: Callable[[Job], Awaitable[dict]],
+        workers: int = 4,
+        max_pending: int = 1000,
+        max_attempts: int = 5,
+        retry_base_s: float = 1.0,
+        retry_max_s: float = 60.0,
+        result_ttl_s: float = 3600.0,
+        callback_timeout_s: float = 10.0,
+        callback_max_attempts: int = 5,
+        callback_allowed_hosts: Optional[list[str]] = None,
+        job_timeout_s: float = 30.0
+    ):
+        self.classify = classify
+        self.workers = max(1, workers)
+        self.max_pending = max(1, max_pending)
+        self.max_attempts = max(1, max_attempts)
+        self.retry_base_s = retry_base_s
+        self.retry_max_s = retry_max_s
+        self.result_ttl_s = result_ttl_s
+        self.callback_timeout_s = callback_timeout_s
+        self.callback_max_attempts = max(1, callback_max_attempts)
+        self.callback_allowed_hosts = list(callback_allowed_hosts or [])
+        self.job_timeout_s = job_timeout_s
+
+        self.pending = 0
+        self.succeeded_total = 0
+        self.failed_total = 0
+        self.retried_total = 0
+        self._jobs: dict[str, Job] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: list[asyncio.Task] = []
+        self._retries: set[asyncio.TimerHandle] = set()
+        self._deliveries: set[asyncio.Task] = set()
+        self._client: Optional[httpx.AsyncClient] = None
+        self._last_prune = 0.0
+
+    async def start(self):
+        """Start the worker tasks and open the callback HTTP client"""
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue()
+        self._client = httpx.AsyncClient(
+            timeout=self.callback_timeout_s,
+            headers={'User-Agent': 'EcoTrack-AI-Classifier/1.0'},
+            # A redirect could point anywhere, past the allowed hosts
+            follow_redirects=False
+        )
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        logger.info(f"🧾 Job queue started with {self.workers} workers")
+
+    async def stop(self):
+        """Stop workers, pending retries and callback deliveries"""
+        for handle in self._retries:
+            handle.cancel()
+        self._retries.clear()
+        tasks = self._tasks + list(self._deliveries)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks = []
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def submit(
+        self,
+        image_url: str,
+        report_id: str,
+        user_id: str,
+        callback_url: Optional[str] = None
+    ) -> Job:
+        """
+        Accept a job and queue it for a worker
+
+        Raises:
+            CallbackNotAllowed: If callback_url is not on an allowed host
+            JobQueueFull: If max_pending jobs are already waiting to finish
+        """
+        if self._queue is None:
+            raise RuntimeError("Job queue not started")
+        if callback_url and not callback_allowed(callback_url, self.callback_allowed_hosts):
+            raise CallbackNotAllowed(f"callback_url host is not allowed: {callback_url}")
+        self._prune()
+        if self.pending >= self.max_pending:
+            REJECTED_TOTAL.labels(reason="jobs_full").inc()
+            raise JobQueueFull("Too many pending jobs, try again later")
+
+        job = Job(image_url, report_id, user_id, callback_url)
+        self._jobs[job.id] = job
+        self.pending += 1
+        JOBS_PENDING.inc()
+        self._queue.put_nowait(job)
+        logger.info(f"🧾 Queued job {job.id} for report {report_id}")
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Return the job, or None if it is unknown or expired"""
+        self._prune()
+        return self._jobs.get(job_id)
+
+    def backoff(self, attempt: int) -> float:
+        """Delay before retry number attempt (exponential with jitter)"""
+        delay = min(self.retry_max_s, self.retry_base_s * 2 ** (attempt - 1))
+        return delay * random.uniform(0.5, 1.0)
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            except Exception as e:
+                logger.error(f"❌ Job worker error on {job.id}: {e}", exc_info=True)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: Job):
+        job.status = "running"
+        job.attempts += 1
+        job.updated_at = time.time()
+        try:
+            job.result = await asyncio.wait_for(self.classify(job), timeout=self.job_timeout_s)
+        except Exception as e:
+            job.error = str(e) or type(e).__name__
+            if is_retryable(e) and job.attempts < self.max_attempts:
+                self._retry(job)
+                return
+            job.status = "failed"
+            self.failed_total += 1
+            logger.warning(f"⚠️ Job {job.id} failed after {job.attempts} attempts: {job.error}")
+        else:
+            job.status = "succeeded"
+            job.error = None
+            self.succeeded_total += 1
+            logger.info(f"✅ Job {job.id} finished: {job.result.get('classification')}")
+
+        JOBS_TOTAL.labels(outcome=job.status).inc()
+        job.finished_at = job.updated_at = time.time()
+        self.pending -= 1
+        JOBS_PENDING.dec()
+        if job.callback_url:
+            job.callback_status = "pending"
+            task = asyncio.create_task(self._deliver(job))
+            self._deliveries.add(task)
+            task.add_done_callback(self._deliveries.discard)
+
+    def _retry(self, job: Job):
+        """Requeue the job once its backoff delay has passed"""
+        delay = self.backoff(job.attempts)
+        job.status = "retrying"
+        job.updated_at = time.time()
+        self.retried_total += 1
+        JOBS_TOTAL.labels(outcome="retried").inc()
+        logger.info(f"🔁 Retrying job {job.id} in {delay:.1f}s (attempt {job.attempts}): {job.error}")
+
+        def _requeue():
+            self._retries.discard(handle)
+            self._queue.put_nowait(job)
+
+        handle = asyncio.get_running_loop().call_later(delay, _requeue)
+        self._retries.add(handle)
+
+    async def _deliver(self, job: Job):
+        """POST the finished job to its callback URL, retrying transient failures"""
+        for attempt in range(1, self.callback_max_attempts + 1):
+            job.callback_attempts = attempt
+            retryable = True
+            try:
+                response = await self._client.post(
+                    job.callback_url,
+                    json=job.to_dict(),
+                    headers={"X-Job-Id": job.id}
+                )
+                if response.is_success:
+                    job.callback_status = "delivered"
+                    CALLBACKS_TOTAL.labels(outcome="delivered").inc()
+                    logger.info(f"📬 Delivered job {job.id} to {job.callback_url}")
+                    return
+                # Client errors other than timeouts and throttling won't fix themselves
+                retryable = response.status_code >= 500 or response.status_code in (408, 429)
+                problem = f"HTTP {response.status_code}"
+            except httpx.HTTPError as e:
+                problem = str(e) or type(e).__name__
+
+            if not retryable or attempt == self.callback_max_attempts:
+                break
+            CALLBACKS_TOTAL.labels(outcome="retried").inc()
+            logger.warning(f"⚠️ Callback for job {job.id} failed ({problem}), retrying")
+            await asyncio.sleep(self.backoff(attempt))
+
+        job.callback_status = "failed"
+        CALLBACKS_TOTAL.labels(outcome="failed").inc()
+        logger.error(f"❌ Could not deliver job {job.id} to {job.callback_url}: {problem}")
+
+    def _prune(self):
+        """Forget finished jobs older than result_ttl_s (at most once a second)"""
+        now = time.time()
+        if now - self._last_prune < 1.0:
+            return
+        self._last_prune = now
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished and now - job.finished_at > self.result_ttl_s
+            and job.callback_status != "pending"
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def stats(self) -> dict:
+        """Return backlog and outcome counters"""
+        return {
+            "workers": self.workers,
+            "pending": self.pending,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "retrying": len(self._retries),
+            "stored": len(self._jobs),
+            "succeeded_total": self.succeeded_total,
+            "failed_total": self.failed_total,
+            "retried_total": self.retried_total,
+        }
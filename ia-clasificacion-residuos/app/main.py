@@ -1,18 +1,66 @@
 # FastAPI Main Application
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import Depends, FastAPI, Header, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
+from starlette.datastructures import UploadFile
+from starlette.requests import ClientDisconnect
+import asyncio
+import hmac
 import logging
 import sys
 import time
+from contextlib import asynccontextmanager
+from typing import Optional
 
 from .schemas import (
+    AdmissionStats,
+    BatchClassificationRequest,
+    BatchClassificationResponse,
+    BatchItemResult,
+    BatchingStats,
+    CacheStats,
     ClassificationRequest,
     ClassificationResult,
-    HealthCheck
+    DedupStats,
+    HealthCheck,
+    JobInfo,
+    JobRequest,
+    JobStats,
+    LivenessCheck,
+    ModelLoadRequest,
+    ModelVersionInfo,
+    PerceptualIndexStats,
+    ReadinessCheck,
+    TrafficSplit
 )
 from .model_loader import classifier_model
-from .classifier import classify_waste
+from .classifier import (
+    ImageTooLargeError,
+    classify_image_bytes,
+    classify_waste,
+    classify_waste_batch,
+    image_downloader,
+    read_limited
+)
+from .batching import BatchScheduler
+from .cache import prediction_cache
+from .singleflight import single_flight
+from .phash import perceptual_index
+from .workers import inference_pool
+from .registry import ModelDeployment, model_registry
+from .admission import AdmissionRejected, admission_controller
+from .jobs import CallbackNotAllowed, Job, JobQueue, JobQueueFull
+from .metrics import (
+    ADMISSION_QUEUED,
+    IN_FLIGHT,
+    QUEUE_DEPTH,
+    cancel_reason,
+    observe_stage,
+    record_cancelled,
+    record_request,
+    render_latest
+)
+from . import config
 
 # Configure logging
 logging.basicConfig(
@@ -25,6 +73,28 @@ logger = logging.getLogger(__name__)
 # Track startup time
 startup_time = time.time()
 
+# Model loading progress, filled in by the background loader
+startup_state = {
+    "phase": "starting",
+    "error": None,
+    "timings": {},
+    "task": None,
+}
+
+# Groups concurrent requests into a single forward pass
+batch_scheduler = BatchScheduler(
+    inference_pool.predict_batch,
+    max_batch_size=config.BATCH_MAX_SIZE,
+    max_wait_ms=config.BATCH_MAX_WAIT_MS
+)
+
+# Version loaded at startup; later versions are added through /models
+initial_deployment = ModelDeployment(classifier_model, inference_pool, batch_scheduler)
+QUEUE_DEPTH.set_function(
+    lambda: sum(d.scheduler.stats()["queue_depth"] for d in model_registry.deployments())
+)
+ADMISSION_QUEUED.set_function(lambda: admission_controller.queued)
+
 # Create FastAPI app
 app = FastAPI(
     title="EcoTrack Waste Classifier API",
@@ -43,15 +113,63 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+def is_ready() -> bool:
+    """Check if the model (and worker pool) finished loading"""
+    return startup_state["phase"] == "ready" and model_registry.has_traffic()
+
+def serving_deployment() -> ModelDeployment:
+    """Version shown in health checks: the one with the largest traffic share"""
+    return model_registry.primary() or initial_deployment
+
+async def load_model_in_background():
+    """Load and warm up the model without blocking the server from binding"""
+    started = time.perf_counter()
+    startup_state["phase"] = "loading"
+    try:
+        # With worker processes the engine is only loaded in the workers
+        load = classifier_model.load_for_workers if inference_pool.uses_processes else classifier_model.load
+        success = await asyncio.to_thread(load)
+        timings = dict(classifier_model.load_timings)
+        if not success:
+            raise RuntimeError("Failed to load model")
+        
+        workers_start = time.perf_counter()
+        await inference_pool.start()
+        if inference_pool.uses_processes:
+            timings["workers_ms"] = round((time.perf_counter() - workers_start) * 1000, 1)
+        
+        model_registry.add(initial_deployment, traffic_percent=100)
+        
+        timings["total_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        timings["since_process_start_ms"] = round((time.time() - startup_time) * 1000, 1)
+        startup_state["timings"] = timings
+        startup_state["phase"] = "ready"
+        logger.info(f"✅ API ready to classify waste! {timings}")
+    except Exception as e:
+        startup_state["phase"] = "failed"
+        startup_state["error"] = str(e)
+        logger.error(f"❌ Failed to load model on startup: {e}")
+
 @app.on_event("startup")
 async def startup_event():
-    """Load model on startup (warm-up)"""
+    """Start serving immediately and load the model in the background"""
     logger.info("🚀 Starting EcoTrack Waste Classifier API...")
-    success = classifier_model.load()
-    if not success:
-        logger.error("❌ Failed to load model on startup!")
-        # Don't raise error - use dummy model for testing
-    logger.info("✅ API ready to classify waste!")
+    await batch_scheduler.start()
+    await image_downloader.start()
+    await job_queue.start()
+    startup_state["task"] = asyncio.create_task(load_model_in_background())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Drain background workers"""
+    task = startup_state["task"]
+    if task is not None and not task.done():
+        task.cancel()
+    await job_queue.stop()
+    await model_registry.shutdown()
+    await batch_scheduler.stop()
+    await image_downloader.close()
+    inference_pool.shutdown()
 
 @app.get("/", response_model=HealthCheck, tags=["Health"])
 async def health_check():
@@ -62,11 +180,26 @@ async def health_check():
     """
     uptime = time.time() - startup_time
     
+    if is_ready():
+        status = "healthy"
+    elif startup_state["phase"] == "failed":
+        status = "unhealthy"
+    else:
+        status = "loading"
+    
+    deployment = serving_deployment()
     return HealthCheck(
-        status="healthy" if classifier_model.is_loaded() else "unhealthy",
-        model_loaded=classifier_model.is_loaded(),
-        version=classifier_model.version,
-        uptime_seconds=round(uptime, 2)
+        status=status,
+        model_loaded=deployment.model.is_loaded(),
+        version=deployment.version,
+        uptime_seconds=round(uptime, 2),
+        batching=BatchingStats(**deployment.scheduler.stats()),
+        cache=CacheStats(**prediction_cache.stats()),
+        dedup=DedupStats(**single_flight.stats()),
+        near_duplicates=PerceptualIndexStats(**perceptual_index.stats()),
+        admission=AdmissionStats(**admission_controller.stats()),
+        jobs=JobStats(**job_queue.stats()),
+        models=[ModelVersionInfo(**info) for info in model_registry.status()]
     )
 
 @app.get("/health", response_model=HealthCheck, tags=["Health"])
@@ -74,50 +207,599 @@ async def health():
     """Alias for health check"""
     return await health_check()
 
-@app.post("/classify", response_model=ClassificationResult, tags=["Classification"])
-async def classify_endpoint(request: ClassificationRequest):
+@app.get("/health/live", response_model=LivenessCheck, tags=["Health"])
+async def liveness():
+    """Liveness probe: the process is up, even while the model loads"""
+    return LivenessCheck(uptime_seconds=round(time.time() - startup_time, 2))
+
+@app.get("/health/ready", response_model=ReadinessCheck, tags=["Health"])
+async def readiness():
     """
-    Classify waste from image URL
+    Readiness probe: 200 once the model is loaded and warmed up, 503 before
     
-    - **image_url**: Public Firebase Storage URL
-    - **report_id**: Report ID in Firestore
-    - **user_id**: User ID who created the report
+    Includes how long each startup phase took.
+    """
+    deployment = serving_deployment()
+    body = ReadinessCheck(
+        ready=is_ready(),
+        phase=startup_state["phase"],
+        version=deployment.version,
+        engine=deployment.model.engine_name,
+        startup_phases_ms=startup_state["timings"],
+        error=startup_state["error"]
+    )
+    return JSONResponse(status_code=200 if body.ready else 503, content=body.model_dump())
+
+@app.get("/metrics", tags=["Health"], include_in_schema=False)
+async def metrics():
+    """Prometheus metrics: per-stage latency, outcomes, batch sizes and process RSS"""
+    payload, content_type = render_latest()
+    return Response(content=payload, headers={"Content-Type": content_type})
+
+def _client_timeout(
+    x_request_timeout_ms: Optional[float] = Header(
+        None,
+        description="Milliseconds the caller will wait; work is abandoned after that"
+    )
+) -> Optional[float]:
+    """Time budget sent by the caller, in seconds"""
+    if x_request_timeout_ms is None:
+        return None
+    return x_request_timeout_ms / 1000
+
+@asynccontextmanager
+async def _admitted(endpoint: str, items: int = 1, timeout_s: Optional[float] = None):
+    """
+    Hold an admission slot for the request, or reject it with 429
     
-    Returns classification with confidence level
+    Yields the request deadline (event loop time): REQUEST_DEADLINE_S, or
+    the caller's own timeout when it is shorter.
     """
+    if timeout_s is not None and timeout_s <= 0:
+        # The caller gave up before we could start
+        raise _deadline_exceeded(endpoint, items)
     try:
-        logger.info(f"📥 Received classification request for report {request.report_id}")
-        
-        # Verify model is loaded
-        if not classifier_model.is_loaded():
-            raise HTTPException(
-                status_code=503,
-                detail="Model not loaded. Service unavailable."
-            )
+        deadline = await admission_controller.acquire(timeout_s)
+    except AdmissionRejected as e:
+        record_request(endpoint, "rejected", items)
+        logger.warning(f"🚦 Rejected {endpoint} request: {e}")
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    
+    admitted_at = time.perf_counter()
+    try:
+        yield deadline
+    finally:
+        admission_controller.release(time.perf_counter() - admitted_at)
+
+def _remaining(deadline: float) -> float:
+    """Seconds left before the request deadline"""
+    return max(0.0, deadline - asyncio.get_running_loop().time())
+
+def _deadline_exceeded(endpoint: str, items: int = 1) -> HTTPException:
+    record_request(endpoint, "deadline", items)
+    return HTTPException(status_code=504, detail="Request deadline exceeded")
+
+def _client_closed(endpoint: str, items: int = 1) -> HTTPException:
+    # Nobody reads this response; 499 (nginx's "client closed request") keeps logs honest
+    record_request(endpoint, "cancelled", items)
+    return HTTPException(status_code=499, detail="Client closed request")
+
+class ClientDisconnected(Exception):
+    """The client closed the connection before the response was ready"""
+
+async def _until_disconnected(request: Request):
+    """Return once the client closes the connection (the body was already read)"""
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            return
+
+async def _supervised(request: Optional[Request], work, deadline: float):
+    """
+    Run work until it finishes, the deadline passes or the client leaves
+    
+    Whatever the work was doing when it is abandoned (a download, a
+    queued batch slot, decoding) is cancelled and counted in
+    classifier_cancelled_total.
+    
+    Args:
+        request: Request to watch for a disconnect (None to skip)
+        work: Coroutine to run
+        deadline: Event loop time after which the work is abandoned
         
-        # Classify
-        classification, confidence, processing_time = await classify_waste(
-            image_url=str(request.image_url),
-            model=classifier_model
+    Raises:
+        asyncio.TimeoutError: If the deadline passed
+        ClientDisconnected: If the client closed the connection
+    """
+    state = {"reason": None}
+    token = cancel_reason.set(state)
+    try:
+        task = asyncio.ensure_future(work)
+    finally:
+        cancel_reason.reset(token)
+    watched = {task}
+    if request is not None:
+        watched.add(asyncio.ensure_future(_until_disconnected(request)))
+    
+    try:
+        done, _ = await asyncio.wait(
+            watched, timeout=_remaining(deadline), return_when=asyncio.FIRST_COMPLETED
         )
+    except asyncio.CancelledError:
+        for pending in watched:
+            pending.cancel()
+        raise
+    
+    for pending in watched - {task}:
+        pending.cancel()
+    if task in done:
+        return task.result()
+    
+    state["reason"] = "deadline" if not done else "disconnect"
+    task.cancel()
+    # Let the stages see the cancellation before reporting it
+    await asyncio.gather(task, return_exceptions=True)
+    if state["reason"] == "deadline":
+        raise asyncio.TimeoutError()
+    raise ClientDisconnected()
+
+async def _run_classification(
+    endpoint: str,
+    report_id: str,
+    pipeline,
+    deadline: float,
+    request: Optional[Request] = None
+) -> ClassificationResult:
+    """
+    Route a request to a model version and run a single-image pipeline on it
+    
+    Shared by /classify and /classify/upload so both report the same
+    metrics and map errors to the same status codes.
+    
+    Args:
+        endpoint: Endpoint label used in metrics
+        report_id: Report ID echoed in the result and used as routing key
+        pipeline: Callable taking the ModelDeployment and returning a
+            coroutine that yields (classification, confidence,
+            processing_time_ms, duplicate_of)
+        deadline: Event loop time after which the work is abandoned
+        request: Request to watch; the work is abandoned if its client
+            disconnects
+    """
+    start_time = time.perf_counter()
+    outcome = "error"
+    IN_FLIGHT.inc()
+    try:
+        async with model_registry.route(report_id).serving() as deployment:
+            classification, confidence, processing_time, duplicate_of = await _supervised(
+                request, pipeline(deployment), deadline
+            )
         
         result = ClassificationResult(
             classification=classification,
             confidence=round(confidence, 4),
-            report_id=request.report_id,
+            report_id=report_id,
             processing_time_ms=processing_time,
-            model_version=classifier_model.version
+            model_version=deployment.version,
+            duplicate_of=duplicate_of
         )
         
+        outcome = "success"
         logger.info(f"✅ Classification complete: {result.classification} ({result.confidence:.2%})")
         return result
         
+    except asyncio.TimeoutError:
+        # Queued batch slots and downloads were cancelled with the pipeline
+        outcome = "deadline"
+        logger.warning(f"⏱️ Deadline exceeded for report {report_id}")
+        raise HTTPException(status_code=504, detail="Request deadline exceeded")
+    except ClientDisconnected:
+        outcome = "cancelled"
+        logger.warning(f"🔌 Client disconnected, abandoned report {report_id}")
+        raise HTTPException(status_code=499, detail="Client closed request")
+    except ImageTooLargeError as e:
+        outcome = "invalid"
+        logger.error(f"❌ Validation error: {e}")
+        raise HTTPException(status_code=413, detail=str(e))
     except ValueError as e:
+        outcome = "invalid"
         logger.error(f"❌ Validation error: {e}")
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"❌ Internal error: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Internal server error")
+    finally:
+        IN_FLIGHT.dec()
+        observe_stage("total", time.perf_counter() - start_time)
+        record_request(endpoint, outcome)
+
+def _require_ready(endpoint: str, items: int = 1):
+    """Reject the request with 503 while the model is still loading"""
+    if not is_ready():
+        record_request(endpoint, "unavailable", items)
+        raise HTTPException(
+            status_code=503,
+            detail="Model not loaded. Service unavailable."
+        )
+
+@app.post("/classify", response_model=ClassificationResult, tags=["Classification"])
+async def classify_endpoint(
+    request: ClassificationRequest,
+    http_request: Request,
+    timeout_s: Optional[float] = Depends(_client_timeout)
+):
+    """
+    Classify waste from image URL
+    
+    - **image_url**: Public Firebase Storage URL
+    - **report_id**: Report ID in Firestore
+    - **user_id**: User ID who created the report
+    
+    Returns classification with confidence level. The work is abandoned
+    when the client disconnects or its `X-Request-Timeout-Ms` runs out.
+    """
+    logger.info(f"📥 Received classification request for report {request.report_id}")
+    
+    # Verify model is loaded
+    _require_ready("classify")
+    
+    async with _admitted("classify", timeout_s=timeout_s) as deadline:
+        return await _run_classification(
+            "classify",
+            request.report_id,
+            lambda deployment: classify_waste(
+                image_url=str(request.image_url),
+                model=deployment.model,
+                scheduler=deployment.scheduler,
+                cache=prediction_cache,
+                report_id=request.report_id,
+                pool=deployment.pool,
+                flight=single_flight,
+                phash_index=perceptual_index
+            ),
+            deadline,
+            http_request
+        )
+
+async def _iter_upload(upload: UploadFile, chunk_size: int = 64 * 1024):
+    """Yield an uploaded file in chunks"""
+    while chunk := await upload.read(chunk_size):
+        yield chunk
+
+async def _read_upload(
+    request: Request,
+    report_id: Optional[str],
+    max_size_mb: int
+) -> tuple[str, bytes]:
+    """
+    Read the image and report id from a raw or multipart upload
+    
+    Raises:
+        HTTPException: 400/413/415 for a malformed, oversized or unsupported body
+    """
+    content_type = request.headers.get("content-type", "")
+    try:
+        if content_type.startswith("multipart/form-data"):
+            async with request.form() as form:
+                upload = form.get("file")
+                if not isinstance(upload, UploadFile):
+                    raise ValueError("Multipart upload must include a 'file' field")
+                report_id = report_id or form.get("report_id")
+                image_bytes = await read_limited(_iter_upload(upload), max_size_mb)
+        elif content_type.startswith(("image/", "application/octet-stream")):
+            image_bytes = await read_limited(request.stream(), max_size_mb)
+        else:
+            record_request("classify_upload", "invalid")
+            raise HTTPException(
+                status_code=415,
+                detail="Send the image as image/* or multipart/form-data"
+            )
+        
+        if not report_id:
+            raise ValueError("report_id is required")
+        if not image_bytes:
+            raise ValueError("Empty image body")
+    except ImageTooLargeError as e:
+        record_request("classify_upload", "invalid")
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        record_request("classify_upload", "invalid")
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return report_id, image_bytes
+
+@app.post("/classify/upload", response_model=ClassificationResult, tags=["Classification"])
+async def classify_upload_endpoint(
+    request: Request,
+    report_id: Optional[str] = None,
+    timeout_s: Optional[float] = Depends(_client_timeout)
+):
+    """
+    Classify waste from an uploaded photo, skipping the Storage round trip
+    
+    Accepts either the raw image as the request body (`Content-Type: image/*`
+    or `application/octet-stream`) or a `multipart/form-data` upload with a
+    `file` field. `report_id` goes in the query string or, for multipart,
+    as a form field.
+    
+    Returns the same result as /classify
+    """
+    _require_ready("classify_upload")
+    
+    max_size_mb = config.MAX_IMAGE_SIZE_MB
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_size_mb * 1024 * 1024:
+        record_request("classify_upload", "invalid")
+        raise HTTPException(status_code=413, detail=f"Image exceeds {max_size_mb}MB")
+    
+    async with _admitted("classify_upload", timeout_s=timeout_s) as deadline:
+        try:
+            report_id, image_bytes = await _supervised(
+                None, _read_upload(request, report_id, max_size_mb), deadline
+            )
+        except asyncio.TimeoutError:
+            record_cancelled("upload", "deadline")
+            raise _deadline_exceeded("classify_upload")
+        except ClientDisconnect:
+            record_cancelled("upload", "disconnect")
+            raise _client_closed("classify_upload")
+        
+        logger.info(
+            f"📥 Received upload for report {report_id} "
+            f"({len(image_bytes) / (1024 * 1024):.2f}MB)"
+        )
+        
+        return await _run_classification(
+            "classify_upload",
+            report_id,
+            lambda deployment: classify_image_bytes(
+                image_bytes,
+                model=deployment.model,
+                scheduler=deployment.scheduler,
+                cache=prediction_cache,
+                report_id=report_id,
+                pool=deployment.pool,
+                phash_index=perceptual_index
+            ),
+            deadline,
+            request
+        )
+
+@app.post(
+    "/classify/batch",
+    response_model=BatchClassificationResponse,
+    tags=["Classification"]
+)
+async def classify_batch_endpoint(
+    request: BatchClassificationRequest,
+    http_request: Request,
+    timeout_s: Optional[float] = Depends(_client_timeout)
+):
+    """
+    Classify several images in one call
+    
+    Images are downloaded concurrently and classified in a single forward
+    pass. Each item gets either a result or an error, so one bad URL does
+    not fail the whole batch.
+    """
+    if not request.items:
+        raise HTTPException(status_code=400, detail="Batch must contain at least one item")
+    if len(request.items) > config.CLASSIFY_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch exceeds {config.CLASSIFY_BATCH_MAX_ITEMS} items"
+        )
+    
+    _require_ready("classify_batch", len(request.items))
+    
+    logger.info(f"📥 Received batch classification request ({len(request.items)} items)")
+    start_time = time.time()
+    
+    async with _admitted("classify_batch", len(request.items), timeout_s) as deadline:
+        IN_FLIGHT.inc()
+        try:
+            # The whole batch runs on one version so it stays a single forward pass
+            async with model_registry.route().serving() as deployment:
+                predictions = await _supervised(
+                    http_request,
+                    classify_waste_batch(
+                        image_urls=[str(item.image_url) for item in request.items],
+                        model=deployment.model,
+                        cache=prediction_cache,
+                        report_ids=[item.report_id for item in request.items],
+                        pool=deployment.pool,
+                        flight=single_flight,
+                        phash_index=perceptual_index
+                    ),
+                    deadline
+                )
+        except asyncio.TimeoutError:
+            logger.warning(f"⏱️ Deadline exceeded for batch of {len(request.items)} items")
+            raise _deadline_exceeded("classify_batch", len(request.items))
+        except ClientDisconnected:
+            logger.warning(f"🔌 Client disconnected, abandoned batch of {len(request.items)} items")
+            raise _client_closed("classify_batch", len(request.items))
+        except Exception as e:
+            record_request("classify_batch", "error", len(request.items))
+            logger.error(f"❌ Internal error: {e}", exc_info=True)
+            raise HTTPException(status_code=500, detail="Internal server error")
+        finally:
+            IN_FLIGHT.dec()
+            observe_stage("total", time.time() - start_time)
+    
+    processing_time = int((time.time() - start_time) * 1000)
+    
+    results = []
+    for item, prediction in zip(request.items, predictions):
+        if isinstance(prediction, Exception):
+            record_request("classify_batch", "invalid")
+            results.append(BatchItemResult(report_id=item.report_id, error=str(prediction)))
+            continue
+        record_request("classify_batch", "success")
+        classification, confidence, duplicate_of = prediction
+        results.append(BatchItemResult(
+            report_id=item.report_id,
+            result=ClassificationResult(
+                classification=classification,
+                confidence=round(confidence, 4),
+                report_id=item.report_id,
+                processing_time_ms=processing_time,
+                model_version=deployment.version,
+                duplicate_of=duplicate_of
+            )
+        ))
+    
+    return BatchClassificationResponse(results=results, processing_time_ms=processing_time)
+
+async def _classify_job(job: Job) -> dict:
+    """Run one attempt of a job on the version its report routes to"""
+    if not is_ready():
+        raise RuntimeError("Model not loaded")
+    
+    async with model_registry.route(job.report_id).serving() as deployment:
+        classification, confidence, processing_time, duplicate_of = await classify_waste(
+            image_url=job.image_url,
+            model=deployment.model,
+            scheduler=deployment.scheduler,
+            cache=prediction_cache,
+            report_id=job.report_id,
+            pool=deployment.pool,
+            flight=single_flight,
+            phash_index=perceptual_index
+        )
+    
+    return ClassificationResult(
+        classification=classification,
+        confidence=round(confidence, 4),
+        report_id=job.report_id,
+        processing_time_ms=processing_time,
+        model_version=deployment.version,
+        duplicate_of=duplicate_of
+    ).model_dump()
+
+# Background classification jobs (POST /jobs)
+job_queue = JobQueue(
+    _classify_job,
+    workers=config.JOB_WORKERS,
+    max_pending=config.JOB_MAX_PENDING,
+    max_attempts=config.JOB_MAX_ATTEMPTS,
+    retry_base_s=config.JOB_RETRY_BASE_S,
+    retry_max_s=config.JOB_RETRY_MAX_S,
+    result_ttl_s=config.JOB_RESULT_TTL_S,
+    callback_timeout_s=config.CALLBACK_TIMEOUT_S,
+    callback_max_attempts=config.CALLBACK_MAX_ATTEMPTS,
+    callback_allowed_hosts=config.CALLBACK_ALLOWED_HOSTS,
+    job_timeout_s=config.REQUEST_DEADLINE_S
+)
+
+@app.post("/jobs", response_model=JobInfo, status_code=202, tags=["Classification"])
+async def submit_job(request: JobRequest, response: Response):
+    """
+    Queue a classification and return immediately with a job id
+    
+    The result can be polled at `GET /jobs/{job_id}` or, when
+    `callback_url` is given, is POSTed there as soon as the job finishes
+    (only to `CALLBACK_ALLOWED_HOSTS`; other hosts get a 422).
+    Jobs are accepted while the model is still loading and retried with
+    backoff until it is ready.
+    """
+    try:
+        job = job_queue.submit(
+            image_url=str(request.image_url),
+            report_id=request.report_id,
+            user_id=request.user_id,
+            callback_url=str(request.callback_url) if request.callback_url else None
+        )
+    except CallbackNotAllowed as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "5"})
+    
+    response.headers["Location"] = f"/jobs/{job.id}"
+    return JobInfo(**job.to_dict())
+
+@app.get("/jobs/{job_id}", response_model=JobInfo, tags=["Classification"])
+async def get_job(job_id: str):
+    """Return a job's status and, once it succeeded, its result"""
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    return JobInfo(**job.to_dict())
+
+def _require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Allow /models changes only with the configured admin token"""
+    if config.MODEL_ADMIN_TOKEN is None:
+        raise HTTPException(status_code=403, detail="Model admin API is disabled (set MODEL_ADMIN_TOKEN)")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, config.MODEL_ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+@app.get("/models", response_model=list[ModelVersionInfo], tags=["Models"])
+async def list_models():
+    """List loaded, loading and failed model versions with their traffic share"""
+    return [ModelVersionInfo(**info) for info in model_registry.status()]
+
+@app.post(
+    "/models",
+    response_model=list[ModelVersionInfo],
+    status_code=202,
+    tags=["Models"],
+    dependencies=[Depends(_require_admin)]
+)
+async def load_model_version(request: ModelLoadRequest):
+    """
+    Load and warm up a new model version in the background
+    
+    The current versions keep serving while it loads. Once warm it receives
+    `traffic_percent` of requests (the other versions are scaled down to
+    fit); with 100 it replaces them in a single swap, with 0 it waits on
+    standby for PUT /models/traffic.
+    """
+    try:
+        model_registry.load_in_background(
+            request.version,
+            request.model_path,
+            engine=request.engine,
+            traffic_percent=request.traffic_percent
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    logger.info(f"📦 Loading model {request.version} from {request.model_path}")
+    return [ModelVersionInfo(**info) for info in model_registry.status()]
+
+@app.put(
+    "/models/traffic",
+    response_model=list[ModelVersionInfo],
+    tags=["Models"],
+    dependencies=[Depends(_require_admin)]
+)
+async def set_model_traffic(request: TrafficSplit):
+    """Replace the traffic split between loaded versions (must add up to 100)"""
+    try:
+        model_registry.set_traffic(request.weights)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return [ModelVersionInfo(**info) for info in model_registry.status()]
+
+@app.delete(
+    "/models/{version}",
+    response_model=list[ModelVersionInfo],
+    tags=["Models"],
+    dependencies=[Depends(_require_admin)]
+)
+async def unload_model_version(version: str):
+    """Unload a version without traffic once its in-flight requests finish"""
+    try:
+        await model_registry.unload(version)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    prediction_cache.clear(version)
+    perceptual_index.clear(version)
+    return [ModelVersionInfo(**info) for info in model_registry.status()]
 
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
@@ -0,0 +1,138 @@
+# Prometheus metrics for the classifier service
+import asyncio
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+# Latency buckets from 1ms to 30s (downloads and cold inference sit at the top)
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+
+STAGE_SECONDS = Histogram(
+    "classifier_stage_seconds",
+    "Time spent in each pipeline stage",
+    ["stage"],
+    buckets=LATENCY_BUCKETS
+)
+
+REQUESTS_TOTAL = Counter(
+    "classifier_requests_total",
+    "Classified images by endpoint and outcome (batch calls count each item)",
+    ["endpoint", "outcome"]
+)
+
+PREDICTIONS_TOTAL = Counter(
+    "classifier_predictions_total",
+    "Predictions returned by class, model version and source (model, cache or phash)",
+    ["classification", "version", "source"]
+)
+
+IN_FLIGHT = Gauge(
+    "classifier_in_flight_requests",
+    "Classification requests currently being processed"
+)
+
+BATCH_SIZE = Histogram(
+    "classifier_batch_size",
+    "Images per forward pass",
+    buckets=(1, 2, 4, 8, 16, 32, 64)
+)
+
+DEDUP_TOTAL = Counter(
+    "classifier_dedup_total",
+    "Requests that started a computation (leader) or joined one (follower)",
+    ["role"]
+)
+
+JOBS_TOTAL = Counter(
+    "classifier_jobs_total",
+    "Asynchronous job attempts by outcome (succeeded, failed, retried)",
+    ["outcome"]
+)
+
+CALLBACKS_TOTAL = Counter(
+    "classifier_callbacks_total",
+    "Job callback deliveries by outcome (delivered, failed, retried)",
+    ["outcome"]
+)
+
+JOBS_PENDING = Gauge(
+    "classifier_jobs_pending",
+    "Jobs accepted and not finished yet (queued, running or waiting to retry)"
+)
+
+CANCELLED_TOTAL = Counter(
+    "classifier_cancelled_total",
+    "Work abandoned before finishing, by why (disconnect, deadline) and the stage it was in",
+    ["reason", "stage"]
+)
+
+REJECTED_TOTAL = Counter(
+    "classifier_rejected_total",
+    "Requests shed by admission control",
+    ["reason"]
+)
+
+ADMISSION_QUEUED = Gauge(
+    "classifier_admission_queue_depth",
+    "Requests waiting for an admission slot"
+)
+
+QUEUE_DEPTH = Gauge(
+    "classifier_batch_queue_depth",
+    "Preprocessed images waiting for a batch slot"
+)
+
+# Process RSS, CPU and open fds come from prometheus_client's default
+# process collector (process_resident_memory_bytes, ...).
+
+
+def observe_stage(stage: str, seconds: float):
+    """Record the duration of a pipeline stage"""
+    STAGE_SECONDS.labels(stage=stage).observe(seconds)
+
+
+# Why the current request's work is being cancelled; the API layer sets a
+# dict here before starting the work and fills in "reason" when it aborts it
+cancel_reason: ContextVar[Optional[dict]] = ContextVar("cancel_reason", default=None)
+
+
+def record_cancelled(stage: str, reason: Optional[str] = None):
+    """Count work abandoned during a stage"""
+    if reason is None:
+        state = cancel_reason.get()
+        reason = (state or {}).get("reason") or "shutdown"
+    CANCELLED_TOTAL.labels(reason=reason, stage=stage).inc()
+
+
+@contextmanager
+def time_stage(stage: str):
+    """Context manager that records how long its body took (and cancellations)"""
+    started = time.perf_counter()
+    try:
+        yield
+    except asyncio.CancelledError:
+        record_cancelled(stage)
+        raise
+    finally:
+        observe_stage(stage, time.perf_counter() - started)
+
+
+def record_prediction(classification: str, version: str, source: str = "model"):
+    """Count a returned prediction"""
+    PREDICTIONS_TOTAL.labels(classification=classification, version=version, source=source).inc()
+
+
+def record_request(endpoint: str, outcome: str, items: int = 1):
+    """Count finished classification items"""
+    REQUESTS_TOTAL.labels(endpoint=endpoint, outcome=outcome).inc(items)
+
+
+def render_latest() -> tuple[bytes, str]:
+    """Return the exposition payload and its content type"""
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -1,30 +1,77 @@
 # Model loader and predictor
-import tensorflow as tf
 from pathlib import Path
 import logging
 import numpy as np
 from PIL import Image
+from typing import Optional
 import io
+import time
+
+from . import config
+from .engines import InferenceEngine, KerasEngine, create_engine, engine_for_path
 
 logger = logging.getLogger(__name__)
 
+class ImageTooLargeError(ValueError):
+    """Raised when an image body exceeds the configured size limit"""
+
 class WasteClassifierModel:
     """
-    Waste classifier using TensorFlow/Keras model
+    Waste classifier running a TensorFlow/Keras network
     Classifies waste into: Orgánico, Aprovechable, No Aprovechable
+    
+    The network runs through a pluggable InferenceEngine: full Keras, or a
+    lighter TFLite / ONNX Runtime build of the same model (see app.convert).
     """
     
-    def __init__(self, model_path: str = "models/waste_classifier_v1.h5"):
-        self.model = None
+    def __init__(
+        self,
+        model_path: str = "models/waste_classifier_v1.h5",
+        engine: Optional[str] = None,
+        version: str = "1.0.0",
+        batch_buckets: Optional[list[int]] = None,
+        max_pixels: Optional[int] = None
+    ):
+        self.engine: Optional[InferenceEngine] = None
         self.model_path = Path(model_path)
+        self.engine_name = engine or engine_for_path(self.model_path)
         self.class_names = ["Aprovechable", "No Aprovechable", "Orgánico"]
         self.input_size = (224, 224)  # Ajustar según tu modelo
-        self.version = "1.0.0"
+        self.version = version
+        # Padded batch sizes compiled and warmed up at load (keras/savedmodel)
+        self.batch_buckets = config.INFERENCE_BATCH_BUCKETS if batch_buckets is None else batch_buckets
+        # Largest image (in decoded pixels) preprocess_image() will decode
+        self.max_pixels = config.MAX_IMAGE_PIXELS if max_pixels is None else max_pixels
+        # Milliseconds spent in each load phase (import, load, warmup)
+        self.load_timings: dict[str, float] = {}
+        # True when load() fell back to the random test network
+        self.is_dummy = False
+        # True when the engine lives in worker processes (see load_for_workers)
+        self.in_workers = False
         
+    def load_for_workers(self) -> bool:
+        """
+        Prepare a model whose inference runs in worker processes
+        
+        Each worker loads its own engine, so this process only checks the
+        model file instead of holding another copy it would never run.
+        There is no dummy fallback: every worker would build a different
+        random network and answer the same image differently.
+        """
+        self.load_timings = {}
+        self.is_dummy = False
+        if not self.model_path.exists():
+            logger.error(f"❌ Model file not found at {self.model_path} (no dummy model with worker processes)")
+            return False
+        self.in_workers = True
+        return True
+    
     def load(self) -> bool:
         """Load the model at startup (warm-up)"""
+        self.load_timings = {}
+        self.is_dummy = False
         try:
-            logger.info(f"🔄 Loading model from {self.model_path}")
+            logger.info(f"🔄 Loading model from {self.model_path} ({self.engine_name} engine)")
             
             # Check if model file exists
             if not self.model_path.exists():
@@ -33,65 +80,146 @@ class WasteClassifierModel:
                 self._load_dummy_model()
                 return True
             
+            # Import the runtime (TensorFlow is only imported here, lazily)
+            phase_start = time.perf_counter()
+            engine = create_engine(self.engine_name, self.input_size, **self._engine_options())
+            engine.import_runtime()
+            phase_start = self._record_phase("import", phase_start)
+            
             # Load actual model
-            self.model = tf.keras.models.load_model(str(self.model_path))
+            engine.load(self.model_path)
+            phase_start = self._record_phase("load", phase_start)
             
-            # Warm-up: run dummy prediction
-            dummy_input = np.zeros((1, *self.input_size, 3), dtype=np.float32)
-            _ = self.model.predict(dummy_input, verbose=0)
+            # Warm-up: run a dummy prediction for every compiled batch size
+            engine.warmup()
+            self._record_phase("warmup", phase_start)
             
-            logger.info("✅ Model loaded and warmed up successfully")
+            self.engine = engine
+            logger.info(f"✅ Model loaded and warmed up successfully {self.load_timings}")
             return True
             
         except Exception as e:
             logger.error(f"❌ Error loading model: {e}")
             logger.info("📝 Falling back to dummy model for testing...")
-            self._load_dummy_model()
+            try:
+                self._load_dummy_model()
+            except ImportError as import_error:
+                # Lite images ship without TensorFlow, so no dummy model either
+                logger.error(f"❌ Dummy model unavailable: {import_error}")
+                return False
             return True
     
+    def _engine_options(self) -> dict:
+        """Thread counts and batch buckets passed to the inference engine"""
+        intra_op_threads, inter_op_threads = config.inference_threads()
+        return {
+            "intra_op_threads": intra_op_threads,
+            "inter_op_threads": inter_op_threads,
+            "batch_buckets": self.batch_buckets,
+        }
+    
+    def _record_phase(self, phase: str, started: float) -> float:
+        """Store the duration of a load phase and return the current time"""
+        now = time.perf_counter()
+        self.load_timings[f"{phase}_ms"] = round((now - started) * 1000, 1)
+        return now
+    
     def _load_dummy_model(self):
         """Create a dummy model for testing when real model is not available"""
         logger.info("🔨 Creating dummy model for testing...")
         
-        # Simple model that returns random predictions
-        inputs = tf.keras.Input(shape=(*self.input_size, 3))
-        x = tf.keras.layers.GlobalAveragePooling2D()(inputs)
-        outputs = tf.keras.layers.Dense(3, activation='softmax')(x)
+        phase_start = time.perf_counter()
+        engine = KerasEngine(self.input_size, **self._engine_options())
+        engine.import_runtime()
+        phase_start = self._record_phase("import", phase_start)
+        engine.load_dummy()
+        phase_start = self._record_phase("load", phase_start)
+        engine.warmup()
+        self._record_phase("warmup", phase_start)
         
-        self.model = tf.keras.Model(inputs=inputs, outputs=outputs)
+        self.engine = engine
+        self.is_dummy = True
         logger.info("✅ Dummy model created successfully")
     
     def is_loaded(self) -> bool:
-        """Check if model is loaded"""
-        return self.model is not None
+        """Check if model is loaded (here or in the worker processes)"""
+        return self.engine is not None or self.in_workers
     
-    def preprocess_image(self, image_bytes: bytes) -> np.ndarray:
+    def open_image(self, image_bytes: bytes) -> Image.Image:
         """
-        Preprocess image for model input
+        Read the image header and check it fits the pixel budget
+        
+        Nothing is decoded yet. JPEGs are set up to decode at reduced
+        resolution (DCT scaling) close to the model input size, and the
+        budget applies to that reduced size.
         
         Args:
             image_bytes: Raw image bytes
             
         Returns:
-            Preprocessed image array ready for model
+            The lazily decoded image
+            
+        Raises:
+            ImageTooLargeError: If decoding would exceed max_pixels
         """
-        # Load image
-        img = Image.open(io.BytesIO(image_bytes))
+        try:
+            img = Image.open(io.BytesIO(image_bytes))
+        except Image.DecompressionBombError as e:
+            raise ImageTooLargeError(str(e))
         
-        # Convert to RGB if necessary
-        if img.mode != 'RGB':
-            img = img.convert('RGB')
+        # Ask the JPEG decoder for a downscaled image (no-op for other formats)
+        img.draft('RGB', self.input_size)
         
-        # Resize to model input size
-        img = img.resize(self.input_size)
+        width, height = img.size
+        if self.max_pixels and width * height > self.max_pixels:
+            raise ImageTooLargeError(
+                f"{img.format or 'Image'} of {width}x{height} pixels exceeds "
+                f"the {self.max_pixels} pixel decode limit"
+            )
+        return img
+    
+    def preprocess_image(self, image_bytes: bytes, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Preprocess image for model input
+        
+        The header is checked first (open_image), then pixels are decoded,
+        resized and kept uint8; the model graph rescales them to 0-1.
+        
+        Args:
+            image_bytes: Raw image bytes
+            out: Optional uint8 buffer of shape (1, height, width, 3) to write
+                into, e.g. a slot of a preallocated batch array
+            
+        Returns:
+            Preprocessed uint8 image array with a leading batch dimension
+            
+        Raises:
+            ImageTooLargeError: If the image is over the pixel budget or does
+                not fit in the worker memory limit
+        """
+        # Load image (header only; pixels are decoded lazily)
+        img = self.open_image(image_bytes)
         
-        # Convert to array and normalize (0-1)
-        img_array = np.array(img, dtype=np.float32) / 255.0
+        try:
+            # Convert to RGB if necessary
+            if img.mode != 'RGB':
+                img = img.convert('RGB')
+            
+            # Resize to model input size
+            img = img.resize(self.input_size, reducing_gap=3.0)
+        except MemoryError:
+            raise ImageTooLargeError("Image does not fit in the worker memory limit")
         
-        # Add batch dimension
-        img_array = np.expand_dims(img_array, axis=0)
+        # Copy pixels straight into the uint8 buffer (no float intermediates)
+        if out is None:
+            out = np.empty((1, self.input_size[1], self.input_size[0], 3), dtype=np.uint8)
+        out[0] = np.asarray(img)
         
-        return img_array
+        return out
+    
+    def empty_batch(self, size: int) -> np.ndarray:
+        """Allocate a uint8 batch buffer for preprocess_image(out=...)"""
+        return np.empty((size, self.input_size[1], self.input_size[0], 3), dtype=np.uint8)
     
     def predict(self, image_bytes: bytes) -> tuple[str, float]:
         """
@@ -113,16 +241,41 @@ class WasteClassifierModel:
         processed_img = self.preprocess_image(image_bytes)
         
         # Predict
-        predictions = self.model.predict(processed_img, verbose=0)[0]
-        
-        # Get class with highest confidence
-        class_idx = int(predictions.argmax())
-        confidence = float(predictions[class_idx])
-        classification = self.class_names[class_idx]
+        classification, confidence = self.predict_batch(processed_img)[0]
         
         logger.info(f"🎯 Prediction: {classification} ({confidence:.2%})")
         
         return classification, confidence
+    
+    def predict_batch(self, batch: np.ndarray) -> list[tuple[str, float]]:
+        """
+        Predict waste classification for a batch of preprocessed images
+        
+        Args:
+            batch: Preprocessed images stacked along the first axis
+            
+        Returns:
+            List of (classification, confidence) tuples, one per image
+            
+        Raises:
+            RuntimeError: If model is not loaded in this process
+        """
+        if self.engine is None:
+            raise RuntimeError("Model not loaded")
+        
+        # Single forward pass for the whole batch
+        predictions = self.engine.predict(batch)
+        
+        # Get class with highest confidence for each image
+        class_indices = predictions.argmax(axis=1)
+        return [
+            (self.class_names[int(idx)], float(row[idx]))
+            for idx, row in zip(class_indices, predictions)
+        ]
 
 # Global singleton instance
-classifier_model = WasteClassifierModel()
+classifier_model = WasteClassifierModel(
+    model_path=config.MODEL_PATH,
+    engine=config.MODEL_ENGINE,
+    version=config.MODEL_VERSION
+)
@@ -0,0 +1,147 @@
+# Perceptual hashing and near-duplicate lookup of recent predictions
+import logging
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+from PIL import Image
+
+from . import config
+
+logger = logging.getLogger(__name__)
+
+
+def dhash(pixels: np.ndarray) -> int:
+    """
+    64-bit difference hash of a preprocessed image
+
+    The image is shrunk to 9x8 grayscale and each bit records whether a
+    pixel is brighter than its right neighbour, so small changes in
+    framing, lighting or JPEG quality flip only a few bits.
+
+    Args:
+        pixels: uint8 RGB array of shape (height, width, 3) or (1, height, width, 3)
+
+    Returns:
+        The hash as an unsigned 64-bit integer
+    """
+    if pixels.ndim == 4:
+        pixels = pixels[0]
+    small = Image.fromarray(pixels).convert("L").resize((9, 8), Image.Resampling.BOX)
+    grid = np.asarray(small, dtype=np.int16)
+    bits = (grid[:, 1:] > grid[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+@dataclass
+class NearDuplicate:
+    """A recent prediction whose image looks like the one being classified"""
+    prediction: tuple[str, float]
+    report_id: Optional[str]
+    distance: int
+
+
+class _VersionIndex:
+    """Ring buffer of recent hashes for one model version"""
+
+    def __init__(self, size: int):
+        self.hashes = np.zeros(size, dtype=np.uint64)
+        self.expires = np.zeros(size, dtype=np.float64)
+        self.entries: list[Optional[tuple[tuple[str, float], Optional[str]]]] = [None] * size
+        self.next = 0
+
+    def __len__(self) -> int:
+        return sum(entry is not None for entry in self.entries)
+
+
+class PerceptualIndex:
+    """
+    Recent perceptual hashes with the predictions they produced
+
+    A new image within max_distance bits (Hamming distance) of a recent
+    one reuses that prediction instead of running inference, and the
+    matched report id is returned so likely duplicate reports show up.
+    Entries are scoped to the model version and expire after ttl_seconds;
+    the oldest entry is overwritten once max_entries is reached.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_distance: int = 6, ttl_seconds: float = 3600.0):
+        self.max_entries = max(0, max_entries)
+        self.max_distance = max_distance
+        self.ttl_seconds = ttl_seconds
+        self._versions: dict[str, _VersionIndex] = {}
+        self.lookups = 0
+        self.matches = 0
+
+    @property
+    def enabled(self) -> bool:
+        """Check if the index stores anything at all"""
+        return self.max_entries > 0 and self.max_distance >= 0
+
+    def find(self, image_hash: int, version: str) -> Optional[NearDuplicate]:
+        """
+        Return the closest recent prediction within max_distance, if any
+
+        Args:
+            image_hash: dhash() of the image being classified
+            version: Version of the model that would serve the request
+        """
+        if not self.enabled:
+            return None
+        self.lookups += 1
+        index = self._versions.get(version)
+        if index is None:
+            return None
+
+        diff = np.bitwise_xor(index.hashes, np.uint64(image_hash))
+        distances = np.unpackbits(diff.view(np.uint8)).reshape(-1, 64).sum(axis=1)
+        distances[index.expires < time.monotonic()] = 65
+        slot = int(distances.argmin())
+        if distances[slot] > self.max_distance:
+            return None
+
+        self.matches += 1
+        prediction, report_id = index.entries[slot]
+        return NearDuplicate(prediction, report_id, int(distances[slot]))
+
+    def add(self, image_hash: int, prediction: tuple[str, float], version: str, report_id: Optional[str] = None):
+        """Remember the prediction made for an image"""
+        if not self.enabled:
+            return
+        index = self._versions.get(version)
+        if index is None:
+            index = self._versions[version] = _VersionIndex(self.max_entries)
+
+        slot = index.next
+        index.hashes[slot] = image_hash
+        index.expires[slot] = time.monotonic() + self.ttl_seconds
+        index.entries[slot] = (prediction, report_id)
+        index.next = (slot + 1) % self.max_entries
+
+    def clear(self, version: Optional[str] = None):
+        """Forget every hash, or only those of one model version"""
+        if version is None:
+            self._versions.clear()
+        else:
+            self._versions.pop(version, None)
+
+    def stats(self) -> dict:
+        """Return occupancy and match counters"""
+        return {
+            "enabled": self.enabled,
+            "size": sum(len(index) for index in self._versions.values()),
+            "max_entries": self.max_entries,
+            "max_distance": self.max_distance,
+            "lookups": self.lookups,
+            "matches": self.matches,
+            "match_rate": round(self.matches / self.lookups, 4) if self.lookups else 0.0,
+        }
+
+
+# Global shared index
+perceptual_index = PerceptualIndex(
+    max_entries=config.PHASH_INDEX_SIZE,
+    max_distance=config.PHASH_MAX_DISTANCE,
+    ttl_seconds=config.PHASH_TTL_S
+)
@@ -0,0 +1,336 @@
+# Registry of loaded model versions with weighted traffic routing
+import asyncio
+import hashlib
+import logging
+import random
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from . import config
+from .batching import BatchScheduler
+from .model_loader import WasteClassifierModel
+from .workers import InferencePool
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ModelDeployment:
+    """A loaded model version with its own worker pool and batch scheduler"""
+    model: WasteClassifierModel
+    pool: InferencePool
+    scheduler: BatchScheduler
+    in_flight: int = 0
+
+    @property
+    def version(self) -> str:
+        return self.model.version
+
+    @classmethod
+    def create(cls, model: WasteClassifierModel) -> "ModelDeployment":
+        """Build the pool and scheduler for a model using the service config"""
+        pool = InferencePool(
+            model,
+            processes=config.INFERENCE_PROCESSES,
+            start_method=config.WORKER_START_METHOD,
+            decode_memory_mb=config.DECODE_MEMORY_BUDGET_MB
+        )
+        scheduler = BatchScheduler(
+            pool.predict_batch,
+            max_batch_size=config.BATCH_MAX_SIZE,
+            max_wait_ms=config.BATCH_MAX_WAIT_MS
+        )
+        return cls(model, pool, scheduler)
+
+    async def start(self):
+        """Start the worker pool and the batching loop"""
+        await self.pool.start()
+        await self.scheduler.start()
+
+    async def stop(self):
+        """Stop the batching loop and the worker pool"""
+        await self.scheduler.stop()
+        await asyncio.to_thread(self.pool.shutdown)
+
+    @asynccontextmanager
+    async def serving(self):
+        """Track a request so unloading can wait for it to finish"""
+        self.in_flight += 1
+        try:
+            yield self
+        finally:
+            self.in_flight -= 1
+
+
+class ModelRegistry:
+    """
+    Loaded model versions and the share of traffic each one receives
+
+    New versions are loaded and warmed up in the background while the
+    current ones keep serving; they only start receiving requests once the
+    traffic weights are updated, which replaces the routing table in a
+    single assignment. Requests with a report id are routed by its hash, so
+    retries of the same report stick to the same version.
+    """
+
+    def __init__(self):
+        self._deployments: dict[str, ModelDeployment] = {}
+        self._weights: dict[str, int] = {}
+        # (cumulative upper bound out of 100, version), rebuilt on every change
+        self._routes: list[tuple[int, str]] = []
+        # Versions being loaded in the background, or the error that stopped them
+        self._loading: dict[str, Optional[str]] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    def get(self, version: str) -> Optional[ModelDeployment]:
+        """Return a loaded version"""
+        return self._deployments.get(version)
+
+    def primary(self) -> Optional[ModelDeployment]:
+        """Return the version receiving the largest share of traffic"""
+        if not self._weights:
+            return None
+        version = max(self._weights, key=lambda v: self._weights[v])
+        return self._deployments[version]
+
+    def deployments(self) -> list[ModelDeployment]:
+        """Return every loaded version"""
+        return list(self._deployments.values())
+
+    def has_traffic(self) -> bool:
+        """Check if at least one version is serving requests"""
+        return bool(self._routes)
+
+    def route(self, key: Optional[str] = None) -> ModelDeployment:
+        """
+        Pick the version that serves a request
+
+        Args:
+            key: Optional routing key (the report id); the same key always
+                lands on the same version while the weights are unchanged
+
+        Raises:
+            RuntimeError: If no version is receiving traffic
+        """
+        routes = self._routes
+        if not routes:
+            raise RuntimeError("No model version is serving traffic")
+
+        if key:
+            bucket = int(hashlib.sha1(key.encode()).hexdigest()[:8], 16) % 100
+        else:
+            bucket = random.randrange(100)
+        for upper, version in routes:
+            if bucket < upper:
+                return self._deployments[version]
+        return self._deployments[routes[-1][1]]
+
+    def add(self, deployment: ModelDeployment, traffic_percent: int = 0):
+        """Register an already started deployment"""
+        self._deployments[deployment.version] = deployment
+        if traffic_percent:
+            self.shift_traffic(deployment.version, traffic_percent)
+
+    def set_traffic(self, weights: dict[str, int]):
+        """
+        Replace the traffic split atomically
+
+        Args:
+            weights: Percentage of traffic per version, summing to 100
+
+        Raises:
+            ValueError: If a version is not loaded or the weights are invalid
+        """
+        unknown = [v for v in weights if v not in self._deployments]
+        if unknown:
+            raise ValueError(f"Model versions not loaded: {unknown}")
+        if any(w < 0 or w > 100 for w in weights.values()):
+            raise ValueError("Traffic weights must be between 0 and 100")
+        if sum(weights.values()) != 100:
+            raise ValueError("Traffic weights must add up to 100")
+
+        active = {v: w for v, w in sorted(weights.items()) if w > 0}
+        routes = []
+        upper = 0
+        for version, weight in active.items():
+            upper += weight
+            routes.append((upper, version))
+
+        self._weights = active
+        self._routes = routes
+        logger.info(f"🔀 Traffic split updated: {active}")
+
+    def shift_traffic(self, version: str, percent: int):
+        """
+        Give one version a share of traffic, scaling the others to fit
+
+        Raises:
+            ValueError: If the version is not loaded or percent is out of range
+        """
+        if not 0 <= percent <= 100:
+            raise ValueError("Traffic percent must be between 0 and 100")
+
+        others = {v: w for v, w in self._weights.items() if v != version}
+        if not others:
+            # Nothing else to split with: this version takes everything
+            if percent == 0:
+                raise ValueError(f"No other model version can take traffic from {version}")
+            self.set_traffic({version: 100})
+            return
+
+        remaining = 100 - percent
+        total = sum(others.values())
+        scaled = {v: w * remaining // total for v, w in others.items()}
+        # Hand out rounding leftovers to the largest shares first
+        leftover = remaining - sum(scaled.values())
+        for v in sorted(others, key=lambda v: others[v], reverse=True)[:leftover]:
+            scaled[v] += 1
+
+        scaled[version] = percent
+        self.set_traffic(scaled)
+
+    def _check_new_version(self, version: str, model_path: str, traffic_percent: int):
+        """Validate a load request before any work starts"""
+        if version in self._deployments or self._loading.get(version, "") is None:
+            raise ValueError(f"Model version {version} is already loaded or loading")
+        if not Path(model_path).exists():
+            # No dummy fallback here: a rollout must never serve random weights
+            raise ValueError(f"Model file not found at {model_path}")
+        if not 0 <= traffic_percent <= 100:
+            raise ValueError("Traffic percent must be between 0 and 100")
+
+    async def load(
+        self,
+        version: str,
+        model_path: str,
+        engine: Optional[str] = None,
+        traffic_percent: int = 0
+    ) -> ModelDeployment:
+        """
+        Load, warm up and register a new version
+
+        Args:
+            version: Version label reported in every ClassificationResult
+            model_path: Model artifact (.h5, .tflite, .onnx or SavedModel)
+            engine: Optional engine name (inferred from the path when unset)
+            traffic_percent: Share of traffic to give the version once warm
+
+        Raises:
+            ValueError: If the version already exists or the artifact is missing
+            RuntimeError: If the model cannot be loaded
+        """
+        self._check_new_version(version, model_path, traffic_percent)
+        self._loading[version] = None
+        return await self._load(version, model_path, engine, traffic_percent)
+
+    def load_in_background(
+        self,
+        version: str,
+        model_path: str,
+        engine: Optional[str] = None,
+        traffic_percent: int = 0
+    ):
+        """
+        Start load() as a background task; progress shows up in status()
+
+        Raises:
+            ValueError: If the request is invalid (checked before the task starts)
+        """
+        self._check_new_version(version, model_path, traffic_percent)
+        self._loading[version] = None
+        task = asyncio.create_task(self._load(version, model_path, engine, traffic_percent))
+        self._tasks.add(task)
+        task.add_done_callback(self._background_load_done)
+
+    def _background_load_done(self, task: asyncio.Task):
+        """Forget a finished background load (errors are already in status())"""
+        self._tasks.discard(task)
+        if not task.cancelled():
+            task.exception()
+
+    async def _load(
+        self,
+        version: str,
+        model_path: str,
+        engine: Optional[str],
+        traffic_percent: int
+    ) -> ModelDeployment:
+        try:
+            model = WasteClassifierModel(model_path=model_path, engine=engine, version=version)
+            load = model.load_for_workers if config.INFERENCE_PROCESSES > 0 else model.load
+            if not await asyncio.to_thread(load) or model.is_dummy:
+                raise RuntimeError(f"Failed to load model {version} from {model_path}")
+
+            deployment = ModelDeployment.create(model)
+            await deployment.start()
+        except Exception as e:
+            self._loading[version] = str(e)
+            logger.error(f"❌ Could not load model {version}: {e}")
+            raise
+
+        del self._loading[version]
+        self.add(deployment, traffic_percent)
+        logger.info(f"✅ Model {version} ready ({model.engine_name} engine) {model.load_timings}")
+        return deployment
+
+    async def unload(self, version: str, drain_timeout: float = config.MODEL_DRAIN_TIMEOUT_S):
+        """
+        Stop a version that no longer receives traffic
+
+        Waits up to drain_timeout seconds for its in-flight requests.
+
+        Raises:
+            ValueError: If the version is unknown or still receives traffic
+        """
+        if version not in self._deployments:
+            raise ValueError(f"Model version {version} is not loaded")
+        if self._weights.get(version):
+            raise ValueError(f"Model version {version} still receives traffic")
+
+        deployment = self._deployments.pop(version)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + drain_timeout
+        while deployment.in_flight and loop.time() < deadline:
+            await asyncio.sleep(0.05)
+        if deployment.in_flight:
+            logger.warning(f"⚠️ Unloading {version} with {deployment.in_flight} requests still running")
+
+        await deployment.stop()
+        logger.info(f"🗑️ Model {version} unloaded")
+
+    async def shutdown(self):
+        """Stop every loaded version"""
+        for task in list(self._tasks):
+            task.cancel()
+        for deployment in list(self._deployments.values()):
+            await deployment.stop()
+
+    def status(self) -> list[dict]:
+        """Describe every loaded, loading or failed version"""
+        versions = [
+            {
+                "version": deployment.version,
+                "engine": deployment.model.engine_name,
+                "model_path": str(deployment.model.model_path),
+                "status": "serving" if self._weights.get(version) else "standby",
+                "traffic_percent": self._weights.get(version, 0),
+                "in_flight": deployment.in_flight,
+                "error": None,
+            }
+            for version, deployment in self._deployments.items()
+        ]
+        versions.extend(
+            {
+                "version": version,
+                "status": "loading" if error is None else "failed",
+                "error": error,
+            }
+            for version, error in self._loading.items()
+        )
+        return versions
+
+
+# Global shared registry
+model_registry = ModelRegistry()
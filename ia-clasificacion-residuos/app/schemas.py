@@ -1,6 +1,6 @@
 # Schemas for API requests and responses
-from pydantic import BaseModel, HttpUrl
-from typing import Literal
+from pydantic import BaseModel, Field, HttpUrl
+from typing import Literal, Optional
 
 class ClassificationRequest(BaseModel):
     """Request model for waste classification"""
@@ -27,6 +27,8 @@ class ClassificationResult(BaseModel):
     report_id: str
     processing_time_ms: int
     model_version: str = "1.0.0"
+    # Report whose photo looks like this one (likely the same waste)
+    duplicate_of: Optional[str] = None
     
     model_config = {
         "json_schema_extra": {
@@ -36,15 +38,181 @@ class ClassificationResult(BaseModel):
                     "confidence": 0.95,
                     "report_id": "ECO-12345678",
                     "processing_time_ms": 450,
-                    "model_version": "1.0.0"
+                    "model_version": "1.0.0",
+                    "duplicate_of": None
                 }
             ]
         }
     }
 
+class JobRequest(ClassificationRequest):
+    """Request model for an asynchronous classification job"""
+    callback_url: Optional[HttpUrl] = None
+
+    model_config = {
+        "json_schema_extra": {
+            "examples": [
+                {
+                    "image_url": "https://storage.googleapis.com/bucket/image.jpg",
+                    "report_id": "ECO-12345678",
+                    "user_id": "user_abc123",
+                    "callback_url": "https://backend.example.com/classification-callback"
+                }
+            ]
+        }
+    }
+
+class JobInfo(BaseModel):
+    """State of an asynchronous classification job (also the callback body)"""
+    job_id: str
+    status: Literal["queued", "running", "retrying", "succeeded", "failed"]
+    report_id: str
+    attempts: int = 0
+    result: Optional[ClassificationResult] = None
+    error: Optional[str] = None
+    callback_url: Optional[str] = None
+    callback_status: Optional[Literal["pending", "delivered", "failed"]] = None
+    callback_attempts: int = 0
+    created_at: float
+    updated_at: float
+
+class BatchClassificationRequest(BaseModel):
+    """Request model for classifying several images at once"""
+    items: list[ClassificationRequest]
+
+class BatchItemResult(BaseModel):
+    """Result or error for one item of a batch request"""
+    report_id: str
+    result: Optional[ClassificationResult] = None
+    error: Optional[str] = None
+
+class BatchClassificationResponse(BaseModel):
+    """Response model for batch classification"""
+    results: list[BatchItemResult]
+    processing_time_ms: int
+
+class BatchingStats(BaseModel):
+    """Micro-batching scheduler configuration and statistics"""
+    enabled: bool
+    max_batch_size: int
+    max_wait_ms: float
+    queue_depth: int = 0
+    batches_total: int = 0
+    items_total: int = 0
+    last_batch_size: int = 0
+    avg_batch_size: float = 0.0
+    avg_wait_ms: float = 0.0
+    p99_wait_ms: float = 0.0
+
+class CacheStats(BaseModel):
+    """Prediction cache occupancy and hit/miss counters"""
+    enabled: bool
+    size: int
+    max_entries: int
+    ttl_seconds: float
+    hits: int = 0
+    misses: int = 0
+    hit_rate: float = 0.0
+
+class DedupStats(BaseModel):
+    """Single-flight coalescing of identical concurrent requests"""
+    in_flight: int = 0
+    leaders: int = 0
+    followers: int = 0
+    hit_rate: float = 0.0
+
+class JobStats(BaseModel):
+    """Asynchronous job backlog and outcomes"""
+    workers: int
+    pending: int = 0
+    queued: int = 0
+    retrying: int = 0
+    stored: int = 0
+    succeeded_total: int = 0
+    failed_total: int = 0
+    retried_total: int = 0
+
+class PerceptualIndexStats(BaseModel):
+    """Near-duplicate photo index occupancy and matches"""
+    enabled: bool
+    size: int
+    max_entries: int
+    max_distance: int
+    lookups: int = 0
+    matches: int = 0
+    match_rate: float = 0.0
+
+class AdmissionStats(BaseModel):
+    """Admission control limits and occupancy"""
+    enabled: bool
+    max_in_flight: int
+    max_queued: int
+    deadline_s: float
+    in_flight: int = 0
+    queued: int = 0
+    rejected_total: int = 0
+    expired_total: int = 0
+
+class ModelVersionInfo(BaseModel):
+    """A model version known to the registry"""
+    version: str
+    status: Literal["serving", "standby", "loading", "failed"]
+    engine: Optional[str] = None
+    model_path: Optional[str] = None
+    traffic_percent: int = 0
+    in_flight: int = 0
+    error: Optional[str] = None
+
+    model_config = {"protected_namespaces": ()}
+
 class HealthCheck(BaseModel):
     """Health check response"""
     status: str
     model_loaded: bool
     version: str
     uptime_seconds: float = 0.0
+    batching: Optional[BatchingStats] = None
+    cache: Optional[CacheStats] = None
+    dedup: Optional[DedupStats] = None
+    near_duplicates: Optional[PerceptualIndexStats] = None
+    admission: Optional[AdmissionStats] = None
+    jobs: Optional[JobStats] = None
+    models: list[ModelVersionInfo] = []
+
+class LivenessCheck(BaseModel):
+    """Liveness probe response (the process is up and serving HTTP)"""
+    status: str = "alive"
+    uptime_seconds: float = 0.0
+
+class ReadinessCheck(BaseModel):
+    """Readiness probe response with startup phase timings"""
+    ready: bool
+    phase: str
+    version: str
+    engine: str
+    startup_phases_ms: dict[str, float] = {}
+    error: Optional[str] = None
+
+class ModelLoadRequest(BaseModel):
+    """Request to load a new model version in the background"""
+    version: str
+    model_path: str
+    engine: Optional[str] = None
+    traffic_percent: int = Field(0, ge=0, le=100)
+
+    model_config = {
+        "protected_namespaces": (),
+        "json_schema_extra": {
+            "examples": [
+                {
+                    "version": "1.1.0",
+                    "model_path": "models/waste_classifier_v2_int8.tflite",
+                    "traffic_percent": 10
+                }
+            ]
+        }
+    }
+
+class TrafficSplit(BaseModel):
+    """Percentage of traffic per model version (must add up to 100)"""
+    weights: dict[str, int]
@@ -0,0 +1,142 @@
+# Single-flight coalescing of concurrent identical classification requests
+import asyncio
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Hashable, Iterable, Optional
+
+from .metrics import DEDUP_TOTAL
+
+@dataclass
+class _Flight:
+    """One running computation and the callers waiting for it"""
+    task: asyncio.Future
+    keys: tuple
+    waiters: int = 0
+
+
+class SingleFlight:
+    """
+    Run one computation per key and share its result with concurrent callers
+
+    A computation can be registered under several keys (e.g. the image URL
+    and the report id); a caller matching any of them joins it. The work
+    runs in its own task, so one caller hitting its deadline does not fail
+    the others; it is only cancelled once every caller has given up.
+    """
+
+    def __init__(self):
+        self._flights: dict[Hashable, _Flight] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    def lookup(self, keys: Iterable[Optional[Hashable]]) -> Optional[_Flight]:
+        """Return the in-flight computation matching any of the keys"""
+        for key in keys:
+            if key is not None and key in self._flights:
+                return self._flights[key]
+        return None
+
+    async def run(self, keys: Iterable[Optional[Hashable]], fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Join the computation for keys, or start fn() if there is none
+
+        Args:
+            keys: Keys identifying the request (None entries are ignored)
+            fn: Coroutine function that computes the result
+
+        Returns:
+            The result of the shared computation
+        """
+        keys = tuple(key for key in keys if key is not None)
+        flight = self.lookup(keys)
+        if flight is None:
+            flight = self._start(keys, fn)
+        else:
+            self.record_follower()
+        return await self.wait(flight)
+
+    async def wait(self, flight: _Flight) -> Any:
+        """Wait for a computation found with lookup()"""
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Nobody wants the result any more; stop the work and make
+                # sure a later caller starts afresh instead of joining it
+                self._forget(flight)
+                flight.task.cancel()
+
+    def claim(self, keys: Iterable[Optional[Hashable]]) -> asyncio.Future:
+        """
+        Register work the caller computes itself (e.g. one item of a batch)
+
+        The caller must pass the returned future to resolve() once the
+        result is known, on every path.
+        """
+        keys = tuple(key for key in keys if key is not None)
+        return self._start(keys, asyncio.get_running_loop().create_future()).task
+
+    @staticmethod
+    def resolve(future: asyncio.Future, result: Any):
+        """
+        Complete a claimed future
+
+        Args:
+            future: Future returned by claim()
+            result: (classification, confidence, processing_time_ms) tuple,
+                or the exception that prevented classifying the image
+        """
+        if future.done():
+            # Every caller that joined it has already given up
+            return
+        if isinstance(result, BaseException):
+            future.set_exception(result)
+            # Joined callers receive it through their own await; don't log
+            # it as never retrieved when nobody joined
+            future.exception()
+        else:
+            future.set_result(result)
+
+    def record_follower(self):
+        """Count a request answered by someone else's computation"""
+        self.followers += 1
+        DEDUP_TOTAL.labels(role="follower").inc()
+
+    def stats(self) -> dict:
+        """Return leader/follower counters and the dedup hit rate"""
+        total = self.leaders + self.followers
+        return {
+            "in_flight": len({id(flight) for flight in self._flights.values()}),
+            "leaders": self.leaders,
+            "followers": self.followers,
+            "hit_rate": round(self.followers / total, 4) if total else 0.0,
+        }
+
+    def _start(self, keys: tuple, work) -> _Flight:
+        if not isinstance(work, asyncio.Future):
+            work = asyncio.ensure_future(work())
+        flight = _Flight(work, keys)
+        for key in keys:
+            self._flights[key] = flight
+        flight.task.add_done_callback(lambda _: self._forget(flight))
+        self.leaders += 1
+        DEDUP_TOTAL.labels(role="leader").inc()
+        return flight
+
+    def _forget(self, flight: _Flight):
+        for key in flight.keys:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+
+def flight_keys(version: str, image_url: Optional[str], report_id: Optional[str]) -> tuple:
+    """Keys a classification is coalesced on (results differ per model version)"""
+    return (
+        ("url", version, image_url) if image_url else None,
+        ("report", version, report_id) if report_id else None,
+    )
+
+
+# Global shared coalescer
+single_flight = SingleFlight()
@@ -0,0 +1,177 @@
+# Decode and inference workers (threads or pre-forked processes)
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Optional
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from . import config
+from .model_loader import WasteClassifierModel, classifier_model
+
+logger = logging.getLogger(__name__)
+
+# Model owned by a worker process (set by _init_worker)
+_worker_model: Optional[WasteClassifierModel] = None
+
+# Peak bytes per pixel of one decode: RGBA pixels plus the RGB conversion
+DECODE_BYTES_PER_PIXEL = 7
+
+
+def limit_worker_memory(limit_mb: int = config.WORKER_MEMORY_LIMIT_MB):
+    """
+    Cap the data segment of the current worker process
+    
+    RLIMIT_DATA covers the heap and anonymous mappings (decoded pixels,
+    tensors) but not memory-mapped model files, so TFLite weights shared
+    through the page cache don't count against it. An allocation past the
+    limit raises MemoryError in the worker instead of growing its RSS.
+    """
+    if not limit_mb or resource is None:
+        return
+    limit = limit_mb * 1024 * 1024
+    _, hard = resource.getrlimit(resource.RLIMIT_DATA)
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_DATA, (limit, hard))
+
+
+def _init_worker(model_path: str, engine: Optional[str], version: str):
+    """Load the model once per worker process"""
+    global _worker_model
+    _worker_model = WasteClassifierModel(model_path=model_path, engine=engine, version=version)
+    # A dummy network is random per worker, so predictions would depend on
+    # which worker ran them
+    if not _worker_model.load() or _worker_model.is_dummy:
+        raise RuntimeError(f"Worker could not load model from {model_path}")
+    # The limit counts the loaded model too, so size it with that in mind
+    limit_worker_memory()
+
+
+def _worker_ping() -> int:
+    """Return the worker pid (used to pre-fork the pool)"""
+    return multiprocessing.current_process().pid
+
+
+def _worker_preprocess(image_bytes: bytes) -> np.ndarray:
+    return _worker_model.preprocess_image(image_bytes)
+
+
+def _worker_predict_batch(batch: np.ndarray) -> list[tuple[str, float]]:
+    return _worker_model.predict_batch(batch)
+
+
+class InferencePool:
+    """
+    Runs image decoding and inference off the event loop
+
+    With processes=0 work runs on threads of this process against the
+    shared model. With processes>0 a pool of pre-forked worker processes
+    each holds its own engine, so PIL decoding and inference use every
+    core instead of contending for one GIL. TFLite artifacts are
+    memory-mapped by the interpreter, so all workers share one copy of the
+    weights through the page cache; Keras models are loaded per worker.
+
+    Worker processes are bounded by their memory limit; on threads, decodes
+    take slots so that decode_memory_mb holds that many images of
+    max_pixels at once.
+    """
+
+    def __init__(
+        self,
+        model: WasteClassifierModel,
+        processes: int = 0,
+        start_method: str = "forkserver",
+        decode_memory_mb: int = config.DECODE_MEMORY_BUDGET_MB
+    ):
+        self.model = model
+        self.processes = max(0, processes)
+        self.start_method = start_method
+        self._executor: Optional[Executor] = None
+        self.decode_slots = 0
+        self._decode_slots: Optional[asyncio.Semaphore] = None
+        if decode_memory_mb and model.max_pixels:
+            per_decode = model.max_pixels * DECODE_BYTES_PER_PIXEL
+            self.decode_slots = max(1, decode_memory_mb * 1024 * 1024 // per_decode)
+            self._decode_slots = asyncio.Semaphore(self.decode_slots)
+
+    @property
+    def uses_processes(self) -> bool:
+        """Check if work is dispatched to worker processes"""
+        return self.processes > 0
+
+    async def start(self):
+        """Pre-fork the worker processes and wait until their models are loaded"""
+        if not self.uses_processes or self._executor is not None:
+            return
+
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=multiprocessing.get_context(self.start_method),
+            initializer=_init_worker,
+            initargs=(str(self.model.model_path), self.model.engine_name, self.model.version)
+        )
+
+        # One concurrent task per worker forces every process to start now
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(
+            loop.run_in_executor(self._executor, _worker_ping)
+            for _ in range(self.processes)
+        ))
+        logger.info(
+            f"👷 Started {self.processes} inference worker processes "
+            f"({self.start_method}, {self.model.engine_name} engine)"
+        )
+
+    def shutdown(self):
+        """Stop the worker processes"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    async def preprocess(self, image_bytes: bytes, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Decode an image into a uint8 model input
+
+        Args:
+            image_bytes: Raw image bytes
+            out: Optional (1, height, width, 3) uint8 buffer to fill
+
+        Returns:
+            Preprocessed uint8 image array with a leading batch dimension
+        """
+        if not self.uses_processes:
+            if self._decode_slots is None:
+                return await asyncio.to_thread(self.model.preprocess_image, image_bytes, out)
+            async with self._decode_slots:
+                return await asyncio.to_thread(self.model.preprocess_image, image_bytes, out)
+
+        loop = asyncio.get_running_loop()
+        array = await loop.run_in_executor(self._executor, _worker_preprocess, image_bytes)
+        if out is not None:
+            out[...] = array
+            return out
+        return array
+
+    async def predict_batch(self, batch: np.ndarray) -> list[tuple[str, float]]:
+        """Run one forward pass over a uint8 batch"""
+        if not self.uses_processes:
+            return await asyncio.to_thread(self.model.predict_batch, batch)
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, _worker_predict_batch, batch)
+
+
+# Global shared pool
+inference_pool = InferencePool(
+    classifier_model,
+    processes=config.INFERENCE_PROCESSES,
+    start_method=config.WORKER_START_METHOD,
+    decode_memory_mb=config.DECODE_MEMORY_BUDGET_MB
+)
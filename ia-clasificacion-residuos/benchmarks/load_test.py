@@ -0,0 +1,439 @@
+"""
+Load-test the classifier service against a local image corpus
+
+Serves backend/images/ from a local HTTP server that stands in for
+Firebase Storage, drives /classify, /classify/batch and /classify/upload
+at a fixed concurrency (closed loop) or arrival rate (open loop), and
+reports throughput, latency percentiles and server RSS.
+
+Usage (from ia-clasificacion-residuos/):
+    # Start a server from this checkout and benchmark it
+    python benchmarks/load_test.py --spawn --mode classify batch --duration 30 --json
+    # Benchmark an already running server at 20 requests/s
+    python benchmarks/load_test.py --target http://127.0.0.1:8080 --rate 20 --concurrency 64
+
+No network access is needed: image URLs point at the local stand-in. By
+default every response gets a few random trailing bytes, so each request
+misses the prediction cache, and a --spawn server runs with the
+near-duplicate index off (PHASH_INDEX_SIZE=0): the corpus repeats, so
+otherwise every image after the first pass would skip the model. Run an
+external --target server with PHASH_INDEX_SIZE=0 to measure inference.
+Pass --cache-hits to measure cached serving, with both caches enabled.
+"""
+import argparse
+import asyncio
+import functools
+import io
+import json
+import os
+import random
+import re
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional
+
+import httpx
+from PIL import Image
+
+ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_IMAGES = ROOT.parent / "backend" / "images"
+MODES = ("classify", "batch", "upload")
+RUN_ID = os.urandom(4).hex()
+
+
+class ImageHandler(SimpleHTTPRequestHandler):
+    """Static file handler that can make every response byte-unique"""
+
+    unique = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def copyfile(self, source, outputfile):
+        super().copyfile(source, outputfile)
+        if self.unique:
+            # Decoders ignore data after the end-of-image marker
+            outputfile.write(os.urandom(16))
+
+    def send_header(self, keyword, value):
+        if self.unique and keyword.lower() == "content-length":
+            value = str(int(value) + 16)
+        super().send_header(keyword, value)
+
+
+def start_image_server(images_dir: Path, host: str, port: int, unique: bool) -> ThreadingHTTPServer:
+    """Serve images_dir over HTTP on a background thread"""
+    handler = type("Handler", (ImageHandler,), {"unique": unique})
+    server = ThreadingHTTPServer((host, port), functools.partial(handler, directory=str(images_dir)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def load_corpus(images_dir: Path) -> list[Path]:
+    """Return the images that decode (the corpus has a few broken files)"""
+    paths = []
+    for path in sorted(images_dir.iterdir()):
+        if path.suffix.lower() not in {".jpg", ".jpeg", ".png"}:
+            continue
+        try:
+            with Image.open(io.BytesIO(path.read_bytes())) as img:
+                img.load()
+        except Exception:
+            continue
+        paths.append(path)
+    return paths
+
+
+def tree_rss_bytes(pid: int) -> int:
+    """Resident memory of a process and all of its descendants (Linux only)"""
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            status = Path(f"/proc/{current}/status").read_text()
+            match = re.search(r"^VmRSS:\s+(\d+) kB", status, re.MULTILINE)
+            if match:
+                total += int(match.group(1)) * 1024
+            for task in Path(f"/proc/{current}/task").iterdir():
+                children = (task / "children").read_text().split()
+                pending.extend(int(child) for child in children)
+        except (FileNotFoundError, ProcessLookupError):
+            continue
+    return total
+
+
+async def scrape_rss_bytes(client: httpx.AsyncClient, target: str) -> Optional[int]:
+    """Read process_resident_memory_bytes from the server's /metrics"""
+    try:
+        response = await client.get(f"{target}/metrics")
+        match = re.search(r"^process_resident_memory_bytes (\S+)$", response.text, re.MULTILINE)
+        return int(float(match.group(1))) if match else None
+    except (httpx.HTTPError, ValueError):
+        return None
+
+
+class RssSampler:
+    """Sample server RSS in the background and keep the peak"""
+
+    def __init__(self, client: httpx.AsyncClient, target: str, pid: Optional[int], interval: float = 0.5):
+        self.client = client
+        self.target = target
+        self.pid = pid
+        self.interval = interval
+        self.samples: list[int] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def sample(self) -> Optional[int]:
+        if self.pid is not None:
+            rss = tree_rss_bytes(self.pid)
+        else:
+            rss = await scrape_rss_bytes(self.client, self.target)
+        if rss:
+            self.samples.append(rss)
+        return rss
+
+    async def _run(self):
+        while True:
+            await self.sample()
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> dict:
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        await self.sample()
+        if not self.samples:
+            return {"source": None}
+        to_mb = lambda b: round(b / (1024 * 1024), 1)  # noqa: E731
+        return {
+            "source": "proc" if self.pid is not None else "metrics",
+            "start_mb": to_mb(self.samples[0]),
+            "peak_mb": to_mb(max(self.samples)),
+            "end_mb": to_mb(self.samples[-1]),
+        }
+
+
+def build_request(mode: str, seq: int, corpus: list[Path], image_base: str, batch_size: int) -> dict:
+    """
+    Keyword arguments for client.request() for one call
+
+    Report ids are unique per run so the server's report-id cache never
+    answers for an earlier run.
+    """
+    prefix = f"LOAD-{RUN_ID}-{mode}"
+    if mode == "classify":
+        path = corpus[seq % len(corpus)]
+        return {
+            "method": "POST",
+            "url": "/classify",
+            "json": {"image_url": f"{image_base}/{path.name}", "report_id": f"{prefix}-{seq}", "user_id": "load-test"},
+        }
+    if mode == "batch":
+        items = []
+        for offset in range(batch_size):
+            path = corpus[(seq * batch_size + offset) % len(corpus)]
+            items.append({
+                "image_url": f"{image_base}/{path.name}",
+                "report_id": f"{prefix}-{seq}-{offset}",
+                "user_id": "load-test",
+            })
+        return {"method": "POST", "url": "/classify/batch", "json": {"items": items}}
+
+    path = corpus[seq % len(corpus)]
+    content_type = "image/png" if path.suffix.lower() == ".png" else "image/jpeg"
+    return {
+        "method": "POST",
+        "url": "/classify/upload",
+        "params": {"report_id": f"{prefix}-{seq}"},
+        # Same cache-busting trailer as the image server
+        "content": path.read_bytes() + os.urandom(16) if ImageHandler.unique else path.read_bytes(),
+        "headers": {"Content-Type": content_type},
+    }
+
+
+async def run_mode(args, mode: str, corpus: list[Path], image_base: str, pid: Optional[int]) -> dict:
+    """Drive one endpoint for the configured duration and summarize it"""
+    latencies: list[float] = []
+    statuses: dict[str, int] = {}
+    images_ok = 0
+    seq = 0
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    timeout = httpx.Timeout(args.timeout)
+
+    async with httpx.AsyncClient(base_url=args.target, limits=limits, timeout=timeout) as client:
+        async def call(scheduled_at: float):
+            nonlocal images_ok, seq
+            request = build_request(mode, seq, corpus, image_base, args.batch_size)
+            seq += 1
+            try:
+                response = await client.request(**request)
+                status = str(response.status_code)
+                if response.status_code == 200:
+                    if mode == "batch":
+                        images_ok += sum(1 for r in response.json()["results"] if r["result"])
+                    else:
+                        images_ok += 1
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            # Open loop measures from the scheduled arrival, so queueing in
+            # the client counts against the server (no coordinated omission)
+            latencies.append((time.perf_counter() - scheduled_at) * 1000)
+            statuses[status] = statuses.get(status, 0) + 1
+
+        # Warm-up requests are not measured
+        for _ in range(args.warmup):
+            await client.request(**build_request(mode, seq, corpus, image_base, args.batch_size))
+            seq += 1
+
+        sampler = RssSampler(client, args.target, pid)
+        await sampler.sample()
+        sampler.start()
+
+        started = time.perf_counter()
+        deadline = started + args.duration
+        if args.rate > 0:
+            # Open loop: arrivals follow the requested rate, bounded by concurrency
+            limiter = asyncio.Semaphore(args.concurrency)
+            tasks = []
+
+            async def bounded(scheduled_at: float):
+                async with limiter:
+                    await call(scheduled_at)
+
+            next_at = started
+            while next_at < deadline:
+                delay = next_at - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                tasks.append(asyncio.create_task(bounded(next_at)))
+                gap = random.expovariate(args.rate) if args.arrival == "poisson" else 1.0 / args.rate
+                next_at += gap
+            await asyncio.gather(*tasks)
+        else:
+            # Closed loop: each worker sends its next request when the last returns
+            async def worker():
+                while time.perf_counter() < deadline:
+                    await call(time.perf_counter())
+
+            await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+        rss = await sampler.stop()
+
+    ordered = sorted(latencies)
+    pick = lambda q: round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 2) if ordered else None  # noqa: E731
+    return {
+        "mode": mode,
+        "requests": len(latencies),
+        "statuses": statuses,
+        "elapsed_s": round(elapsed, 2),
+        "requests_per_s": round(len(latencies) / elapsed, 2),
+        "images_per_s": round(images_ok / elapsed, 2),
+        "latency_ms": {
+            "mean": round(statistics.mean(ordered), 2) if ordered else None,
+            "p50": pick(0.50),
+            "p95": pick(0.95),
+            "p99": pick(0.99),
+            "max": round(ordered[-1], 2) if ordered else None,
+        },
+        "rss": rss,
+    }
+
+
+def spawn_server(port: int, env_overrides: list[str], log_path: Optional[Path],
+                 cache_hits: bool = False) -> subprocess.Popen:
+    """Start uvicorn for this checkout, keeping its logs out of the report"""
+    env = dict(os.environ)
+    if not cache_hits:
+        # Repeated pixels would be answered by the near-duplicate index
+        env["PHASH_INDEX_SIZE"] = "0"
+    for item in env_overrides:
+        key, _, value = item.partition("=")
+        env[key] = value
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=str(ROOT),
+        env=env,
+        stdout=log_path.open("w") if log_path else subprocess.DEVNULL,
+        stderr=subprocess.STDOUT
+    )
+
+
+async def wait_until_ready(target: str, timeout: float):
+    """Poll /health/ready until the model is loaded"""
+    deadline = time.perf_counter() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.perf_counter() < deadline:
+            try:
+                if (await client.get(f"{target}/health/ready")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise TimeoutError(f"{target} did not become ready within {timeout}s")
+
+
+def git_revision() -> Optional[str]:
+    """Commit the benchmark ran against, for comparing runs"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=str(ROOT), capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args) -> dict:
+    corpus = load_corpus(args.images)
+    if not corpus:
+        sys.exit(f"No decodable images found in {args.images}")
+
+    ImageHandler.unique = not args.cache_hits
+    image_server = start_image_server(args.images, args.image_host, args.image_port, ImageHandler.unique)
+    image_base = f"http://{args.image_host}:{image_server.server_address[1]}"
+
+    server = None
+    pid = args.pid
+    try:
+        if args.spawn:
+            server = spawn_server(args.port, args.env, args.server_log, args.cache_hits)
+            args.target = f"http://127.0.0.1:{args.port}"
+            pid = server.pid
+        await wait_until_ready(args.target, args.ready_timeout)
+
+        results = []
+        for mode in args.mode:
+            results.append(await run_mode(args, mode, corpus, image_base, pid))
+    finally:
+        image_server.shutdown()
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_revision": git_revision(),
+        "target": args.target,
+        "config": {
+            "concurrency": args.concurrency,
+            "rate": args.rate,
+            "arrival": args.arrival if args.rate > 0 else "closed",
+            "duration_s": args.duration,
+            "batch_size": args.batch_size,
+            "cache_hits": args.cache_hits,
+            "images": len(corpus),
+            "env": args.env,
+        },
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--target", default="http://127.0.0.1:8080", help="Running server to benchmark")
+    parser.add_argument("--spawn", action="store_true", help="Start a server from this checkout instead")
+    parser.add_argument("--port", type=int, default=8090, help="Port for --spawn")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="Environment for --spawn (e.g. INFERENCE_PROCESSES=2), repeatable")
+    parser.add_argument("--server-log", type=Path, default=None, help="Write --spawn server logs here")
+    parser.add_argument("--pid", type=int, default=None,
+                        help="Server pid to read RSS from /proc (default: scrape /metrics)")
+    parser.add_argument("--images", type=Path, default=DEFAULT_IMAGES)
+    parser.add_argument("--image-host", default="127.0.0.1")
+    parser.add_argument("--image-port", type=int, default=0, help="0 picks a free port")
+    parser.add_argument("--mode", nargs="+", choices=MODES, default=["classify"])
+    parser.add_argument("--concurrency", type=int, default=16, help="Requests in flight at once")
+    parser.add_argument("--rate", type=float, default=0.0,
+                        help="Arrivals per second (open loop); 0 runs a closed loop")
+    parser.add_argument("--arrival", choices=("poisson", "uniform"), default="poisson")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds per mode")
+    parser.add_argument("--warmup", type=int, default=5, help="Unmeasured requests per mode")
+    parser.add_argument("--batch-size", type=int, default=8, help="Items per /classify/batch call")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Per-request timeout")
+    parser.add_argument("--ready-timeout", type=float, default=180.0)
+    parser.add_argument("--cache-hits", action="store_true",
+                        help="Serve identical bytes and keep the near-duplicate index on, "
+                             "so repeated images hit the caches")
+    parser.add_argument("--json", action="store_true", help="Print machine-readable output")
+    parser.add_argument("--output", type=Path, default=None, help="Also write the JSON report here")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+
+    if args.output is not None:
+        args.output.write_text(json.dumps(report, indent=2))
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    config = report["config"]
+    print(
+        f"Target {report['target']} @ {report['git_revision']} "
+        f"({config['arrival']}, concurrency {config['concurrency']}, {config['duration_s']}s per mode)"
+    )
+    for result in report["results"]:
+        latency = result["latency_ms"]
+        rss = result["rss"]
+        print(
+            f"  {result['mode']:<9} {result['requests_per_s']:8.2f} req/s  {result['images_per_s']:8.2f} img/s  "
+            f"p50 {latency['p50']}ms  p95 {latency['p95']}ms  p99 {latency['p99']}ms  "
+            f"statuses {result['statuses']}"
+        )
+        if rss.get("source"):
+            print(f"  {'':<9} RSS {rss['start_mb']} -> peak {rss['peak_mb']} MB ({rss['source']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Compare the legacy and current image preprocessing paths
+
+Decodes every image in backend/images/ with the original full-resolution
+float32 pipeline and with WasteClassifierModel.preprocess_image, and
+reports per-image latency for both.
+
+Usage (from ia-clasificacion-residuos/):
+    python benchmarks/preprocess_benchmark.py [--images DIR] [--repeat N] [--json]
+"""
+import argparse
+import io
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.model_loader import WasteClassifierModel  # noqa: E402
+
+DEFAULT_IMAGES = Path(__file__).resolve().parents[2] / "backend" / "images"
+
+
+def legacy_preprocess(image_bytes: bytes, input_size=(224, 224)) -> np.ndarray:
+    """Original path: full decode, resize, float32 conversion and /255"""
+    img = Image.open(io.BytesIO(image_bytes))
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    img = img.resize(input_size)
+    img_array = np.array(img, dtype=np.float32) / 255.0
+    return np.expand_dims(img_array, axis=0)
+
+
+def time_path(fn, images: list[bytes], repeat: int) -> list[float]:
+    """Return per-image latencies in milliseconds"""
+    timings = []
+    for _ in range(repeat):
+        for image_bytes in images:
+            start = time.perf_counter()
+            fn(image_bytes)
+            timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def summarize(timings: list[float]) -> dict:
+    """Summary statistics for a list of latencies"""
+    ordered = sorted(timings)
+    return {
+        "mean_ms": round(statistics.mean(ordered), 3),
+        "p50_ms": round(ordered[len(ordered) // 2], 3),
+        "p95_ms": round(ordered[int(0.95 * (len(ordered) - 1))], 3),
+        "total_s": round(sum(ordered) / 1000, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--images", type=Path, default=DEFAULT_IMAGES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", action="store_true", help="Print machine-readable output")
+    args = parser.parse_args()
+
+    paths = sorted(p for p in args.images.iterdir() if p.suffix.lower() in {".jpg", ".jpeg", ".png"})
+    if not paths:
+        sys.exit(f"No images found in {args.images}")
+    images, skipped = [], []
+    for path in paths:
+        image_bytes = path.read_bytes()
+        try:
+            legacy_preprocess(image_bytes)
+        except Exception:
+            skipped.append(path.name)
+            continue
+        images.append(image_bytes)
+
+    model = WasteClassifierModel()
+
+    # Pixel drift introduced by reduced-resolution decoding
+    diffs = [
+        float(np.abs(legacy_preprocess(b) - model.preprocess_image(b) / 255.0).mean())
+        for b in images
+    ]
+
+    legacy = summarize(time_path(legacy_preprocess, images, args.repeat))
+    current = summarize(time_path(model.preprocess_image, images, args.repeat))
+
+    report = {
+        "images": len(images),
+        "skipped": skipped,
+        "repeat": args.repeat,
+        "legacy": legacy,
+        "current": current,
+        "speedup": round(legacy["mean_ms"] / current["mean_ms"], 2),
+        "mean_abs_pixel_diff": round(statistics.mean(diffs), 5),
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"Images: {report['images']} x {report['repeat']} runs")
+    if skipped:
+        print(f"  skipped (not decodable): {', '.join(skipped)}")
+    for name in ("legacy", "current"):
+        stats = report[name]
+        print(
+            f"  {name:<8} mean {stats['mean_ms']:8.2f}ms  p50 {stats['p50_ms']:8.2f}ms  "
+            f"p95 {stats['p95_ms']:8.2f}ms  total {stats['total_s']:.2f}s"
+        )
+    print(f"  speedup  {report['speedup']}x")
+    print(f"  mean abs pixel diff (0-1 scale): {report['mean_abs_pixel_diff']}")
+
+
+if __name__ == "__main__":
+    main()
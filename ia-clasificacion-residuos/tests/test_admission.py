@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app import main
+from app.admission import AdmissionController, AdmissionRejected
+
+
+def test_full_queue_rejects_with_retry_after():
+    async def test():
+        controller = AdmissionController(max_in_flight=1, max_queued=1, deadline_s=5)
+        await controller.acquire()
+        waiting = asyncio.ensure_future(controller.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as rejected:
+            await controller.acquire()
+        assert rejected.value.retry_after >= 1
+        assert controller.rejected_total == 1
+
+        # The finished request hands its slot to the waiter
+        controller.release(0.5)
+        await waiting
+        assert controller.in_flight == 1
+        controller.release(0.5)
+        assert controller.in_flight == 0
+
+    asyncio.run(test())
+
+
+def test_retry_after_grows_with_the_backlog():
+    controller = AdmissionController(max_in_flight=2, max_queued=10)
+    assert controller.retry_after() == 1
+    controller.release(4.0)
+    controller.in_flight = 1
+    # (0 queued + 1) * 4s / 2 slots
+    assert controller.retry_after() == 2
+
+
+def test_waiter_gives_up_at_the_deadline():
+    async def test():
+        controller = AdmissionController(max_in_flight=1, max_queued=1, deadline_s=0.05)
+        await controller.acquire()
+        with pytest.raises(AdmissionRejected):
+            await controller.acquire()
+        assert controller.expired_total == 1
+        assert controller.queued == 0
+
+    asyncio.run(test())
+
+
+def test_endpoint_gets_429_with_retry_after(monkeypatch):
+    controller = AdmissionController(max_in_flight=1, max_queued=0)
+    monkeypatch.setattr(main, "admission_controller", controller)
+
+    async def test():
+        async with main._admitted("classify"):
+            with pytest.raises(HTTPException) as rejected:
+                async with main._admitted("classify"):
+                    pass
+        assert rejected.value.status_code == 429
+        assert int(rejected.value.headers["Retry-After"]) >= 1
+
+    asyncio.run(test())
+
+
+def test_slot_is_released_when_the_request_raises(monkeypatch):
+    controller = AdmissionController(max_in_flight=1, max_queued=0)
+    monkeypatch.setattr(main, "admission_controller", controller)
+
+    async def test():
+        with pytest.raises(ValueError):
+            async with main._admitted("classify"):
+                raise ValueError("Invalid image")
+        assert controller.in_flight == 0
+        # The next request is admitted instead of getting a 429
+        async with main._admitted("classify"):
+            assert controller.in_flight == 1
+        assert controller.in_flight == 0
+
+    asyncio.run(test())
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def test():
+        controller = AdmissionController(max_in_flight=1, max_queued=1, deadline_s=5)
+        await controller.acquire()
+        waiting = asyncio.ensure_future(controller.acquire())
+        await asyncio.sleep(0)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        assert controller.queued == 0
+        controller.release(0.1)
+        assert controller.in_flight == 0
+
+    asyncio.run(test())
@@ -0,0 +1,139 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from app.batching import BatchScheduler
+
+
+def image(value: int = 0) -> np.ndarray:
+    return np.full((1, 2, 2, 3), value, dtype=np.uint8)
+
+
+class RecordingPredict:
+    """predict_fn that records batch sizes and echoes each item's pixel value"""
+
+    def __init__(self, delay: float = 0.0, fail_on: int = None):
+        self.sizes = []
+        self.delay = delay
+        self.fail_on = fail_on
+
+    async def __call__(self, batch: np.ndarray) -> list:
+        self.sizes.append(len(batch))
+        if batch.shape[1:] != (2, 2, 3):
+            raise ValueError(f"unexpected input shape {batch.shape}")
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        values = [int(item[0, 0, 0]) for item in batch]
+        if self.fail_on in values:
+            raise ValueError(f"bad item {self.fail_on}")
+        return [(f"class-{value}", 1.0) for value in values]
+
+
+def run_with_scheduler(predict, test, **options):
+    async def main():
+        scheduler = BatchScheduler(predict, **options)
+        await scheduler.start()
+        try:
+            return await test(scheduler)
+        finally:
+            await scheduler.stop()
+    return asyncio.run(main())
+
+
+def test_batch_closes_at_max_size():
+    predict = RecordingPredict()
+
+    async def test(scheduler):
+        return await asyncio.gather(*(scheduler.submit(image(i)) for i in range(10)))
+
+    results = run_with_scheduler(predict, test, max_batch_size=4, max_wait_ms=1000)
+    assert results == [(f"class-{i}", 1.0) for i in range(10)]
+    # Two full batches; the rest waits for the deadline
+    assert predict.sizes == [4, 4, 2]
+
+
+def test_batch_closes_after_max_wait():
+    predict = RecordingPredict()
+
+    async def test(scheduler):
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        first = asyncio.ensure_future(scheduler.submit(image(1)))
+        await asyncio.sleep(0.01)
+        second = asyncio.ensure_future(scheduler.submit(image(2)))
+        await asyncio.gather(first, second)
+        return loop.time() - started
+
+    elapsed = run_with_scheduler(predict, test, max_batch_size=16, max_wait_ms=50)
+    # Both items joined one batch that ran once the first had waited ~50ms
+    assert predict.sizes == [2]
+    assert 0.04 <= elapsed < 1.0
+
+
+def test_zero_wait_runs_items_as_they_come():
+    predict = RecordingPredict()
+
+    async def test(scheduler):
+        for i in range(3):
+            await scheduler.submit(image(i))
+
+    run_with_scheduler(predict, test, max_batch_size=16, max_wait_ms=0)
+    assert predict.sizes == [1, 1, 1]
+
+
+def test_item_error_does_not_fail_the_batch():
+    predict = RecordingPredict(fail_on=2)
+
+    async def test(scheduler):
+        return await asyncio.gather(
+            *(scheduler.submit(image(i)) for i in range(4)), return_exceptions=True
+        )
+
+    results = run_with_scheduler(predict, test, max_batch_size=4, max_wait_ms=1000)
+    assert results[0] == ("class-0", 1.0)
+    assert results[1] == ("class-1", 1.0)
+    assert isinstance(results[2], ValueError)
+    assert results[3] == ("class-3", 1.0)
+
+
+def test_mismatched_item_does_not_fail_the_batch():
+    predict = RecordingPredict()
+
+    async def test(scheduler):
+        bad = np.zeros((1, 3, 3, 3), dtype=np.uint8)
+        return await asyncio.gather(
+            scheduler.submit(image(1)), scheduler.submit(bad), scheduler.submit(image(3)),
+            return_exceptions=True
+        )
+
+    results = run_with_scheduler(predict, test, max_batch_size=3, max_wait_ms=1000)
+    assert results[0] == ("class-1", 1.0)
+    assert isinstance(results[1], Exception)
+    assert results[2] == ("class-3", 1.0)
+
+
+def test_stop_fails_queued_and_running_items():
+    predict = RecordingPredict(delay=10)
+
+    async def main():
+        scheduler = BatchScheduler(predict, max_batch_size=1, max_wait_ms=0)
+        await scheduler.start()
+        running = asyncio.ensure_future(scheduler.submit(image(1)))
+        queued = asyncio.ensure_future(scheduler.submit(image(2)))
+        await asyncio.sleep(0.05)
+        await scheduler.stop()
+        return await asyncio.wait_for(
+            asyncio.gather(running, queued, return_exceptions=True), timeout=1
+        )
+
+    running, queued = asyncio.run(main())
+    assert isinstance(running, RuntimeError)
+    assert isinstance(queued, RuntimeError)
+    assert predict.sizes == [1]
+
+
+def test_submit_requires_running_scheduler():
+    scheduler = BatchScheduler(RecordingPredict())
+    with pytest.raises(RuntimeError):
+        asyncio.run(scheduler.submit(image()))
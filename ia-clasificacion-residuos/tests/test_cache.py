@@ -0,0 +1,77 @@
+import pytest
+
+from app import cache as cache_module
+from app.cache import PredictionCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(cache_module.time, "monotonic", clock)
+    return clock
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = PredictionCache(max_entries=4, ttl_seconds=60)
+    cache.put("k", ("Orgánico", 0.9), "1.0.0", report_id="R1")
+
+    clock.now += 59
+    assert cache.get("k", "1.0.0") == ("Orgánico", 0.9)
+    assert cache.get_by_report("R1", "1.0.0") == ("Orgánico", 0.9)
+
+    clock.now += 2
+    assert cache.get("k", "1.0.0") is None
+    assert cache.get_by_report("R1", "1.0.0") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = PredictionCache(max_entries=2, ttl_seconds=60)
+    cache.put("a", ("Orgánico", 0.9), "1.0.0")
+    cache.put("b", ("Aprovechable", 0.8), "1.0.0")
+    # Reading "a" makes "b" the least recently used
+    assert cache.get("a", "1.0.0") is not None
+    cache.put("c", ("No Aprovechable", 0.7), "1.0.0")
+
+    assert cache.get("b", "1.0.0") is None
+    assert cache.get("a", "1.0.0") == ("Orgánico", 0.9)
+    assert cache.get("c", "1.0.0") == ("No Aprovechable", 0.7)
+
+
+def test_keys_are_scoped_to_the_model_version(clock):
+    cache = PredictionCache(max_entries=4, ttl_seconds=60)
+    cache.put("k", ("Orgánico", 0.9), "1.0.0", report_id="R1")
+
+    assert cache.get("k", "2.0.0") is None
+    assert cache.get_by_report("R1", "2.0.0") is None
+    assert cache.origin_of("2.0.0", key="k") is None
+
+    cache.put("k", ("Aprovechable", 0.6), "2.0.0")
+    assert cache.get("k", "1.0.0") == ("Orgánico", 0.9)
+    assert cache.get("k", "2.0.0") == ("Aprovechable", 0.6)
+
+
+def test_clearing_one_version_keeps_the_others(clock):
+    cache = PredictionCache(max_entries=4, ttl_seconds=60)
+    cache.put("k", ("Orgánico", 0.9), "1.0.0", report_id="R1")
+    cache.put("k", ("Aprovechable", 0.6), "2.0.0", report_id="R1")
+
+    cache.clear("1.0.0")
+    assert cache.get("k", "1.0.0") is None
+    assert cache.get_by_report("R1", "1.0.0") is None
+    assert cache.get("k", "2.0.0") == ("Aprovechable", 0.6)
+
+
+def test_disabled_cache_stores_nothing(clock):
+    cache = PredictionCache(max_entries=0)
+    cache.put("k", ("Orgánico", 0.9), "1.0.0")
+    assert cache.get("k", "1.0.0") is None
+    assert not cache.stats()["enabled"]
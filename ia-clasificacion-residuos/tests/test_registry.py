@@ -0,0 +1,80 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.registry import ModelDeployment, ModelRegistry
+
+
+def registry_with(weights: dict[str, int]) -> ModelRegistry:
+    registry = ModelRegistry()
+    for version in weights:
+        registry.add(ModelDeployment(SimpleNamespace(version=version), pool=None, scheduler=None))
+    if any(weights.values()):
+        registry.set_traffic(weights)
+    return registry
+
+
+@pytest.mark.parametrize("weights, version, percent, expected", [
+    # Rounding leftovers go to the largest remaining shares
+    ({"a": 50, "b": 30, "c": 20}, "c", 10, {"a": 57, "b": 33, "c": 10}),
+    ({"a": 34, "b": 33, "c": 33, "d": 0}, "d", 10, {"a": 31, "b": 30, "c": 29, "d": 10}),
+    ({"a": 100, "b": 0}, "b", 10, {"a": 90, "b": 10}),
+    ({"a": 90, "b": 10}, "b", 100, {"b": 100}),
+    ({"a": 90, "b": 10}, "b", 0, {"a": 100}),
+    ({"a": 0}, "a", 30, {"a": 100}),
+])
+def test_shift_traffic(weights, version, percent, expected):
+    registry = registry_with(weights)
+    registry.shift_traffic(version, percent)
+    assert registry._weights == expected
+    assert sum(registry._weights.values()) == 100
+
+
+@pytest.mark.parametrize("weights, version, percent", [
+    ({"a": 100}, "a", 0),
+    ({"a": 100}, "a", 101),
+    ({"a": 100}, "a", -1),
+])
+def test_shift_traffic_rejects(weights, version, percent):
+    registry = registry_with(weights)
+    with pytest.raises(ValueError):
+        registry.shift_traffic(version, percent)
+    assert registry._weights == weights
+
+
+@pytest.mark.parametrize("weights", [
+    {"a": 60, "b": 30},
+    {"a": 60, "b": 50},
+    {"a": 110, "b": -10},
+    {"a": 50, "missing": 50},
+])
+def test_set_traffic_rejects_invalid_splits(weights):
+    registry = registry_with({"a": 100, "b": 0})
+    with pytest.raises(ValueError):
+        registry.set_traffic(weights)
+    assert registry._weights == {"a": 100}
+
+
+def test_set_traffic_builds_cumulative_routes():
+    registry = registry_with({"a": 25, "b": 0, "c": 75})
+    assert registry._routes == [(25, "a"), (100, "c")]
+    assert registry.primary().version == "c"
+
+
+def test_route_keeps_a_report_on_the_same_version():
+    registry = registry_with({"a": 50, "b": 50})
+    for i in range(200):
+        key = f"ECO-{i}"
+        first = registry.route(key).version
+        assert all(registry.route(key).version == first for _ in range(5))
+
+
+def test_route_follows_the_weights():
+    registry = registry_with({"a": 90, "b": 10})
+    served = [registry.route(f"ECO-{i}").version for i in range(2000)]
+    assert 0.07 < served.count("b") / len(served) < 0.13
+
+
+def test_route_without_traffic_raises():
+    with pytest.raises(RuntimeError):
+        ModelRegistry().route("ECO-1")
@@ -0,0 +1,139 @@
+import asyncio
+
+import pytest
+
+from app.singleflight import SingleFlight, flight_keys
+
+
+def test_concurrent_identical_requests_share_one_execution():
+    calls = 0
+
+    async def classify():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return ("Orgánico", 0.9, 10)
+
+    async def test():
+        flights = SingleFlight()
+        keys = flight_keys("1.0.0", "http://img/1.jpg", None)
+        results = await asyncio.gather(*(flights.run(keys, classify) for _ in range(5)))
+        return flights, results
+
+    flights, results = asyncio.run(test())
+    assert calls == 1
+    assert results == [("Orgánico", 0.9, 10)] * 5
+    assert (flights.leaders, flights.followers) == (1, 4)
+
+
+def test_any_shared_key_joins_the_flight():
+    calls = 0
+
+    async def classify():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+
+    async def test():
+        flights = SingleFlight()
+        return await asyncio.gather(
+            flights.run(flight_keys("1.0.0", "http://img/1.jpg", "R1"), classify),
+            # Same report, retried with a re-signed URL
+            flights.run(flight_keys("1.0.0", "http://img/1.jpg?sig=2", "R1"), classify),
+        )
+
+    assert asyncio.run(test()) == [1, 1]
+
+
+def test_versions_do_not_share_flights():
+    calls = 0
+
+    async def classify():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+
+    async def test():
+        flights = SingleFlight()
+        return await asyncio.gather(
+            flights.run(flight_keys("1.0.0", "http://img/1.jpg", None), classify),
+            flights.run(flight_keys("2.0.0", "http://img/1.jpg", None), classify),
+        )
+
+    asyncio.run(test())
+    assert calls == 2
+
+
+def test_followers_get_the_same_exception_and_key_is_released():
+    calls = 0
+    error = ValueError("Invalid image")
+
+    async def fail():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        raise error
+
+    async def succeed():
+        return ("Aprovechable", 0.7, 5)
+
+    async def test():
+        flights = SingleFlight()
+        keys = flight_keys("1.0.0", "http://img/1.jpg", "R1")
+        results = await asyncio.gather(
+            *(flights.run(keys, fail) for _ in range(3)), return_exceptions=True
+        )
+        assert flights.stats()["in_flight"] == 0
+        # A later request starts afresh instead of reusing the failure
+        retry = await flights.run(keys, succeed)
+        return results, retry
+
+    results, retry = asyncio.run(test())
+    assert calls == 1
+    assert all(result is error for result in results)
+    assert retry == ("Aprovechable", 0.7, 5)
+
+
+def test_work_is_cancelled_once_every_caller_gives_up():
+    async def test():
+        flights = SingleFlight()
+        keys = flight_keys("1.0.0", "http://img/1.jpg", None)
+        work_cancelled = asyncio.Event()
+
+        async def slow():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                work_cancelled.set()
+                raise
+
+        callers = [asyncio.ensure_future(flights.run(keys, slow)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        callers[0].cancel()
+        await asyncio.sleep(0.01)
+        # One caller is still waiting, so the work keeps running
+        assert not work_cancelled.is_set()
+        callers[1].cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.sleep(0)
+        assert work_cancelled.is_set()
+        assert flights.lookup(keys) is None
+
+    asyncio.run(test())
+
+
+def test_claimed_future_resolves_joined_callers():
+    async def test():
+        flights = SingleFlight()
+        keys = flight_keys("1.0.0", None, "R1")
+        future = flights.claim(keys)
+        joined = asyncio.ensure_future(flights.wait(flights.lookup(keys)))
+        await asyncio.sleep(0)
+        flights.resolve(future, ValueError("Failed to download image"))
+        with pytest.raises(ValueError):
+            await joined
+        assert flights.lookup(keys) is None
+
+    asyncio.run(test())